@@ -0,0 +1,68 @@
+"""
+Benchmark: `dw6 audit query` for a one-hour window on large audit logs.
+
+Builds audit logs of SIZES lines (about 60 bytes each, so the largest is almost
+2 GB) and times the query with a full scan, as grep would do it, against
+dw6.audit, which binary-searches the memory-mapped log for the window.
+
+    python benchmarks/bench_audit_query.py
+"""
+
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from dw6 import audit  # noqa: E402
+
+SIZES = (100_000, 1_000_000, 32_000_000)
+ROUNDS = 5
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+STEP = timedelta(seconds=1)
+
+
+def write_log(path: Path, size: int):
+    chunk = 100_000
+    with open(path, "w") as f:
+        for first in range(0, size, chunk):
+            f.writelines(f"{(START + n * STEP).isoformat()} - KERNEL UNLOCKED by user: user{n % 7}\n"
+                         for n in range(first, min(first + chunk, size)))
+
+
+def full_scan(path: Path, since: str, until: str) -> int:
+    count = 0
+    with open(path, "r") as f:
+        for line in f:
+            if since <= line[:25] < until and line.rstrip("\n").endswith("by user: user3"):
+                count += 1
+    return count
+
+
+def best(action) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            path = Path(tmp) / f"audit_{size}.log"
+            write_log(path, size)
+            middle = START + size // 2 * STEP
+            since, until = middle.isoformat(), (middle + timedelta(hours=1)).isoformat()
+            scan = best(lambda: full_scan(path, since, until)) if size <= 1_000_000 else float("nan")
+            query = best(lambda: list(audit.query(since, until, user="user3", log_file=path)))
+            print(f"{size:>11} lines ({path.stat().st_size / 2**20:7.0f} MiB): full scan {scan:9.2f} ms   "
+                  f"binary search {query:6.2f} ms")
+            path.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: commit_all on a large working tree with a handful of changes.
+
+Generates a repository with FILES tracked files spread over nested directories,
+changes CHANGED of them and adds a few untracked files, then times one commit_all
+with `git add .` against one with incremental staging from `git status`.
+
+    python benchmarks/bench_commit_all.py [FILES]
+"""
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from dw6 import git_handler  # noqa: E402
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+CHANGED = 10
+ROUNDS = 3
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+
+def build_tree(repo: Path):
+    git(repo, "init", "-q")
+    git(repo, "config", "user.email", "bench@example.com")
+    git(repo, "config", "user.name", "bench")
+    for i in range(FILES):
+        directory = repo / f"pkg{i % 100}" / f"mod{i % 1000 // 100}"
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"file{i}.py").write_text(f"value = {i}\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "base")
+
+
+def dirty(repo: Path, round_number: int):
+    for i in range(CHANGED):
+        path = repo / f"pkg{i % 100}" / f"mod{i % 1000 // 100}" / f"file{i}.py"
+        path.write_text(f"value = {i}  # round {round_number}\n")
+    (repo / f"untracked{round_number}.txt").write_text("new\n")
+
+
+def time_commit(repo: Path, incremental: bool, round_number: int) -> float:
+    dirty(repo, round_number)
+    manager = git_handler.GitManager(str(repo))
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager.commit_all(f"round {round_number}", incremental=incremental)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp)
+        print(f"Generating a tree with {FILES} files...")
+        build_tree(repo)
+        round_number = 0
+        for label, incremental in (("git add . + commit", False), ("incremental staging + commit", True)):
+            timings = []
+            for _ in range(ROUNDS):
+                round_number += 1
+                timings.append(time_commit(repo, incremental, round_number))
+            print(f"{label:<32}{min(timings):>10.1f} ms (best of {ROUNDS})")
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            git_handler.GitManager(str(repo)).commit_all("clean", incremental=True)
+        print(f"{'clean tree, incremental':<32}{(time.perf_counter() - started) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("GIT_CONFIG_GLOBAL", os.devnull)
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: allocating the next ID in the meta-requirement and tech-debt logs.
+
+Builds logs of SIZES records, then times one append with the old approach
+(readlines() and a regex on the last line) against RecordLog, both with its
+sidecar and when the sidecar is missing and the last ID is recovered from the tail.
+
+    python benchmarks/bench_record_log.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from dw6.record_log import RecordLog  # noqa: E402
+
+SIZES = (10, 10_000, 1_000_000)
+ROUNDS = 5
+
+
+def readlines_append(path: Path):
+    last_id = 0
+    with open(path, "r") as f:
+        lines = f.readlines()
+        if lines:
+            match = re.search(r'^\[ID:(\d+)\]', lines[-1])
+            if match:
+                last_id = int(match.group(1))
+    with open(path, "a") as f:
+        f.write(f"[ID:{last_id + 1}] [TS:2024-01-01 00:00:00 UTC] appended\n")
+
+
+def best(action) -> float:
+    timings = []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        action()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            path = Path(tmp) / f"log_{size}.log"
+            with open(path, "w") as f:
+                f.writelines(f"[ID:{n}] [TS:2024-01-01 00:00:00 UTC] item {n}\n" for n in range(1, size + 1))
+            log = RecordLog(path)
+            old = best(lambda: readlines_append(path))
+            cold = best(lambda: (log.seq_path.unlink(missing_ok=True), log.append("appended")))
+            warm = best(lambda: log.append("appended"))
+            print(f"{size:>9} records: readlines {old:8.2f} ms   tail-seek {cold:6.2f} ms   sidecar {warm:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
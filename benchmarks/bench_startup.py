@@ -0,0 +1,34 @@
+"""
+Benchmark: the import time of the `dw6` entry point against its budget.
+
+Imports dw6.main in ROUNDS fresh interpreters with `-X importtime` and reports
+the best time against ENTRY_POINT_BUDGET_MS, which is all a light command pays
+before it starts working. Exits with status 1 when the budget is exceeded.
+
+    python benchmarks/bench_startup.py
+"""
+
+import os
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC))
+os.environ["PYTHONPATH"] = str(SRC)  # For the fresh interpreters
+
+from dw6.startup_report import ENTRY_POINT_BUDGET_MS, module_import_ms  # noqa: E402
+
+ROUNDS = 5
+
+
+def main():
+    timings = [module_import_ms("dw6.main") for _ in range(ROUNDS)]
+    best = min(timings)
+    print(f"import dw6.main: best {best:6.1f} ms   worst {max(timings):6.1f} ms   budget {ENTRY_POINT_BUDGET_MS} ms")
+    if best >= ENTRY_POINT_BUDGET_MS:
+        print("OVER BUDGET")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: finding the tags on HEAD in a repository with many tags.
+
+Builds a throwaway repository with TAGS tags (half lightweight, half annotated,
+packed like a long-lived release repository) and compares the GitPython scan the
+Deployer check used to do with the cached tag index.
+
+    python benchmarks/bench_tag_lookup.py [TAGS]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from dw6 import git_handler  # noqa: E402
+
+TAGS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+
+
+def git(repo, *args, stdin=None):
+    return subprocess.run(["git", "-C", str(repo), *args], input=stdin, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def build_repo(repo: Path):
+    git(repo, "init", "-q")
+    git(repo, "config", "user.email", "bench@example.com")
+    git(repo, "config", "user.name", "bench")
+    (repo / "file.txt").write_text("0\n")
+    git(repo, "add", ".")
+    git(repo, "commit", "-q", "-m", "base")
+    base = git(repo, "rev-parse", "HEAD").strip()
+    git(repo, "update-ref", "--stdin", stdin="".join(f"create refs/tags/light-{i} {base}\n" for i in range(TAGS // 2)))
+    # Annotated tags in bulk: fast-import writes all tag objects in one process
+    stream = "".join(
+        f"tag release-{i}\nfrom {base}\ntagger bench <bench@example.com> 0 +0000\ndata 8\nrelease\n\n"
+        for i in range(TAGS - TAGS // 2)
+    )
+    subprocess.run(["git", "-C", str(repo), "fast-import", "--quiet"], input=stream, check=True, text=True)
+    git(repo, "pack-refs", "--all")
+    (repo / "file.txt").write_text("1\n")
+    git(repo, "commit", "-q", "-am", "head")
+    head = git(repo, "rev-parse", "HEAD").strip()
+    git(repo, "tag", "-a", "v-head", "-m", "head release")
+    return head
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<34}{(time.perf_counter() - started) * 1000:>10.1f} ms")
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = Path(tmp)
+        print(f"Building a repository with {TAGS} tags...")
+        head = build_repo(repo)
+
+        manager = git_handler.GitManager(str(repo))
+        scan = timed("GitPython scan of repo.tags", lambda: [t.name for t in manager.repo.tags if t.commit.hexsha == head])
+        cold = timed("tag index, cold (builds cache)", lambda: manager.tags_at(head))
+        warm_manager = git_handler.GitManager(str(repo))
+        warm = timed("tag index, warm (new process)", lambda: warm_manager.tags_at(head))
+        timed("tag index, in-process lookup", lambda: warm_manager.tags_at(head))
+        assert scan == cold == warm == ["v-head"], (scan, cold, warm)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("GIT_CONFIG_GLOBAL", os.devnull)
+    main()
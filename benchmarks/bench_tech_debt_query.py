@@ -0,0 +1,51 @@
+"""
+Benchmark: `dw6 tech-debt list` filters on large technical debt logs.
+
+Builds logs of SIZES records, then times building the SQLite index from scratch,
+a filtered query once the index is current, and the incremental catch-up after
+one more item is registered.
+
+    python benchmarks/bench_tech_debt_query.py
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from dw6.tech_debt import TechDebtStore  # noqa: E402
+
+SIZES = (10_000, 50_000, 500_000)
+ROUNDS = 5
+
+
+def write_log(path: Path, size: int):
+    with open(path, "w") as f:
+        for n in range(1, size + 1):
+            status = "OPEN" if n % 100 == 0 else "RESOLVED"
+            f.write(f"[ID:{n}] [TS:2024-01-01 00:00:00 UTC] [TYPE:test] [STATUS:{status}] [REQ:{n % 40}] item {n}\n")
+
+
+def timed(action) -> float:
+    started = time.perf_counter()
+    action()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            store = TechDebtStore(Path(tmp) / f"technical_debt_{size}.log", Path(tmp) / f"index_{size}.sqlite")
+            write_log(store.log.path, size)
+            build = timed(lambda: store.query(status="OPEN"))
+            query = min(timed(lambda: store.query(status="OPEN", requirement=0)) for _ in range(ROUNDS))
+            store.register("one more")
+            catch_up = timed(lambda: store.query(status="OPEN", requirement=0))
+            print(f"{size:>9} records: index build {build:8.1f} ms   query {query:6.2f} ms   "
+                  f"catch-up {catch_up:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
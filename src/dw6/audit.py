@@ -0,0 +1,132 @@
+# dw6/audit.py
+"""
+The audit log, logs/audit.log, and the queries behind `dw6 audit query`.
+
+Every entry is one line, `<ISO 8601 time> - <event> by user: <user>`. Kernel
+locks and unlocks are recorded, and so is every action the Governor denies, whether
+through `dw6 do`, `do --batch` or the Governor service, as `GOVERNOR DENIED
+[<stage>] <action>` events. Entries are written under the
+log's lock with the time taken under it, so the lines are sorted by time.
+
+A query never scans the whole log. The active file is memory-mapped and the
+window [since, until) is found by binary search on the line times, so only the
+lines inside it are read and filtered. Rotated segments (see dw6.log_segments)
+are skipped by the time range in their manifest entry, and within a segment the
+reader starts at the block holding `since`.
+"""
+
+import bisect
+import mmap
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from dw6.history import parse_timestamp
+from dw6.locking import lock_for
+from dw6.log_segments import SegmentedLog, line_time
+
+AUDIT_LOG_FILE = Path("logs/audit.log")
+DENIAL_EVENT = "GOVERNOR DENIED"
+USER_SEPARATOR = " by user: "
+
+
+def log_event(event: str, log_file=None):
+    """Appends an event, attributed to the current user, to the audit log."""
+    log_events([event], log_file)
+
+
+def log_events(events, log_file=None):
+    """Appends several events with one lock and one write."""
+    log_file = Path(log_file or AUDIT_LOG_FILE)
+    log_file.parent.mkdir(exist_ok=True)
+    user = os.getenv("USER", "unknown")
+    # Take the timestamp under the lock so concurrent writers keep the log in time order
+    with lock_for(log_file):
+        timestamp = datetime.now(timezone.utc).isoformat()
+        with open(log_file, "a") as f:
+            # One entry per line, whatever the event text holds
+            f.write("".join(f"{timestamp} - {' '.join(event.splitlines())}{USER_SEPARATOR}{user}\n" for event in events))
+
+
+def log_denials(stage: str, actions, log_file=None):
+    """Records the actions the Governor denied in a stage, if any."""
+    if actions:
+        log_events([f"{DENIAL_EVENT} [{stage}] {action}" for action in actions], log_file)
+
+
+def parse_entry(line: bytes) -> dict:
+    """Splits an audit line into its time, event and user."""
+    text = line.decode("utf-8", errors="replace").rstrip("\n")
+    ts, _, rest = text.partition(" - ")
+    event, separator, user = rest.rpartition(USER_SEPARATOR)
+    if not separator:
+        event, user = rest, ""
+    return {"ts": ts, "event": event, "user": user}
+
+
+def query(since=None, until=None, user=None, event=None, denials=False, log_file=None):
+    """
+    Yields the entries logged in [since, until) that match every filter, oldest first.
+    Times are ISO 8601 (UTC unless an offset is given). event matches any part of the
+    event text, ignoring case. Governor denials are left out unless denials is true.
+    """
+    since = parse_timestamp(since) if since else None
+    until = parse_timestamp(until) if until else None
+    event = event.lower() if event else None
+    for line in _window(SegmentedLog(log_file or AUDIT_LOG_FILE), since, until):
+        entry = parse_entry(line)
+        if user is not None and entry["user"] != user:
+            continue
+        if event is not None and event not in entry["event"].lower():
+            continue
+        if not denials and entry["event"].startswith(DENIAL_EVENT):
+            continue
+        yield entry
+
+
+def _line_key(line: bytes) -> str:
+    return line_time(line) or ""  # A line without a time sorts first and never ends a window
+
+
+def _window(log, since, until):
+    """Yields the raw lines of the log, segments first, whose time is in [since, until)."""
+    for segment in log.segments():
+        if since and segment["last_ts"] and segment["last_ts"] < since:
+            continue
+        if until and segment["first_ts"] and segment["first_ts"] >= until:
+            return
+        blocks = log.blocks(segment)
+        position = max(bisect.bisect_left([block[2] or "" for block in blocks], since or "") - 1, 0)
+        offset = segment["start"] + blocks[position][0]
+        for line in log.lines_from(offset):
+            if offset >= segment["end"]:
+                break
+            offset += len(line)
+            key = _line_key(line)
+            if until and key >= until:
+                return
+            if not since or key >= since:
+                yield line
+    if not log.path.exists() or not log.path.stat().st_size:
+        return
+    with open(log.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        position = _first_at_or_after(mapped, since) if since else 0
+        end = _first_at_or_after(mapped, until) if until else len(mapped)
+        while position < end:
+            newline = mapped.find(b"\n", position, end)
+            line_end = end if newline < 0 else newline + 1
+            yield mapped[position:line_end]
+            position = line_end
+
+
+def _first_at_or_after(mapped, when: str) -> int:
+    """Returns the offset of the first line logged at or after a time, by binary search over the lines."""
+    low, high = 0, len(mapped)  # Both are always line starts
+    while low < high:
+        start = mapped.rfind(b"\n", low, (low + high) // 2) + 1 or low
+        newline = mapped.find(b"\n", start, high)
+        end = high if newline < 0 else newline + 1
+        if _line_key(mapped[start:end]) < when:
+            low = end
+        else:
+            high = start
+    return low
@@ -0,0 +1,120 @@
+# dw6/blobs.py
+"""
+Content-addressed storage for large captured outputs, such as the pytest output
+behind a technical debt item.
+
+A blob is stored gzip-compressed under logs/blobs/<first 2 hex digits>/<rest>.gz.
+It is named after the SHA-256 of its uncompressed content, so identical outputs
+are stored once. Blobs are written and read as streams and never held in memory
+whole. They are immutable, and are committed with the rest of logs/.
+
+Test output differs between runs of the same failure in its durations, times,
+object addresses and temporary paths. A blob stored with normalize=True is named
+after the output with those replaced by placeholders (VOLATILE), and without the
+lines of pytest's --durations report, whose order changes with the timings. The
+blob itself holds the output exactly as captured, by the first run that produced
+it; a failure that repeats maps to that blob.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+
+BLOB_DIR = Path("logs/blobs")
+CHUNK_SIZE = 64 * 1024
+VOLATILE = [
+    # pytest's summary line, whose = padding also depends on the duration's width
+    (re.compile(rb"^(?:=+ )?(.*) in \d+(?:\.\d+)?s(?: \(\d+:\d\d:\d\d\))?(?: =+)?(\r?)$"), rb"\1 in <duration>\2"),
+    (re.compile(rb"\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d(?:[.,]\d+)?(?:Z|[+-]\d\d:?\d\d| UTC)?"), b"<time>"),
+    (re.compile(rb"\b0x[0-9a-fA-F]{6,}\b"), b"0x<address>"),
+    (re.compile(rb"/pytest-of-[^/\s]+/pytest-\d+/"), b"/pytest-of-<user>/pytest-<n>/"),
+    (re.compile(rb"\b(tmp|dw6-[a-z]+-)[a-z0-9_]{8}\b"), rb"\1<random>"),  # tempfile names
+]
+DURATION_LINE = re.compile(rb"^(?:\d+\.\d+s (?:setup|call|teardown) |\(\d+ durations < )")
+
+
+class BlobStore:
+    def __init__(self, root=None):
+        self.root = Path(root or BLOB_DIR)
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest[2:]}.gz"
+
+    def put_chunks(self, chunks, normalize=False):
+        """
+        Stores the concatenation of byte chunks; returns the (digest, size) of its blob. With
+        normalize, the digest is that of the normalized content, while the content is stored
+        as is; output that normalizes to a stored blob's is not stored again.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        sha256, size = hashlib.sha256(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0, filename="") as f:
+
+                def stored():
+                    nonlocal size
+                    for chunk in chunks:
+                        size += len(chunk)
+                        f.write(chunk)
+                        yield chunk
+
+                for piece in normalize_output(stored()) if normalize else stored():
+                    sha256.update(piece)
+            digest = sha256.hexdigest()
+            path = self.path_for(digest)
+            if path.exists():
+                os.remove(tmp_path)  # Already stored
+                if normalize:  # Possibly from output that differed in its volatile parts
+                    size = sum(len(chunk) for chunk in self.stream(digest))
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, size
+
+    def put_bytes(self, data: bytes, normalize=False):
+        return self.put_chunks([data], normalize)
+
+    def put_files(self, paths, normalize=False):
+        """Stores the concatenated contents of files, streaming them."""
+        return self.put_chunks(_read_chunks(paths), normalize)
+
+    def exists(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def stream(self, digest: str, chunk_size=CHUNK_SIZE):
+        """Yields the uncompressed content of a blob. Raises FileNotFoundError if it is missing."""
+        with gzip.open(self.path_for(digest), "rb") as f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+
+
+def normalize_output(chunks):
+    """Yields the lines of command output with the VOLATILE parts replaced by placeholders, for naming blobs."""
+    rest = b""
+    for chunk in chunks:
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            if not DURATION_LINE.match(line):
+                yield _normalize_line(line) + b"\n"
+    if rest and not DURATION_LINE.match(rest):
+        yield _normalize_line(rest)
+
+
+def _normalize_line(line: bytes) -> bytes:
+    for pattern, placeholder in VOLATILE:
+        line = pattern.sub(placeholder, line)
+    return line
+
+
+def _read_chunks(paths):
+    for path in paths:
+        with open(path, "rb") as f:
+            yield from iter(lambda: f.read(CHUNK_SIZE), b"")
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # Define the root directory of the project
@@ -5,3 +6,32 @@ PROJECT_ROOT = Path.cwd()
 
 # Path to the file that stores the SHA of the last approved commit
 LAST_COMMIT_FILE = PROJECT_ROOT / "logs" / ".last_commit_sha"
+
+# Path to the project configuration holding the [tool.dw6] table
+PYPROJECT_FILE = Path("pyproject.toml")
+
+
+def load_pyproject(pyproject_path=PYPROJECT_FILE) -> dict:
+    """Returns the parsed pyproject.toml, or an empty dict if there is none."""
+    pyproject_path = Path(pyproject_path)
+    if not pyproject_path.exists():
+        return {}
+    try:
+        import tomllib
+        with open(pyproject_path, "rb") as f:
+            return tomllib.load(f)
+    except ImportError:  # Python < 3.11
+        import toml
+        return toml.load(pyproject_path)
+
+
+def load_tool_config(pyproject_path=PYPROJECT_FILE) -> dict:
+    """Returns the [tool.dw6] table of pyproject.toml, or an empty dict if there is none."""
+    return load_pyproject(pyproject_path).get("tool", {}).get("dw6", {})
+
+
+def package_env() -> dict:
+    """Returns os.environ with this dw6 importable, for child processes that load dw6 modules."""
+    package_root = str(Path(__file__).resolve().parent.parent)
+    python_path = os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")]))
+    return {**os.environ, "PYTHONPATH": python_path}
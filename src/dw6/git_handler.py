@@ -1,46 +1,106 @@
 import sys
 import os
+import shutil
 import subprocess
+import tempfile
+from fnmatch import fnmatch
 from pathlib import Path
-from dotenv import load_dotenv
-import git
 
-# Load environment variables from .env file
-load_dotenv()
+# GitPython and python-dotenv are imported where they are used, so importing this
+# module (and everything that depends on it) stays cheap for commands that never
+# touch the repository.
+
+# Default caps for diffs streamed into deliverables; overridable via [tool.dw6.diff]
+DIFF_MAX_FILE_BYTES = 1024 * 1024
+DIFF_MAX_TOTAL_BYTES = 20 * 1024 * 1024
+DIFF_GENERATED_PATTERNS = ["*.lock", "*.min.js", "*.min.css", "*.map", "package-lock.json"]
+
+# Answers git's credential requests with the token from the environment of the git process
+CREDENTIAL_HELPER = '!f() { test "$1" = get && echo username=x-access-token && echo "password=$GITHUB_TOKEN"; }; f'
+
+# Number of space separated fields before the path in `git status --porcelain=v2` records
+STATUS_FIELDS = {"1": 8, "2": 9, "u": 10}
+
+_sessions = {}
+
+
+class PushError(RuntimeError):
+    """Raised when the remote rejects a push or cannot be reached."""
+
+
+def get_session(project_path=None) -> "GitManager":
+    """Returns the process-wide GitManager for a project, opening the repository only once."""
+    path = Path(project_path or Path.cwd()).resolve()
+    manager = _sessions.get(path)
+    if manager is None:
+        manager = _sessions[path] = GitManager(str(path))
+    return manager
+
+
+def reset_sessions():
+    """Forgets all cached sessions, e.g. after the repository was changed behind dw6's back."""
+    _sessions.clear()
+
 
 class GitManager:
     """A class to manage all Git operations for the DW7 protocol."""
 
+    # Number of git subprocesses spawned by this process, across all managers
+    subprocess_count = 0
+
     def __init__(self, project_path: str):
         self.project_path = Path(project_path)
         if not self.project_path.is_dir():
             raise ValueError(f"Project path does not exist: {project_path}")
         self.repo = self._get_repo()
+        self._cache = {}
+        self._status_options_cache = None
+        self._timeout = False  # Looked up on first use; None disables it
 
-    def _run_command(self, command: list[str], suppress_output=False):
-        """Runs a command in the project directory and handles errors."""
-        try:
-            # Ensure the environment for the subprocess is clean and correct
-            env = os.environ.copy()
-            result = subprocess.run(
-                command,
-                cwd=self.project_path,
-                check=True,
-                capture_output=True,
-                text=True,
-                env=env
-            )
-            if not suppress_output:
-                print(result.stdout)
-            return result
-        except subprocess.CalledProcessError as e:
-            print(f"ERROR running command: {' '.join(command)}", file=sys.stderr)
-            print(f"STDOUT: {e.stdout}", file=sys.stderr)
-            print(f"STDERR: {e.stderr}", file=sys.stderr)
+    def invalidate_cache(self):
+        """Drops cached HEAD, branch and ref lookups. Called after every write dw6 makes."""
+        self._cache.clear()
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def _git_timeout(self):
+        """Returns the git step timeout from the project's [tool.dw6.timeouts], read once per manager."""
+        from dw6 import runner
+        if self._timeout is False:
+            self._timeout = runner.step_timeout("git", self.project_path / "pyproject.toml")
+        return self._timeout
+
+    def _run_command(self, command: list[str], suppress_output=False, input=None, env=None):
+        """Runs a command in the project directory and handles errors, including a timeout."""
+        from dw6 import runner
+        GitManager.subprocess_count += 1
+        # Ensure the environment for the subprocess is clean and correct
+        result = runner.run(
+            command,
+            cwd=self.project_path,
+            env={**os.environ, **(env or {})},
+            input=input,
+            timeout=self._git_timeout(),
+            echo=False,
+            capture_stdout=True,  # The output of a git command is its result
+        )
+        if not result.ok:
+            print(f"ERROR running command: {' '.join(command)} ({result.describe()})", file=sys.stderr)
+            print(f"STDOUT: {result.stdout}", file=sys.stderr)
+            print(f"STDERR: {result.stderr}", file=sys.stderr)
+            if result.timed_out:
+                runner.record_failure("git", result)
             sys.exit(1)
+        if not suppress_output:
+            print(result.stdout)
+        return result
 
     def _get_repo(self):
         """Initializes and returns a git.Repo object, or None if not a repo."""
+        import git
         try:
             return git.Repo(self.project_path, search_parent_directories=True)
         except (git.InvalidGitRepositoryError, git.NoSuchPathError):
@@ -53,6 +113,8 @@ class GitManager:
             return
         print("Initializing Git repository...")
         self._run_command(["git", "init"])
+        self.invalidate_cache()
+        import git
         self.repo = git.Repo(self.project_path) # Re-initialize repo object
 
     def add_remote(self, remote_url: str):
@@ -64,15 +126,111 @@ class GitManager:
             print(f"Adding remote 'origin': {remote_url}")
             self._run_command(["git", "remote", "add", "origin", remote_url])
 
-    def commit_all(self, message: str):
-        """Adds all changes and commits them, handling the 'nothing to commit' case."""
-        print("Adding all files to staging...")
-        self._run_command(["git", "add", "."])
+    def _status_options(self) -> list:
+        """
+        Returns `git -c` options that speed up status scans: the untracked cache always,
+        and the built-in fsmonitor daemon where git supports it (macOS and Windows).
+        """
+        def compute():
+            options = ["-c", "core.untrackedCache=true"]
+            version = self._run_command(["git", "version"], suppress_output=True).stdout.split()[2]
+            major, minor = (int(part) for part in version.split(".")[:2])
+            if sys.platform in ("darwin", "win32") and (major, minor) >= (2, 36):
+                options += ["-c", "core.fsmonitor=true"]
+            return options
+        # Not part of the invalidated cache: the options only depend on the installed git
+        if self._status_options_cache is None:
+            self._status_options_cache = compute()
+        return self._status_options_cache
+
+    def status(self, paths=None) -> list:
+        """
+        Returns the working tree changes as (kind, xy, path, original_path) tuples, from
+        `git status --porcelain=v2 -z`. kind is "1" (changed), "2" (renamed or copied),
+        "u" (unmerged) or "?" (untracked); xy holds the index and worktree status
+        letters. paths optionally limits the scan to some files or directories.
+        """
+        command = ["git", *self._status_options(), "status", "--porcelain=v2", "-z"]
+        if paths:
+            command += ["--", *paths]
+        records = iter(self._run_command(command, suppress_output=True).stdout.split("\0"))
+        entries = []
+        for record in records:
+            kind = record[:1]
+            if kind == "?":
+                entries.append(("?", "??", record[2:], None))
+            elif kind in STATUS_FIELDS:
+                fields = record.split(" ", STATUS_FIELDS[kind])
+                original_path = next(records) if kind == "2" else None
+                entries.append((kind, fields[1], fields[-1], original_path))
+        return entries
+
+    def changed_files(self, since_commit) -> list:
+        """Returns the files changed since a commit, including uncommitted and untracked files."""
+        tracked = self._run_command(["git", "diff", "--name-only", "-z", since_commit, "--"], suppress_output=True).stdout
+        untracked = self._run_command(["git", "ls-files", "--others", "--exclude-standard", "-z"], suppress_output=True).stdout
+        return sorted({path for path in (tracked + untracked).split("\0") if path})
+
+    def tree_hash(self, exclude=()) -> str:
+        """
+        Returns the hash of the tree git would commit if every change in the working
+        tree, untracked files included, were staged, leaving out the paths in exclude.
+
+        The status scan says what changed: a clean tree is HEAD's, and otherwise only the
+        reported paths are staged, into a copy of the index, so the real index is untouched
+        and the rest of the tree is not walked again.
+        """
+        if not self.repo:
+            return None
+        entries = self.status(["."] + [f":(exclude){path}" for path in exclude])
+        if not entries and self.repo.head.is_valid():
+            return self.repo.head.commit.tree.hexsha
+        # Changes that are already fully staged are in the copied index
+        paths = [path for _, xy, path, _ in entries if xy[1] != "."]
+        with tempfile.TemporaryDirectory(prefix="dw6-index-") as tmp:
+            index = Path(tmp) / "index"
+            if os.path.exists(self.repo.index.path):
+                shutil.copyfile(self.repo.index.path, index)
+            env = {"GIT_INDEX_FILE": str(index)}
+            if paths:
+                self._run_command(
+                    ["git", "-C", self.repo.working_tree_dir, "--literal-pathspecs", "add", "--all",
+                     "--pathspec-from-file=-", "--pathspec-file-nul"],
+                    suppress_output=True, input="".join(f"{path}\0" for path in paths), env=env)
+            return self._run_command(["git", "write-tree"], suppress_output=True, env=env).stdout.strip()
+
+    def commit_all(self, message: str, incremental=True):
+        """
+        Adds all changes and commits them, handling the 'nothing to commit' case.
+
+        In incremental mode only the paths reported by `git status` are staged, and a
+        clean tree is detected before anything is run; otherwise the whole tree is
+        staged with `git add .`.
+        """
+        self.invalidate_cache()
+        if incremental:
+            entries = self.status()
+            if not entries:
+                print("Working directory is clean. Nothing to commit.")
+                return
+            # Changes that are already fully staged (including renames) need no 'git add'
+            paths = [path for _, xy, path, _ in entries if xy[1] != "."]
+            if paths:
+                print(f"Adding {len(paths)} changed path(s) to staging...")
+                # Status paths are relative to the top of the work tree, which the project may be below
+                self._run_command(
+                    ["git", "-C", self.repo.working_tree_dir, "--literal-pathspecs", "add", "--all",
+                     "--pathspec-from-file=-", "--pathspec-file-nul"],
+                    suppress_output=True, input="".join(f"{path}\0" for path in paths))
+        else:
+            print("Adding all files to staging...")
+            self._run_command(["git", "add", "."])
 
         print(f"Attempting to commit with message: {message}")
         command = ["git", "commit", "-m", message, "--no-verify"]
         
         # Run commit command directly to handle specific exit codes
+        GitManager.subprocess_count += 1
         result = subprocess.run(
             command,
             cwd=self.project_path,
@@ -95,92 +253,179 @@ class GitManager:
             print(f"STDERR: {result.stderr}", file=sys.stderr)
             sys.exit(1)
 
-    def get_changes(self, previous_commit_sha):
-        """Returns changed files and diff since a specific commit."""
+    def stream_diff(self, previous_commit_sha, sink, max_file_bytes=DIFF_MAX_FILE_BYTES,
+                    max_total_bytes=DIFF_MAX_TOTAL_BYTES, generated=DIFF_GENERATED_PATTERNS) -> list:
+        """
+        Streams the diff since a commit into a binary sink in a single git invocation.
+
+        Returns the changed files, collected from the diff headers of the same pass.
+        Sections of files matching a generated pattern are omitted, each file's section
+        is cut after max_file_bytes and the whole diff after max_total_bytes, so memory
+        use does not depend on the size of the change. Binary files appear as git's
+        one-line "Binary files ... differ" marker.
+        """
         if not previous_commit_sha:
-            return [], ""
-        try:
-            changed_files_str = self._run_command(["git", "diff", "--name-only", previous_commit_sha, "HEAD"]).stdout.strip()
-            changed_files = changed_files_str.split('\n') if changed_files_str else []
+            return []
+        command = ["git", "-c", "core.quotePath=false", "diff", "--no-color", "--no-ext-diff", previous_commit_sha, "HEAD"]
+        GitManager.subprocess_count += 1
+        # stderr goes to a file, so git never blocks on a full stderr pipe while stdout is read
+        errors = tempfile.TemporaryFile()
+        process = subprocess.Popen(command, cwd=self.project_path, stdout=subprocess.PIPE, stderr=errors)
+        changed_files, total, file_bytes, skipped, omitted = [], 0, 0, 0, False
 
-            diff_str = self._run_command(["git", "diff", previous_commit_sha, "HEAD"]).stdout
-            return changed_files, diff_str
-        except subprocess.CalledProcessError as e:
-            print(f"Error getting changes: {e}", file=sys.stderr)
-            return [], ""
-
-    def _get_authenticated_url(self):
-        """Constructs an authenticated URL for the 'origin' remote."""
-        token = os.getenv("GITHUB_TOKEN")
-        if not token:
-            print("ERROR: GITHUB_TOKEN environment variable not set.", file=sys.stderr)
-            print("Please create a .env file in the project root with GITHUB_TOKEN=<your_token>", file=sys.stderr)
-            sys.exit(1)
+        def close_section():
+            if skipped and not omitted:
+                sink.write(f"... [{skipped} bytes of this file's diff truncated]\n".encode())
 
+        for line in process.stdout:
+            if line.startswith(b"diff --git "):
+                close_section()
+                path = _header_path(line)
+                changed_files.append(path)
+                file_bytes, skipped = 0, 0
+                omitted = path is not None and any(fnmatch(path, pattern) for pattern in generated)
+                if total < max_total_bytes:
+                    sink.write(line)
+                    total += len(line)
+                    if omitted:
+                        sink.write(b"... [generated file, diff omitted]\n")
+                continue
+            if changed_files and changed_files[-1] is None:
+                for prefix in (b"rename to ", b"+++ b/"):
+                    if line.startswith(prefix):
+                        changed_files[-1] = line[len(prefix):].rstrip(b"\n").decode(errors="replace")
+            if omitted or total >= max_total_bytes:
+                continue
+            if file_bytes + len(line) > max_file_bytes:
+                skipped += len(line)
+                continue
+            sink.write(line)
+            file_bytes += len(line)
+            total += len(line)
+        close_section()
+        if total >= max_total_bytes:
+            sink.write(f"... [diff truncated after {max_total_bytes} bytes]\n".encode())
+        with errors:
+            returncode = process.wait()
+            errors.seek(0)
+            stderr = errors.read().decode(errors="replace")
+        if returncode != 0:
+            print(f"Error getting changes: {stderr}", file=sys.stderr)
+            return []
+        return [path for path in changed_files if path]
+
+    def _credential_options(self) -> list:
+        """
+        Returns `git -c` options that answer credential requests for 'origin' with the
+        GITHUB_TOKEN environment variable. The helper reads the token from the git
+        process's environment, so it never appears in .git/config or on a command line.
+        Raises PushError if there is no 'origin' or no token, so a detached outbox worker
+        can record the failure instead of exiting.
+        """
         if "origin" not in self.repo.remotes:
-            print("ERROR: Remote 'origin' not found.", file=sys.stderr)
-            sys.exit(1)
-        
-        remote_url = self.repo.remotes.origin.url
-        
-        # Use the 'x-access-token' convention for PATs
-        auth_url = remote_url.replace("https://", f"https://x-access-token:{token}@")
-        return auth_url
+            raise PushError("Remote 'origin' not found.")
+        if not self.repo.remotes.origin.url.startswith("https://"):
+            return []  # SSH and local remotes authenticate on their own
+
+        from dotenv import load_dotenv
+        load_dotenv()  # Load GITHUB_TOKEN from the project's .env file
+        if not os.getenv("GITHUB_TOKEN"):
+            raise PushError("GITHUB_TOKEN environment variable not set. "
+                            "Please create a .env file in the project root with GITHUB_TOKEN=<your_token>")
+        # An empty helper first clears any helpers configured for the user
+        return ["-c", "credential.helper=", "-c", f"credential.helper={CREDENTIAL_HELPER}"]
 
     def get_current_commit_sha(self):
         """Returns the SHA of the current HEAD commit."""
         try:
-            return self._run_command(["git", "rev-parse", "HEAD"]).stdout.strip()
+            return self._cached("HEAD", lambda: self._run_command(["git", "rev-parse", "HEAD"]).stdout.strip())
         except subprocess.CalledProcessError as e:
             print(f"Error getting current commit SHA: {e}", file=sys.stderr)
             return None
 
-    def push_to_remote(self, branch="master", set_upstream=False):
-        """Pushes changes to the remote repository using a temporarily authenticated URL."""
-        print(f"Pushing branch '{branch}' to remote 'origin'...")
-        
-        authenticated_url = self._get_authenticated_url()
-        original_url = self.repo.remotes.origin.url
+    def get_current_branch(self):
+        """Returns the name of the checked out branch."""
+        return self._cached(
+            "branch", lambda: self._run_command(["git", "rev-parse", "--abbrev-ref", "HEAD"], suppress_output=True).stdout.strip())
 
-        try:
-            # Temporarily set the remote URL to the authenticated version
-            self._run_command(["git", "remote", "set-url", "origin", authenticated_url], suppress_output=True)
-            
-            # Now, push using the standard 'origin' remote
-            command = ["git", "push"]
-            if set_upstream:
-                command.extend(["-u", "origin", branch])
-            
-            self._run_command(command, suppress_output=True)
-            print(f"Successfully pushed branch '{branch}' to remote 'origin'.")
-            
-        finally:
-            # CRITICAL: Always change the remote URL back to the original, unauthenticated version
-            self._run_command(["git", "remote", "set-url", "origin", original_url], suppress_output=True)
-            print("Restored original remote URL.")
-
-    def push_tags(self):
-        """Pushes all local tags to the remote repository."""
-        print("Pushing tags to remote 'origin'...")
-        
-        authenticated_url = self._get_authenticated_url()
-        original_url = self.repo.remotes.origin.url
+    def _peel_to_commits(self, refs: dict) -> dict:
+        """Resolves {tag: object id} to {tag: commit} with a single git call."""
+        names = list(refs)
+        GitManager.subprocess_count += 1
+        result = subprocess.run(
+            ["git", "cat-file", "--batch-check=%(objectname)"],
+            input="".join(f"{refs[name]}^{{commit}}\n" for name in names),
+            cwd=self.project_path, capture_output=True, text=True, check=True,
+        )
+        shas = result.stdout.splitlines()
+        # Tags of trees or blobs come back as "<name> missing" and point at no commit
+        return {name: sha if " " not in sha else None for name, sha in zip(names, shas)}
+
+    def tags_at(self, commit: str) -> list:
+        """Returns the tags pointing at a commit, from the cached tag index."""
+        from dw6.ref_index import TagIndex
+        index = self._cached("tags", lambda: TagIndex(self.repo.common_dir, self._peel_to_commits))
+        return index.tags_at(commit)
+
+    def _push(self, branch, tags=(), set_upstream=False):
+        """
+        Pushes a branch and tags to 'origin' atomically, raising PushError on failure.
+        The push runs under the git step timeout in its own process group, so a stalled
+        remote cannot hang the outbox worker, and a timeout is recorded as a step failure.
+        """
+        from dw6 import runner
+        refspecs = [f"refs/heads/{branch}"] + [f"refs/tags/{tag}" for tag in tags]
+        command = ["git", *self._credential_options(), "push", "--atomic", "--porcelain"]
+        if set_upstream:
+            command.append("-u")
+        GitManager.subprocess_count += 1
+        result = runner.run(command + ["origin", *refspecs], cwd=self.project_path, timeout=self._git_timeout(),
+                            echo=False, capture_stdout=True)
+        if result.timed_out:
+            runner.record_failure("git", result)
+            raise PushError(f"git push {result.describe()}.")
+        if result.returncode != 0:
+            raise PushError((result.stderr or result.stdout).strip())
 
+    def push_to_remote(self, branch=None, set_upstream=False, tags=()):
+        """
+        Pushes a branch (default: the current one) and the given tags to 'origin' in a
+        single atomic push: either every ref is updated on the remote or none is.
+        """
+        branch = branch or self.get_current_branch()
+        print(f"Pushing branch '{branch}'" + (f" and tags {', '.join(tags)}" if tags else "") + " to remote 'origin'...")
         try:
-            # Temporarily set the remote URL to the authenticated version
-            self._run_command(["git", "remote", "set-url", "origin", authenticated_url], suppress_output=True)
-            
-            # Now, push tags using the standard 'origin' remote
-            self._run_command(["git", "push", "origin", "--tags"])
-            print("Successfully pushed tags to remote 'origin'.")
-
-        finally:
-            # CRITICAL: Always change the remote URL back to the original, unauthenticated version
-            self._run_command(["git", "remote", "set-url", "origin", original_url], suppress_output=True)
-            print("Restored original remote URL.")
-
-    def is_working_directory_clean(self):
-        """Checks if the Git working directory is clean."""
+            self._push(branch, tags, set_upstream)
+        except PushError as e:
+            print(f"ERROR: Push to remote 'origin' failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Successfully pushed branch '{branch}' to remote 'origin'.")
+
+    def cleanliness(self, paths=None) -> dict:
+        """
+        Returns {"clean", "dirty", "untracked"} for the working tree, optionally scoped
+        to some paths. dirty counts tracked changes (staged, unstaged or unmerged),
+        untracked counts untracked files and directories.
+
+        The scan is git's own status, which the untracked cache and fsmonitor keep fast.
+        It is not cached here: an edit to the working tree changes neither the index nor
+        HEAD, so no cheap key could tell when a cached answer went stale.
+        """
         if not self.repo:
-            return True
-        return not self.repo.is_dirty(untracked_files=True)
+            return {"clean": True, "dirty": 0, "untracked": 0}
+        entries = self.status(paths)
+        untracked = sum(1 for kind, _, _, _ in entries if kind == "?")
+        return {"clean": not entries, "dirty": len(entries) - untracked, "untracked": untracked}
+
+    def is_working_directory_clean(self, paths=None):
+        """Checks if the Git working directory (or the given paths in it) is clean."""
+        return self.cleanliness(paths)["clean"]
+
+
+def _header_path(line: bytes):
+    """Returns the path of a 'diff --git a/<path> b/<path>' header, or None for renames."""
+    rest = line[len(b"diff --git "):].rstrip(b"\n")
+    length = (len(rest) - 5) // 2
+    if rest[:2] == b"a/" and rest[2:2 + length] == rest[length + 5:] and rest[length + 2:length + 5] == b" b/":
+        return rest[2:2 + length].decode(errors="replace")
+    return None
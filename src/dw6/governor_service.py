@@ -0,0 +1,180 @@
+# dw6/governor_service.py
+"""
+A long-lived Governor service for fast `dw6 do` authorizations.
+
+The service keeps the workflow state and the Governor rules in memory and serves
+authorization checks over a local Unix socket. The client half of this module only
+uses the standard library, so `dw6 do --daemon` never pays for FastAPI, GitPython or
+state parsing.
+"""
+
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+SOCKET_PATH = Path("logs/governor.sock")
+CLIENT_TIMEOUT = 2.0
+
+
+class GovernorService:
+    """Holds a Governor in memory and reloads it whenever the state file changes."""
+
+    def __init__(self):
+        from dw6.state_manager import STATE_FILE
+        self.state_file = Path(STATE_FILE)
+        self.governor = None
+        self._pipeline_governors = {}  # Requirement -> Governor, for the loaded state
+        self._signature = None
+        self.refresh()
+
+    def _stat_signature(self):
+        try:
+            st = self.state_file.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def refresh(self):
+        """Reloads the state and the Governor if the state file changed on disk."""
+        signature = self._stat_signature()
+        if self.governor is not None and signature == self._signature:
+            return False
+        from dw6.state_manager import Governor, WorkflowState
+        self.governor = Governor(WorkflowState())
+        self._pipeline_governors = {}
+        self._signature = self._stat_signature()
+        return True
+
+    def governor_for(self, req=None):
+        """Returns the Governor for a requirement pipeline, or for the single pointer when req is None."""
+        self.refresh()
+        if req is None:
+            return self.governor
+        governor = self._pipeline_governors.get(req)
+        if governor is None:
+            from dw6.state_manager import Governor
+            governor = self._pipeline_governors[req] = Governor(self.governor.state, req)
+        return governor
+
+    def authorize(self, action: str, req=None) -> dict:
+        governor = self.governor_for(req)
+        allowed = governor.is_allowed(action)
+        if allowed:
+            message = governor.approval_message()
+        else:
+            message = governor.denial_message(action)
+        return {"allowed": allowed, "stage": governor.current_stage, "message": message}
+
+    def authorize_batch(self, actions, req=None) -> list:
+        return list(self.governor_for(req).verdicts(actions))
+
+
+def create_app(service=None):
+    """Builds the FastAPI application serving a GovernorService."""
+    from typing import Optional
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    service = service or GovernorService()
+    app = FastAPI(title="DW6 Governor")
+
+    class AuthorizationRequest(BaseModel):
+        action: str
+        req: Optional[int] = None
+
+    class BatchAuthorizationRequest(BaseModel):
+        actions: list[str]
+        req: Optional[int] = None
+
+    @app.get("/health")
+    async def health():
+        service.refresh()
+        return {"status": "ok", "stage": service.governor.current_stage}
+
+    @app.post("/authorize")
+    async def authorize(request: AuthorizationRequest):
+        return service.authorize(request.action, request.req)
+
+    @app.post("/authorize/batch")
+    async def authorize_batch(request: BatchAuthorizationRequest):
+        return {"verdicts": service.authorize_batch(request.actions, request.req)}
+
+    return app
+
+
+def serve(socket_path=SOCKET_PATH):
+    """Runs the Governor service on a Unix socket until interrupted."""
+    import uvicorn
+
+    socket_path = Path(socket_path)
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        if request_health(socket_path) is not None:
+            print(f"ERROR: A Governor service is already running on {socket_path}.", file=sys.stderr)
+            sys.exit(1)
+        socket_path.unlink()  # Stale socket left behind by a killed service
+
+    app = create_app()
+    print(f"--- Governor service listening on {socket_path} ---")
+    try:
+        uvicorn.run(app, uds=str(socket_path), log_level="warning", access_log=False)
+    finally:
+        if socket_path.exists():
+            socket_path.unlink()
+    print("--- Governor service stopped ---")
+
+
+def _request(method, endpoint, payload=None, socket_path=SOCKET_PATH, timeout=CLIENT_TIMEOUT):
+    """Sends one request to the service. Returns the decoded JSON body, or None if unreachable.
+
+    This speaks just enough HTTP/1.1 over the raw socket to avoid importing http.client
+    (and with it ssl and email) on the authorization fast path.
+    """
+    socket_path = os.fspath(socket_path)
+    if not os.path.exists(socket_path):
+        return None
+    body = json.dumps(payload).encode() if payload is not None else b""
+    request = (
+        f"{method} {endpoint} HTTP/1.1\r\n"
+        f"Host: localhost\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n"
+    ).encode() + body
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        sock.sendall(request)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        head, _, data = b"".join(chunks).partition(b"\r\n\r\n")
+        status_line = head.split(b"\r\n", 1)[0].split()
+        if len(status_line) < 2 or status_line[1] != b"200":
+            return None
+        return json.loads(data)
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+def request_health(socket_path=SOCKET_PATH, timeout=CLIENT_TIMEOUT):
+    return _request("GET", "/health", socket_path=socket_path, timeout=timeout)
+
+
+def request_authorization(action: str, req=None, socket_path=SOCKET_PATH, timeout=CLIENT_TIMEOUT):
+    """Asks a running Governor service to authorize an action. Returns None if no service answered."""
+    return _request("POST", "/authorize", {"action": action, "req": req}, socket_path=socket_path, timeout=timeout)
+
+
+def request_batch_authorization(actions, req=None, socket_path=SOCKET_PATH, timeout=CLIENT_TIMEOUT):
+    """Asks a running Governor service for one verdict per action. Returns None if no service answered."""
+    response = _request("POST", "/authorize/batch", {"actions": list(actions), "req": req}, socket_path=socket_path, timeout=timeout)
+    return None if response is None else response["verdicts"]
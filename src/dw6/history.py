@@ -0,0 +1,234 @@
+# dw6/history.py
+"""
+Event-sourced history of the workflow state.
+
+Every stage transition, cycle completion and revert is appended to a compact JSON
+Lines event log, with a full state snapshot every SNAPSHOT_INTERVAL events. A
+derived index (rebuilt incrementally from the logs, so it can always be deleted)
+maps requirements to their events and times to snapshots, which lets `dw6 history`
+answer point-in-time questions without replaying git history. Its entries are
+appended to logs/.index/state_events.entries, and a small JSON header records how
+far the logs and the entries go, so recording an event costs the same however long
+the history has grown.
+"""
+
+import json
+import os
+from bisect import bisect_right
+from datetime import datetime, timezone
+from pathlib import Path
+from dw6.locking import lock_for
+
+EVENT_LOG_FILE = Path("logs/state_events.jsonl")
+SNAPSHOT_FILE = Path("logs/state_snapshots.jsonl")
+INDEX_FILE = Path("logs/.index/state_events.json")
+ENTRIES_FILE = Path("logs/.index/state_events.entries")
+SNAPSHOT_INTERVAL = 50
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+def timestamp(moment=None) -> str:
+    """Formats a moment (default: now) as a fixed-width UTC timestamp that sorts lexically."""
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+def parse_timestamp(value: str) -> str:
+    """Normalizes a user supplied ISO 8601 time (naive times are UTC) to the event log format."""
+    return timestamp(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def make_event(event_type: str, req, from_stage=None, to_stage=None, **fields) -> dict:
+    """Builds a timestamped event about one requirement."""
+    event = {"ts": timestamp(), "type": event_type, "req": int(req)}
+    if from_stage is not None:
+        event["from"] = from_stage
+    if to_stage is not None:
+        event["to"] = to_stage
+    event.update(fields)
+    return event
+
+
+def stage_after(event: dict) -> str:
+    """Returns the stage a requirement is in once the event has happened."""
+    return "Completed" if event["type"] == "complete" else event["to"]
+
+
+def apply_event(state: dict, event: dict) -> dict:
+    """Replays one event onto a state dictionary."""
+    if event.get("pipeline"):
+        key = f"Pipeline.{event['req']}"
+        if event["type"] == "complete":
+            state.pop(key, None)
+        else:
+            state[key] = event["to"]
+    elif event["type"] == "complete":
+        state["RequirementPointer"] = str(event["next_req"])
+        state["CurrentStage"] = "Engineer"
+    elif event["type"] in ("transition", "revert"):
+        state["CurrentStage"] = event["to"]
+    return state
+
+
+class StateHistory:
+    """Appends workflow events and answers point-in-time queries from the index."""
+
+    def __init__(self, log_file=EVENT_LOG_FILE, snapshot_file=SNAPSHOT_FILE, index_file=INDEX_FILE,
+                 entries_file=ENTRIES_FILE):
+        self.log_file = Path(log_file)
+        self.snapshot_file = Path(snapshot_file)
+        self.index_file = Path(index_file)
+        self.entries_file = Path(entries_file)
+
+    def _empty_head(self) -> dict:
+        return {"offset": 0, "last_seq": 0, "since_snapshot": 0, "snapshot_offset": 0, "entries_size": 0}
+
+    def _load_head(self) -> dict:
+        """Reads the index header: how far the logs are indexed, and how much of the entries file is valid."""
+        try:
+            with open(self.index_file, "r") as f:
+                head = json.load(f)
+        except (FileNotFoundError, ValueError):
+            head = self._empty_head()
+        log_size = self.log_file.stat().st_size if self.log_file.exists() else 0
+        entries_size = self.entries_file.stat().st_size if self.entries_file.exists() else 0
+        if "entries_size" not in head or head["offset"] > log_size or head["entries_size"] > entries_size:
+            head = self._empty_head()  # An older index, or the log was replaced; rebuild from scratch
+        return head
+
+    def _load_index(self) -> dict:
+        """Returns the header with the requirements and snapshots of every entry, up to date with the logs."""
+        head = self._load_head()
+        new_entries = []
+        self._catch_up(head, new_entries)
+        index = {**head, "requirements": {}, "snapshots": []}
+        lines = []
+        if head["entries_size"]:
+            with open(self.entries_file, "rb") as f:
+                lines = f.read(head["entries_size"]).decode().splitlines()
+        for line in lines + new_entries:
+            fields = line.rstrip("\n").split("\t")
+            if fields[0] == "e":
+                index["requirements"].setdefault(fields[1], []).append([fields[2], int(fields[3])])
+            else:
+                index["snapshots"].append([fields[1], int(fields[2]), int(fields[3]), int(fields[4])])
+        return index
+
+    def _catch_up(self, head: dict, entries: list):
+        """Queues entries for any events and snapshots appended since the index was last written."""
+        if self.log_file.exists():
+            with open(self.log_file, "rb") as f:
+                f.seek(head["offset"])
+                for line in iter(f.readline, b""):
+                    if not line.endswith(b"\n"):
+                        break  # A partially written event; index it once it is complete
+                    self._index_event(head, entries, json.loads(line), head["offset"])
+                    head["offset"] += len(line)
+        if self.snapshot_file.exists():
+            with open(self.snapshot_file, "rb") as f:
+                f.seek(head["snapshot_offset"])
+                for line in iter(f.readline, b""):
+                    if not line.endswith(b"\n"):
+                        break
+                    snapshot = json.loads(line)
+                    entries.append(f"s\t{snapshot['ts']}\t{snapshot['seq']}\t{snapshot['event_offset']}\t{head['snapshot_offset']}\n")
+                    head["since_snapshot"] = head["last_seq"] - snapshot["seq"]
+                    head["snapshot_offset"] += len(line)
+
+    def _index_event(self, head: dict, entries: list, event: dict, offset: int):
+        entries.append(f"e\t{event['req']}\t{event['ts']}\t{offset}\n")
+        head["last_seq"] = event["seq"]
+        head["since_snapshot"] += 1
+
+    def _save_index(self, head: dict, entries: list):
+        """Appends entries after the valid part of the entries file, then writes the header."""
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.entries_file, "ab") as f:
+            f.truncate(head["entries_size"])  # Entries of an interrupted append, which the header never counted
+            f.write("".join(entries).encode())
+            head["entries_size"] = f.tell()
+        tmp_path = self.index_file.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(head, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_file)
+
+    def append(self, events, state_data: dict):
+        """Appends events to the log, snapshotting the resulting state when due."""
+        if not events:
+            return
+        with lock_for(self.log_file):
+            self._append_locked(events, state_data)
+
+    def _append_locked(self, events, state_data: dict):
+        head, entries = self._load_head(), []
+        self._catch_up(head, entries)
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_file, "ab") as f:
+            for event in events:
+                event = {"seq": head["last_seq"] + 1, **event}
+                line = (json.dumps(event, separators=(",", ":")) + "\n").encode()
+                f.write(line)
+                self._index_event(head, entries, event, head["offset"])
+                head["offset"] += len(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if head["since_snapshot"] >= SNAPSHOT_INTERVAL:
+            snapshot = {"ts": events[-1]["ts"], "seq": head["last_seq"], "event_offset": head["offset"], "state": state_data}
+            with open(self.snapshot_file, "ab") as f:
+                f.write((json.dumps(snapshot, separators=(",", ":")) + "\n").encode())
+            head["since_snapshot"] = 0
+            self._catch_up(head, entries)
+        self._save_index(head, entries)
+
+    def _read_event(self, f, offset: int) -> dict:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+    def transitions(self, requirement) -> list:
+        """Returns every event recorded for a requirement, oldest first."""
+        entries = self._load_index()["requirements"].get(str(requirement), [])
+        if not entries:
+            return []
+        with open(self.log_file, "rb") as f:
+            return [self._read_event(f, offset) for _, offset in entries]
+
+    def stage_at(self, requirement, when: str):
+        """Returns (stage, event) for a requirement at a timestamp, or (None, None) before it started."""
+        entries = self._load_index()["requirements"].get(str(requirement), [])
+        position = bisect_right([ts for ts, _ in entries], when)
+        if position == 0:
+            return None, None
+        with open(self.log_file, "rb") as f:
+            event = self._read_event(f, entries[position - 1][1])
+        return stage_after(event), event
+
+    def state_at(self, when: str) -> dict:
+        """Rebuilds the workflow state at a timestamp from the nearest snapshot and the events after it."""
+        index = self._load_index()
+        snapshots = index["snapshots"]
+        position = bisect_right([entry[0] for entry in snapshots], when)
+        state, offset = {}, 0
+        if position:
+            _, _, offset, snapshot_offset = snapshots[position - 1]
+            with open(self.snapshot_file, "rb") as f:
+                state = dict(self._read_event(f, snapshot_offset)["state"])
+        if not self.log_file.exists():
+            return state
+        with open(self.log_file, "rb") as f:
+            f.seek(offset)
+            for line in iter(f.readline, b""):
+                event = json.loads(line)
+                if event["ts"] > when:
+                    break
+                apply_event(state, event)
+        return state
+
+    def latest(self) -> dict:
+        """Returns the most recent event of every requirement, keyed by requirement."""
+        requirements = self._load_index()["requirements"]
+        if not requirements:
+            return {}
+        with open(self.log_file, "rb") as f:
+            return {req: self._read_event(f, entries[-1][1]) for req, entries in requirements.items()}
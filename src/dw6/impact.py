@@ -0,0 +1,125 @@
+# dw6/impact.py
+"""
+Change-aware test selection for the Validator stage.
+
+A full run in impact mode also records coverage with per-test contexts. From it dw6
+builds logs/test_impact.json, which maps every source file to the tests that
+execute it, and the map is saved only if that run passed. Later runs look at the
+files changed since the commit the map was built at, committed or not, and run:
+
+- every test in a changed test file;
+- every test that executed a changed source file.
+
+Everything runs, and the map is rebuilt, when there is no map yet, when the map's
+commit is missing or no longer an ancestor of HEAD, when a configuration file
+changed, or when a changed Python source file is not in the map (a new module, or
+one that only ran outside of tests, such as at import time during collection).
+Coverage cannot see files read at run time (data files, templates), so changes to
+those only select tests through the test files themselves.
+"""
+
+import glob
+import importlib.util
+import json
+import os
+from fnmatch import fnmatch
+from pathlib import Path
+
+IMPACT_FILE = Path("logs/test_impact.json")
+COVERAGE_FILE = Path("logs/.coverage.impact")
+COVERAGE_ARGS = ["--cov=.", "--cov-context=test", "--cov-report="]
+CONFIG_FILES = {"pyproject.toml", "uv.lock", "pytest.ini", "setup.cfg", "setup.py", "tox.ini",
+                "conftest.py", "requirements.txt"}
+TEST_FILE_PATTERNS = ("test_*.py", "*_test.py")
+
+
+def coverage_available() -> bool:
+    """Whether pytest-cov (and with it coverage) is installed for this interpreter."""
+    return importlib.util.find_spec("pytest_cov") is not None
+
+
+def is_test_file(path: str) -> bool:
+    return any(fnmatch(os.path.basename(path), pattern) for pattern in TEST_FILE_PATTERNS)
+
+
+def clear_coverage(coverage_file=None):
+    """Removes the coverage data of earlier runs, including per-shard files."""
+    for path in glob.glob(f"{coverage_file or COVERAGE_FILE}*"):
+        os.remove(path)
+
+
+def tests_by_source(coverage_file=None) -> dict:
+    """Reads coverage data recorded with test contexts into {source file: [test ids]}."""
+    from coverage import CoverageData
+    sources = {}
+    for path in glob.glob(f"{coverage_file or COVERAGE_FILE}*"):
+        data = CoverageData(basename=path)
+        data.read()
+        for measured in data.measured_files():
+            source = os.path.relpath(measured)
+            if source.startswith(".."):
+                continue
+            tests = sources.setdefault(source, set())
+            for contexts in (data.contexts_by_lineno(measured) or {}).values():
+                # pytest-cov names contexts "<test id>|setup", "<test id>|run" or "<test id>|teardown"
+                tests.update(context.rsplit("|", 1)[0] for context in contexts if context)
+    return {source: sorted(tests) for source, tests in sources.items() if tests}
+
+
+def existing_files(selection) -> list:
+    """Returns the test files a selection touches that still exist."""
+    return sorted({entry.split("::", 1)[0] for entry in selection if Path(entry.split("::", 1)[0]).exists()})
+
+
+class ImpactMap:
+    """The test-to-source map and the selection of tests affected by a change."""
+
+    def __init__(self, impact_file=None):
+        self.impact_file = Path(impact_file or IMPACT_FILE)
+        try:
+            with open(self.impact_file, "r") as f:
+                self.data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.data = None
+
+    def select(self, git_manager):
+        """
+        Returns (selection, reason). selection lists test ids and test files to run, or
+        is None when the whole suite must run.
+        """
+        from git import GitCommandError
+        if self.data is None:
+            return None, "no impact map has been recorded yet"
+        try:
+            if not git_manager.repo.is_ancestor(self.data["commit"], "HEAD"):
+                return None, f"the impact map's commit {self.data['commit'][:7]} is not an ancestor of HEAD"
+        except GitCommandError:
+            return None, f"the impact map's commit {self.data['commit'][:7]} is not in the repository"
+        changed = git_manager.changed_files(self.data["commit"])
+        for path in changed:
+            if os.path.basename(path) in CONFIG_FILES:
+                return None, f"{path} changed"
+        selection = set()
+        for path in changed:
+            if is_test_file(path):
+                selection.add(path)
+            elif path in self.data["sources"]:
+                selection.update(self.data["sources"][path])
+            elif path.endswith(".py"):
+                return None, f"{path} is not in the impact map"
+        return sorted(selection), f"{len(changed)} file(s) changed since {self.data['commit'][:7]}"
+
+    def savings(self, selection, durations: dict) -> str:
+        """Describes how many tests of the last full run a selection skipped, and the time saved."""
+        selected = set(selection)
+        skipped = [nodeid for nodeid in self.data["items"]
+                   if nodeid not in selected and nodeid.split("::", 1)[0] not in selected]
+        saved = sum(durations.get(nodeid, 0.0) for nodeid in skipped)
+        return f"Skipped {len(skipped)} of {len(self.data['items'])} tests, saving about {saved:.1f}s."
+
+    def rebuild(self, commit: str, report: dict, coverage_file=None):
+        """Saves a new map from a passing full run and the coverage it recorded."""
+        self.data = {"commit": commit, "items": report["items"], "sources": tests_by_source(coverage_file)}
+        self.impact_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.impact_file, "w") as f:
+            json.dump(self.data, f, indent=1, sort_keys=True)
@@ -0,0 +1,80 @@
+# dw6/install_cache.py
+"""
+Skips reinstalling test dependencies when nothing they depend on has changed.
+
+The fingerprint of an install covers pyproject.toml, uv.lock, the interpreter and
+the platform. It is written to logs/install_fingerprint.json after a successful
+install. A later install is skipped when every component still matches and the
+required distributions are still present in the interpreter's environment.
+"""
+
+import hashlib
+import importlib.metadata
+import json
+import platform
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from dw6.config import load_pyproject
+
+FINGERPRINT_FILE = Path("logs/install_fingerprint.json")
+INPUT_FILES = ("pyproject.toml", "uv.lock")
+REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def fingerprint() -> dict:
+    """Returns the components that determine what an install of the project produces."""
+    components = {}
+    for name in INPUT_FILES:
+        path = Path(name)
+        components[name] = hashlib.sha256(path.read_bytes()).hexdigest() if path.exists() else None
+    components["python"] = f"{sys.executable} {sys.version}"
+    components["platform"] = f"{platform.system()}-{platform.release()}-{platform.machine()}"
+    return components
+
+
+def required_distributions(extra="test") -> list:
+    """Returns the distributions an install of the project with an extra must provide."""
+    project = load_pyproject().get("project", {})
+    requirements = list(project.get("dependencies", []))
+    requirements += project.get("optional-dependencies", {}).get(extra, [])
+    # Requirements with environment markers may legitimately be absent, so they are not checked
+    names = [REQUIREMENT_NAME.match(requirement).group(1) for requirement in requirements if ";" not in requirement]
+    return ([project["name"]] if "name" in project else []) + names
+
+
+def missing_distributions(names) -> list:
+    """Returns the distributions that are not installed for this interpreter."""
+    missing = []
+    for name in names:
+        try:
+            importlib.metadata.distribution(name)
+        except importlib.metadata.PackageNotFoundError:
+            missing.append(name)
+    return missing
+
+
+def check(fingerprint_file=None):
+    """Returns (hit, reason): whether the recorded install can be reused, and why (not)."""
+    fingerprint_file = Path(fingerprint_file or FINGERPRINT_FILE)
+    try:
+        with open(fingerprint_file, "r") as f:
+            recorded = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False, "no recorded install"
+    changed = [name for name, value in fingerprint().items() if recorded["components"].get(name) != value]
+    if changed:
+        return False, f"{', '.join(changed)} changed"
+    missing = missing_distributions(required_distributions())
+    if missing:
+        return False, f"{', '.join(missing)} not installed"
+    return True, f"dependencies unchanged since {recorded['installed_at']}"
+
+
+def record(fingerprint_file=None):
+    """Records the fingerprint of a successful install."""
+    fingerprint_file = Path(fingerprint_file or FINGERPRINT_FILE)
+    fingerprint_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(fingerprint_file, "w") as f:
+        json.dump({"installed_at": datetime.now(timezone.utc).isoformat(), "components": fingerprint()}, f, indent=2)
@@ -4,9 +4,7 @@ import os
 import stat
 import toml
 from pathlib import Path
-from datetime import datetime, timezone
-
-AUDIT_LOG_FILE = Path("logs/audit.log")
+from dw6.audit import AUDIT_LOG_FILE, log_event
 
 class KernelManager:
     """Manages the locking and unlocking of protocol kernel files."""
@@ -32,13 +30,7 @@ class KernelManager:
 
     def _log_audit_event(self, event: str):
         """Logs an event to the audit log."""
-        AUDIT_LOG_FILE.parent.mkdir(exist_ok=True)
-        timestamp = datetime.now(timezone.utc).isoformat()
-        user = os.getenv("USER", "unknown")
-        log_entry = f"{timestamp} - {event} by user: {user}\n"
-        
-        with open(AUDIT_LOG_FILE, "a") as f:
-            f.write(log_entry)
+        log_event(event, AUDIT_LOG_FILE)
 
     def lock(self):
         """Sets kernel files to read-only."""
@@ -0,0 +1,79 @@
+# dw6/locking.py
+"""
+Advisory file locking shared by every dw6 read-modify-write and append path.
+
+Locks live in a `.locks` directory next to the file they protect (for example
+`logs/.locks/workflow_state.txt.lock`), so files that are replaced by atomic
+renames can still be locked. Locks are reentrant within a process, which lets a
+locked section call helpers that lock the same file again.
+"""
+
+import fcntl
+import os
+import time
+from pathlib import Path
+
+DEFAULT_TIMEOUT = 10.0
+LOCK_DIR_NAME = ".locks"
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a lock could not be acquired within its timeout."""
+
+
+class StateConflictError(RuntimeError):
+    """Raised when a compare-and-swap write finds the data was changed by another process."""
+
+
+class FileLock:
+    """An exclusive fcntl lock on a sidecar lock file, acquired with a timeout."""
+
+    _held = {}  # lock path -> [fd, depth] for locks held by this process
+
+    def __init__(self, lock_path, timeout=DEFAULT_TIMEOUT):
+        self.lock_path = Path(lock_path)
+        self.timeout = timeout
+
+    def acquire(self):
+        key = str(self.lock_path.resolve())
+        held = self._held.get(key)
+        if held:
+            held[1] += 1
+            return
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        delay = 0.001
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise LockTimeout(f"Timed out after {self.timeout}s waiting for lock {self.lock_path}")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        self._held[key] = [fd, 1]
+
+    def release(self):
+        key = str(self.lock_path.resolve())
+        held = self._held[key]
+        held[1] -= 1
+        if held[1] == 0:
+            del self._held[key]
+            fcntl.flock(held[0], fcntl.LOCK_UN)
+            os.close(held[0])
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def lock_for(path, timeout=DEFAULT_TIMEOUT) -> FileLock:
+    """Returns the lock guarding a data file."""
+    path = Path(path)
+    return FileLock(path.parent / LOCK_DIR_NAME / f"{path.name}.lock", timeout=timeout)
@@ -0,0 +1,211 @@
+# dw6/log_segments.py
+"""
+Size- and age-based rotation of the append-only logs into compressed segments.
+
+logs/audit.log, logs/approvals.log and the record logs (logs/meta_requirements.log,
+logs/technical_debt.log) would otherwise grow without bound, and commit_all commits
+them on every approval. Before that commit, the Governor rotates each log whose
+active file has passed max_bytes, or whose first line is older than max_age_days
+([tool.dw6.log_rotation]): the whole file becomes an immutable segment in
+logs/archive/<log name>/ and the active file starts empty. Rotation happens under
+the log's lock, so it always falls between whole records, and appends never pay
+for it.
+
+A segment is a series of independent gzip members of about BLOCK_SIZE bytes each,
+cut at line boundaries, so `zcat` still reads it and a reader can start at any
+block. <seq>.blocks.json lists each block's offsets and first timestamp, and
+manifest.json lists each segment's sequence number, ID range, time range and the
+range it covers in the log's logical offsets. Logical offsets run through the
+segments and on into the active file, so an offset taken before a rotation still
+points at the same line afterwards, and a reader opens at most one segment to
+reach it.
+"""
+
+import bisect
+import gzip
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from dw6.locking import lock_for
+
+ARCHIVE_DIR_NAME = "archive"
+ROTATED_LOGS = ("logs/audit.log", "logs/approvals.log", "logs/meta_requirements.log", "logs/technical_debt.log")
+MANIFEST_NAME = "manifest.json"
+BLOCK_SIZE = 64 * 1024
+DEFAULT_POLICY = {"max_bytes": 16 * 1024 * 1024, "max_age_days": 90}
+TIME = re.compile(rb"(\d{4}-\d\d-\d\d)[T ](\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]\d\d:\d\d| UTC)?")
+_HEADER_ID = re.compile(rb"\[ID:(\d+)\]")
+
+
+def rotation_policy(pyproject_path=None) -> dict:
+    """Returns max_bytes and max_age_days from [tool.dw6.log_rotation]; 0 disables either."""
+    from dw6.config import PYPROJECT_FILE, load_tool_config
+    return {**DEFAULT_POLICY, **load_tool_config(pyproject_path or PYPROJECT_FILE).get("log_rotation", {})}
+
+
+def line_time(line: bytes):
+    """Returns the first timestamp in a log line in the history timestamp format, or None."""
+    from dw6.history import parse_timestamp
+    match = TIME.search(line, 0, 200)
+    if not match:
+        return None
+    date, clock, fraction, zone = (part.decode() if part else "" for part in match.groups())
+    return parse_timestamp(f"{date}T{clock}{fraction[:7]}{'+00:00' if zone == ' UTC' else zone}")
+
+
+class SegmentedLog:
+    """An append-only log file together with its rotated segments."""
+
+    def __init__(self, path, archive_dir=None):
+        self.path = Path(path)
+        self.archive_dir = Path(archive_dir or self.path.parent / ARCHIVE_DIR_NAME) / self.path.name
+        self.manifest_path = self.archive_dir / MANIFEST_NAME
+
+    def segments(self) -> list:
+        """Returns the manifest entries of the rotated segments, oldest first."""
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)["segments"]
+        except FileNotFoundError:
+            return []
+
+    def base(self, segments=None) -> int:
+        """Returns the logical offset of the active file's first byte."""
+        segments = self.segments() if segments is None else segments
+        return segments[-1]["end"] if segments else 0
+
+    def end(self) -> int:
+        """Returns the logical offset just past the last line of the log."""
+        size = self.path.stat().st_size if self.path.exists() else 0
+        return self.base() + size
+
+    def last_id(self) -> int:
+        """Returns the last record ID in the rotated segments, or 0."""
+        return next((segment["last_id"] for segment in reversed(self.segments()) if segment["last_id"]), 0)
+
+    def lines_from(self, offset: int = 0):
+        """Yields the log's lines, as bytes, from a logical offset to the end, across segments."""
+        segments = self.segments()
+        base = self.base(segments)
+        if offset < base:
+            position = bisect.bisect_right([segment["start"] for segment in segments], offset) - 1
+            for segment in segments[position:]:
+                yield from self._segment_lines(segment, max(offset - segment["start"], 0))
+            offset = base
+        if self.path.exists():
+            with open(self.path, "rb") as f:
+                f.seek(offset - base)
+                yield from f
+
+    def _segment_lines(self, segment: dict, skip: int):
+        """Yields a segment's lines from an uncompressed offset, decompressing from the block holding it."""
+        blocks = self.blocks(segment)
+        position = bisect.bisect_right([block[0] for block in blocks], skip) - 1
+        raw_start, compressed_start = blocks[position][:2]
+        with open(self.archive_dir / segment["file"], "rb") as f:
+            f.seek(compressed_start)
+            with gzip.GzipFile(fileobj=f, mode="rb") as lines:
+                lines.seek(skip - raw_start)
+                yield from lines
+
+    def blocks(self, segment: dict) -> list:
+        """Returns a segment's block table: [uncompressed offset, compressed offset, first timestamp]."""
+        with open(self.archive_dir / segment["blocks"], "r") as f:
+            return json.load(f)
+
+    def maybe_rotate(self, policy=None):
+        """Rotates the active file if it is over the size or age limit. Returns the new segment or None."""
+        policy = policy or rotation_policy()
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return None
+        if not size:
+            return None
+        if policy["max_bytes"] and size >= policy["max_bytes"]:
+            return self.rotate()
+        if policy["max_age_days"]:
+            from datetime import datetime, timedelta, timezone
+            from dw6.history import timestamp
+            with open(self.path, "rb") as f:
+                started = line_time(f.readline())
+            if started and started < timestamp(datetime.now(timezone.utc) - timedelta(days=policy["max_age_days"])):
+                return self.rotate()
+        return None
+
+    def rotate(self):
+        """Moves the whole active file into a new compressed segment. Returns its manifest entry, or None if empty."""
+        with lock_for(self.path):
+            if not self.path.exists() or not self.path.stat().st_size:
+                return None
+            segments = self.segments()
+            seq = segments[-1]["seq"] + 1 if segments else 1
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            segment = {"seq": seq, "file": f"{seq:06d}.gz", "blocks": f"{seq:06d}.blocks.json",
+                       "start": self.base(segments), "first_id": None, "last_id": None}
+            blocks = self._compress(segment)
+            segment["first_ts"] = next((block[2] for block in blocks if block[2]), None)
+            _write_json(self.archive_dir / segment["blocks"], blocks)
+            segments.append(segment)
+            _write_json(self.manifest_path, {"segments": segments})
+            # Only now that the manifest covers its lines is the active file emptied
+            with open(self.path, "wb"):
+                pass
+        return segment
+
+    def _compress(self, segment: dict) -> list:
+        """Writes the active file as a segment of gzip blocks, filling in segment's ranges; returns the blocks."""
+        blocks, block, block_size, raw_offset, last_block = [], [], 0, 0, []
+        fd, tmp_path = tempfile.mkstemp(dir=self.archive_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out, open(self.path, "rb") as f:
+
+                def flush():
+                    nonlocal block, block_size, raw_offset, last_block
+                    blocks.append([raw_offset, out.tell(), line_time(block[0])])
+                    out.write(gzip.compress(b"".join(block), mtime=0))
+                    raw_offset += block_size
+                    block, block_size, last_block = [], 0, block
+
+                for line in f:
+                    if line.startswith(b"[ID:"):
+                        match = _HEADER_ID.match(line)
+                        if match:
+                            segment["first_id"] = segment["first_id"] or int(match.group(1))
+                            segment["last_id"] = int(match.group(1))
+                    block.append(line)
+                    block_size += len(line)
+                    if block_size >= BLOCK_SIZE:
+                        flush()
+                if block:
+                    flush()
+            os.replace(tmp_path, self.archive_dir / segment["file"])
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        segment["end"] = segment["start"] + raw_offset
+        # Payload lines carry no time, so take the last line that does
+        segment["last_ts"] = next(filter(None, map(line_time, reversed(last_block))), None)
+        return blocks
+
+
+def rotate_due(paths=ROTATED_LOGS) -> list:
+    """Rotates each log that is over the size or age limit; returns the new segments."""
+    policy = rotation_policy()
+    rotated = []
+    for path in paths:
+        segment = SegmentedLog(path).maybe_rotate(policy)
+        if segment:
+            print(f"[INFO] Rotated {path} into segment {segment['seq']} ({segment['end'] - segment['start']} bytes).")
+            rotated.append(segment)
+    return rotated
+
+
+def _write_json(path: Path, data):
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
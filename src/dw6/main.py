@@ -1,77 +1,131 @@
 # dw6/main.py
 import argparse
+import json
 import sys
-import re
-import subprocess
 from pathlib import Path
 from datetime import datetime, timezone
-from dw6.state_manager import WorkflowManager, STAGE_TRANSITIONS
-from dw6.augmenter import PromptAugmenter
-from dw6.templates import process_prompt
-from dw6.git_handler import GitManager
-from dw6.kernel_manager import KernelManager
+from dw6.locking import LockTimeout, StateConflictError
+
+# Subcommands import what they need when they run, so light commands never load
+# GitPython, httpx or toml. This map mirrors those imports for --startup-report.
+COMMAND_IMPORTS = {
+    "approve": ["dw6.state_manager", "git"],
+    "new": ["dw6.augmenter", "dw6.templates"],
+    "meta-req": [],
+    "tech-debt": ["dw6.tech_debt"],
+    "tech-debt list": ["dw6.tech_debt", "sqlite3"],
+    "tech-debt show": ["dw6.tech_debt", "dw6.blobs", "sqlite3", "gzip"],
+    "tech-debt migrate": ["dw6.tech_debt", "sqlite3"],
+    "revert": ["dw6.state_manager"],
+    "history": ["dw6.history"],
+    "audit": ["dw6.audit", "dw6.log_segments", "dw6.history", "mmap"],
+    "pipeline": ["dw6.state_manager", "dw6.pipelines"],
+    "do": ["dw6.state_manager"],
+    "do --daemon": ["dw6.governor_service"],
+    "serve-governor": ["dw6.governor_service", "dw6.state_manager", "fastapi", "uvicorn"],
+    "setup": ["dw6.git_handler", "git", "dotenv"],
+    "kernel-lock": ["dw6.kernel_manager"],
+    "kernel-unlock": ["dw6.kernel_manager"],
+    "commit": ["dw6.git_handler", "git", "dotenv"],
+    "outbox": ["dw6.outbox", "dw6.git_handler", "git"],
+    "status": ["dw6.git_handler", "git"],
+}
 
 META_LOG_FILE = Path("logs/meta_requirements.log")
-TECH_DEBT_FILE = Path("logs/technical_debt.log")
+TECH_DEBT_COMMANDS = ("add", "list", "migrate", "resolve", "show")
 
 def register_meta_requirement(description: str):
     """Logs a new meta-requirement to the meta_requirements.log file."""
-    META_LOG_FILE.parent.mkdir(exist_ok=True)
-    
-    last_id = 0
-    if META_LOG_FILE.exists():
-        with open(META_LOG_FILE, "r") as f:
-            lines = f.readlines()
-            if lines:
-                last_line = lines[-1]
-                match = re.search(r'^\[ID:(\d+)\]', last_line)
-                if match:
-                    last_id = int(match.group(1))
-
-    new_id = last_id + 1
+    from dw6.record_log import RecordLog
     timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-    log_entry = f"[ID:{new_id}] [TS:{timestamp}] {description}\n"
-
-    with open(META_LOG_FILE, "a") as f:
-        f.write(log_entry)
-    
+    # The record log allocates the ID under the log's lock, so concurrent agents never reuse one
+    new_id = RecordLog(META_LOG_FILE).append(f"[TS:{timestamp}] {description}")
     print(f"Successfully logged meta-requirement {new_id}.")
 
 def register_technical_debt(description, issue_type="test", commit_to_fix=None):
     """Registers a known technical debt item for future resolution."""
-    TECH_DEBT_FILE.parent.mkdir(exist_ok=True)
-    
-    last_id = 0
-    if TECH_DEBT_FILE.exists():
-        with open(TECH_DEBT_FILE, "r") as f:
-            lines = f.readlines()
-            if lines:
-                last_line = lines[-1]
-                match = re.search(r'^\[ID:(\d+)\]', last_line)
-                if match:
-                    last_id = int(match.group(1))
-
-    new_id = last_id + 1
-    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-    status = "OPEN"
-    log_entry = f"[ID:{new_id}] [TS:{timestamp}] [TYPE:{issue_type}] [STATUS:{status}] "
-    if commit_to_fix:
-        log_entry += f"[COMMIT:{commit_to_fix}] "
-    log_entry += f"{description}\n"
-
-    with open(TECH_DEBT_FILE, "a") as f:
-        f.write(log_entry)
-    
+    from dw6.tech_debt import TechDebtStore
+    new_id = TechDebtStore().register(description, issue_type, commit_to_fix)
     print(f"Successfully logged technical debt {new_id}.")
     return new_id
 
+def list_technical_debt(status=None, issue_type=None, since=None, until=None, requirement=None, commit=None, limit=None):
+    """Prints the technical debt items matching the filters, one per line."""
+    from dw6.tech_debt import TechDebtStore
+    try:
+        items = TechDebtStore().query(status, issue_type, since, until, requirement, commit, limit)
+    except ValueError as e:
+        print(f"ERROR: Invalid time: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not items:
+        print("No matching technical debt.")
+        return
+    for item in items:
+        requirement = item["requirement"] if item["requirement"] is not None else "-"
+        print(f"{item['id']:>6}  {item['ts'][:19] or '-':<19}  {item['status']:<8}  {item['type'] or '-':<10}  "
+              f"req {requirement:<4}  {(item['commit_sha'] or '-')[:7]:<7}  {item['description']}")
+    print(f"{len(items)} item(s).")
+
+def migrate_technical_debt():
+    """Numbers any free-text technical debt entries older versions wrote, which queries also do."""
+    from dw6.tech_debt import TechDebtStore
+    if not TechDebtStore().migrate():
+        print("No free-text technical debt entries to migrate.")
+
+def show_technical_debt(item_id):
+    """Prints a technical debt item and streams its captured output."""
+    from dw6.blobs import BlobStore
+    from dw6.tech_debt import TechDebtStore
+    store = TechDebtStore()
+    item = store.get(item_id)
+    if item is None:
+        print(f"ERROR: There is no technical debt {item_id}.", file=sys.stderr)
+        sys.exit(1)
+    print(f"Technical debt {item['id']}: {item['description']}")
+    for label, key in (("Status", "status"), ("Type", "type"), ("Logged", "ts"), ("Requirement", "requirement"),
+                       ("Commit", "commit_sha"), ("Resolved", "resolved_at")):
+        if item[key] is not None:
+            print(f"{label + ':':<13}{item[key]}")
+    payload = store.payload(item)
+    if payload:
+        print(payload)
+    if item["blob"]:
+        print(f"--- Captured output ({item['blob_size']} bytes, blob {item['blob'][:12]}) ---", flush=True)
+        try:
+            for chunk in BlobStore().stream(item["blob"]):
+                sys.stdout.buffer.write(chunk)
+        except FileNotFoundError:
+            print(f"ERROR: The output blob {item['blob']} is missing from {BlobStore().root}.", file=sys.stderr)
+            sys.exit(1)
+        sys.stdout.buffer.flush()
+
+def resolve_technical_debt(item_id, note=None):
+    """Marks a technical debt item as resolved."""
+    from dw6.tech_debt import TechDebtStore
+    try:
+        TechDebtStore().resolve(item_id, note)
+    except KeyError:
+        print(f"ERROR: There is no technical debt {item_id}.", file=sys.stderr)
+        sys.exit(1)
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Resolved technical debt {item_id}.")
+
+def report_git_usage():
+    """Reports how many git subprocesses the command spawned, if it used git at all."""
+    git_handler = sys.modules.get("dw6.git_handler")
+    if git_handler is not None and git_handler.GitManager.subprocess_count:
+        print(f"[GIT] {git_handler.GitManager.subprocess_count} git subprocess(es) spawned by this command.", file=sys.stderr)
+
 def setup_project(project_name: str, remote_url: str):
     """Orchestrates the project's Git setup using GitManager."""
+    from dw6.git_handler import get_session
     project_path = Path.cwd()
     print(f"--- Starting DW7 Project Setup for: {project_name} ---")
     print(f"Project Path: {project_path}")
 
-    git_manager = GitManager(str(project_path))
+    git_manager = get_session(project_path)
 
     # 1. Initialize Git repository
     git_manager.initialize_repo()
@@ -139,6 +193,20 @@ venv.bak/
 
 # Other
 .mypy_cache/
+
+# DW6 runtime files and derived indexes
+logs/governor.sock
+logs/.index/
+logs/.locks/
+logs/install_fingerprint.json
+logs/test_report.json
+logs/test_durations.json
+logs/test_impact.json
+logs/.coverage.impact*
+logs/test_results.json
+logs/install.log
+logs/pytest*.log
+logs/step_failures.jsonl
 """
         gitignore_path.write_text(gitignore_content)
     else:
@@ -189,19 +257,180 @@ def revert_to_previous_stage(manager, target_stage_name=None):
         return
 
     print(f"Reverting from {current_stage} to {target_stage}...")
-    manager.state.set("CurrentStage", target_stage)
-    manager.state.save()
+    from dw6 import history
+    pipeline_fields = {"pipeline": True} if manager.requirement is not None else {}
+
+    def revert(state):
+        # update() reloads on a conflict, so other pipelines moving meanwhile never fail the revert
+        if state.get_stage(manager.requirement) != current_stage:
+            print(f"ERROR: The stage was changed from '{current_stage}' to '{state.get_stage(manager.requirement)}' "
+                  "by another process. Nothing was reverted.", file=sys.stderr)
+            sys.exit(1)
+        state.record_event(history.make_event("revert", manager.governor.requirement_id, current_stage, target_stage, **pipeline_fields))
+        state.set_stage(target_stage, manager.requirement)
+
+    with manager.governor.transition_lock():  # Never in the middle of an approval of this pipeline
+        manager.state.update(revert)
     print(f"Successfully reverted to {target_stage} stage.")
 
+def start_pipeline(requirement: int):
+    """Opens a pipeline for a requirement at the Engineer stage."""
+    from dw6 import history
+    from dw6.state_manager import WorkflowState
+
+    def open_pipeline(state):
+        if state.get_stage(requirement) is not None:
+            print(f"ERROR: A pipeline for requirement {requirement} is already open "
+                  f"(stage '{state.get_stage(requirement)}').", file=sys.stderr)
+            sys.exit(1)
+        state.record_event(history.make_event("start", requirement, to_stage="Engineer", pipeline=True))
+        state.set_stage("Engineer", requirement)
+
+    WorkflowState().update(open_pipeline)
+    print(f"Started pipeline for requirement {requirement} at stage 'Engineer'.")
+
+def list_pipelines():
+    """Prints every open pipeline and how full the limited stages are."""
+    from dw6.pipelines import PipelineScheduler
+    from dw6.state_manager import WorkflowState
+    state = WorkflowState()
+    scheduler = PipelineScheduler(state)
+    pipelines = state.pipelines()
+    if not pipelines:
+        print("No open pipelines. Start one with 'dw6 pipeline start <requirement>'.")
+    for requirement, stage in sorted(pipelines.items()):
+        print(f"Requirement {requirement}: {stage}")
+    for stage, limit in scheduler.limits.items():
+        print(f"[LIMIT] {stage}: {len(scheduler.occupants(stage))}/{limit}")
+
+def query_audit(since=None, until=None, user=None, event=None, denials=False):
+    """Prints the audit log entries matching the filters, oldest first."""
+    from dw6 import audit
+    count = 0
+    try:
+        for entry in audit.query(since, until, user, event, denials):
+            print(f"{entry['ts']}  {entry['user']:<12}  {entry['event']}")
+            count += 1
+    except ValueError as e:
+        print(f"ERROR: Invalid time: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{count} audit event(s)." if count else "No matching audit events.")
+
+def show_history(requirement=None, at=None):
+    """Answers point-in-time and per-cycle questions from the state event log."""
+    from dw6 import history
+    state_history = history.StateHistory()
+    when = history.parse_timestamp(at) if at else None
+
+    if requirement is not None and when:
+        stage, event = state_history.stage_at(requirement, when)
+        if stage is None:
+            print(f"Requirement {requirement} had not started at {when}.")
+        else:
+            print(f"Requirement {requirement} was in stage '{stage}' at {when} (since {event['ts']}).")
+    elif requirement is not None:
+        events = state_history.transitions(requirement)
+        if not events:
+            print(f"No recorded history for requirement {requirement}.")
+        for event in events:
+            print(f"{event['ts']}  {event['type']:<10} {event.get('from', '-'):>10} -> {history.stage_after(event)}")
+    elif when:
+        state = state_history.state_at(when)
+        if not state:
+            print(f"No recorded history before {when}.")
+        for key, value in state.items():
+            print(f"{key}={value}")
+    else:
+        latest = state_history.latest()
+        if not latest:
+            print("No recorded history.")
+        for req, event in sorted(latest.items(), key=lambda item: int(item[0])):
+            print(f"Requirement {req}: {history.stage_after(event)} (since {event['ts']})")
+
+def show_outbox(flush=False):
+    """Prints the queued pushes, sending them all first if flush is set."""
+    import time
+    from dw6.git_handler import get_session
+    from dw6.outbox import Outbox
+    outbox = Outbox(get_session())
+    if flush:
+        remaining = outbox.drain(force=True)
+        print(f"Flushed the outbox. {remaining} push(es) still pending.")
+    entries = outbox.pending()
+    if not entries:
+        print("No pending pushes.")
+    for branch, entry in sorted(entries.items()):
+        tags = ", ".join(entry["tags"]) or "no tags"
+        if entry.get("parked"):
+            print(f"{branch} ({tags}): FAILED after {entry['attempts']} attempt(s); "
+                  "fix the cause, then retry with 'dw6 outbox flush'")
+        else:
+            due = max(0, int(entry["next_attempt"] - time.time()))
+            print(f"{branch} ({tags}): {entry['attempts']} failed attempt(s), next attempt in {due}s")
+        if entry["last_error"]:
+            print(f"  last error: {entry['last_error']}")
+    return not entries
+
+def show_status(paths=None):
+    """Reports whether the working tree (or the given paths) is clean. Returns True if it is."""
+    from dw6.git_handler import get_session
+    report = get_session().cleanliness(paths)
+    scope = f" in {', '.join(paths)}" if paths else ""
+    if report["clean"]:
+        print(f"Working tree is clean{scope}.")
+    else:
+        print(f"Working tree is dirty{scope}: {report['dirty']} changed, {report['untracked']} untracked.")
+    return report["clean"]
+
+def read_batch_actions(source):
+    """
+    Returns an iterator over the non-blank, newline-delimited actions of a batch file,
+    or of stdin for '-'. The file is opened at once, so a missing one is reported
+    before anything is authorized.
+    """
+    if source == "-":
+        return _batch_actions(sys.stdin)
+    try:
+        return _batch_actions(open(source, "r"))
+    except OSError as e:
+        print(f"ERROR: Cannot read batch file '{source}': {e.strerror}.", file=sys.stderr)
+        sys.exit(1)
+
+def _batch_actions(stream):
+    try:
+        for line in stream:
+            action = line.rstrip("\r\n")
+            if action.strip():
+                yield action
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def write_verdicts(verdicts, out=None) -> bool:
+    """Streams verdicts as JSON Lines. Returns True if every action was allowed."""
+    out = out or sys.stdout
+    all_allowed = True
+    for verdict in verdicts:
+        all_allowed = all_allowed and verdict["allowed"]
+        out.write(json.dumps(verdict) + "\n")
+        out.flush()
+    return all_allowed
+
 def main():
     """Main entry point for the DW6 CLI."""
     parser = argparse.ArgumentParser(description="DW6 Workflow Management CLI")
-    subparsers = parser.add_subparsers(dest="command", help="Available commands", required=True)
+    parser.add_argument("--startup-report", action="store_true", help="Print the import-time breakdown of the entry point and of each command, then exit.")
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # Approve command
     approve_parser = subparsers.add_parser("approve", help="Approve the current stage and advance to the next.")
     approve_parser.add_argument("--next-stage", help="Specify the next stage to transition to.")
+    approve_parser.add_argument("--req", type=int, help="Approve the pipeline of this requirement instead of the single requirement pointer.")
     approve_parser.add_argument("--with-tech-debt", action="store_true", help="Approve the stage even with validation failures, logging them as technical debt.")
+    approve_parser.add_argument("--reinstall", action="store_true", help="Reinstall test dependencies even if the install cache is current.")
+    approve_parser.add_argument("--jobs", type=int, metavar="N", help="Run the Validator's tests in N parallel shards (0: one per CPU). Defaults to [tool.dw6] test_jobs, or 1.")
+    approve_parser.add_argument("--no-cache", action="store_true", help="Run the Validator's tests even if the same content already passed.")
+    approve_parser.add_argument("--impact", action="store_true", help="Only run the tests affected by files changed since the last full run (needs pytest-cov).")
 
     # New command
     new_parser = subparsers.add_parser("new", help="Create a new requirement specification from a prompt.")
@@ -211,19 +440,76 @@ def main():
     meta_req_parser = subparsers.add_parser("meta-req", help="Register a new meta-requirement for the workflow.")
     meta_req_parser.add_argument("description", type=str, help="The description of the meta-requirement.")
 
-    # Tech-debt command
-    tech_debt_parser = subparsers.add_parser("tech-debt", help="Register a technical debt item.")
-    tech_debt_parser.add_argument("description", type=str, help="Description of the technical debt.")
-    tech_debt_parser.add_argument("--type", default="test", help="Type of technical debt (e.g., test, code, deployment)")
-    tech_debt_parser.add_argument("--commit", help="Commit hash where this should be fixed")
+    # Tech-debt command; 'dw6 tech-debt "description"' is short for 'dw6 tech-debt add "description"'
+    tech_debt_parser = subparsers.add_parser("tech-debt", help="Register, list or resolve technical debt items.")
+    tech_debt_subparsers = tech_debt_parser.add_subparsers(dest="tech_debt_command", required=True)
+    tech_debt_add_parser = tech_debt_subparsers.add_parser("add", help="Register a technical debt item.")
+    tech_debt_add_parser.add_argument("description", type=str, help="Description of the technical debt.")
+    tech_debt_add_parser.add_argument("--type", default="test", help="Type of technical debt (e.g., test, code, deployment)")
+    tech_debt_add_parser.add_argument("--commit", help="Commit hash where this should be fixed")
+    tech_debt_list_parser = tech_debt_subparsers.add_parser("list", help="List technical debt items, oldest first.")
+    tech_debt_list_parser.add_argument("--status", type=str.upper, choices=["OPEN", "RESOLVED"], help="Only items with this status.")
+    tech_debt_list_parser.add_argument("--type", help="Only items of this type.")
+    tech_debt_list_parser.add_argument("--since", help="Only items logged at or after this time, as ISO 8601.")
+    tech_debt_list_parser.add_argument("--until", help="Only items logged before this time, as ISO 8601.")
+    tech_debt_list_parser.add_argument("--req", type=int, help="Only items of this requirement.")
+    tech_debt_list_parser.add_argument("--commit", help="Only items to be fixed in this commit (a prefix is enough).")
+    tech_debt_list_parser.add_argument("--limit", type=int, help="Only the N most recent matching items.")
+    tech_debt_show_parser = tech_debt_subparsers.add_parser("show", help="Show a technical debt item and its captured output.")
+    tech_debt_show_parser.add_argument("id", type=int, help="The technical debt ID.")
+    tech_debt_subparsers.add_parser("migrate", help="Number any free-text entries older versions wrote, in place (queries do this too).")
+    tech_debt_resolve_parser = tech_debt_subparsers.add_parser("resolve", help="Mark a technical debt item as resolved.")
+    tech_debt_resolve_parser.add_argument("id", type=int, help="The technical debt ID.")
+    tech_debt_resolve_parser.add_argument("--note", help="How it was resolved.")
 
     # Revert command
     revert_parser = subparsers.add_parser("revert", help="Revert to a previous workflow stage.")
+    revert_parser.add_argument("--req", type=int, help="Revert the pipeline of this requirement.")
     revert_parser.add_argument("--to", dest="target_stage", help="Target stage to revert to. Defaults to previous stage.")
 
+    # Pipeline command
+    pipeline_parser = subparsers.add_parser("pipeline", help="Manage concurrent requirement pipelines.")
+    pipeline_subparsers = pipeline_parser.add_subparsers(dest="pipeline_command", required=True)
+    pipeline_start_parser = pipeline_subparsers.add_parser("start", help="Open a pipeline for a requirement at the Engineer stage.")
+    pipeline_start_parser.add_argument("requirement", type=int, help="The requirement ID.")
+    pipeline_subparsers.add_parser("list", help="List open pipelines and stage occupancy.")
+
+    # Outbox command
+    outbox_parser = subparsers.add_parser("outbox", help="Inspect or send the queued pushes.")
+    outbox_subparsers = outbox_parser.add_subparsers(dest="outbox_command", required=True)
+    outbox_subparsers.add_parser("status", help="Show the pushes waiting to be sent.")
+    outbox_subparsers.add_parser("flush", help="Send every queued push now, ignoring retry backoff.")
+
+    # Status command
+    status_parser = subparsers.add_parser("status", help="Check whether the working tree is clean. Exits 1 if it is not.")
+    status_parser.add_argument("--paths", nargs="+", metavar="PATH", help="Only check these files or directories (e.g. deliverables/ src/).")
+
+    # History command
+    history_parser = subparsers.add_parser("history", help="Query the recorded history of workflow stages.")
+    history_parser.add_argument("--req", type=int, help="Requirement (cycle) to query. Without --at, lists all of its transitions.")
+    history_parser.add_argument("--at", help="Point in time, as ISO 8601 (UTC unless an offset is given).")
+
+    # Audit command
+    audit_parser = subparsers.add_parser("audit", help="Query the audit log of kernel locks and unlocks.")
+    audit_subparsers = audit_parser.add_subparsers(dest="audit_command", required=True)
+    audit_query_parser = audit_subparsers.add_parser("query", help="List audit events, oldest first.")
+    audit_query_parser.add_argument("--since", help="Only events at or after this time, as ISO 8601 (UTC unless an offset is given).")
+    audit_query_parser.add_argument("--until", help="Only events before this time, as ISO 8601.")
+    audit_query_parser.add_argument("--user", help="Only events by this user.")
+    audit_query_parser.add_argument("--event", help="Only events whose text contains this, ignoring case (e.g. 'KERNEL UNLOCKED').")
+    audit_query_parser.add_argument("--denials", action="store_true", help="Include the actions the Governor denied.")
+
     # Do command
     do_parser = subparsers.add_parser("do", help="Execute a governed action.")
-    do_parser.add_argument("action", type=str, help="The action to execute.")
+    do_parser.add_argument("action", type=str, nargs="?", help="The action to execute.")
+    do_parser.add_argument("--req", type=int, help="Authorize against the pipeline of this requirement.")
+    do_parser.add_argument("--batch", nargs="?", const="-", metavar="FILE", help="Authorize newline-delimited actions from FILE (default: stdin), printing one JSON verdict per line.")
+    do_parser.add_argument("--daemon", action="store_true", help="Ask the running Governor service instead of loading the workflow in-process.")
+    do_parser.add_argument("--socket", help="Unix socket of the Governor service (default: logs/governor.sock).")
+
+    # Serve-governor command
+    serve_parser = subparsers.add_parser("serve-governor", help="Run the Governor service on a local Unix socket.")
+    serve_parser.add_argument("--socket", help="Unix socket to listen on (default: logs/governor.sock).")
 
     # Setup command
     setup_parser = subparsers.add_parser("setup", help="Initialize the project repository and push to remote.")
@@ -245,10 +531,22 @@ def main():
         parser.print_help(sys.stderr)
         sys.exit(1)
 
-    args = parser.parse_args()
+    argv = sys.argv[1:]
+    if argv[:1] == ["tech-debt"] and len(argv) > 1 and argv[1] not in TECH_DEBT_COMMANDS + ("-h", "--help"):
+        argv.insert(1, "add")
+    args = parser.parse_args(argv)
+
+    if args.startup_report:
+        from dw6.startup_report import print_startup_report
+        print_startup_report(COMMAND_IMPORTS)
+        sys.exit(0)
+    if args.command is None:
+        parser.print_help(sys.stderr)
+        sys.exit(1)
 
     # Handle kernel commands first as they don't require the WorkflowManager
     if args.command == "kernel-lock":
+        from dw6.kernel_manager import KernelManager
         kernel_manager = KernelManager(Path.cwd())
         kernel_manager.lock()
         sys.exit(0)
@@ -256,38 +554,111 @@ def main():
         if not args.i_am_sure:
             print("ERROR: Unlocking the kernel requires confirmation. Use the --i-am-sure flag.", file=sys.stderr)
             sys.exit(1)
+        from dw6.kernel_manager import KernelManager
         kernel_manager = KernelManager(Path.cwd())
         kernel_manager.unlock()
         sys.exit(0)
+    elif args.command == "serve-governor":
+        from dw6 import governor_service
+        governor_service.serve(args.socket or governor_service.SOCKET_PATH)
+        sys.exit(0)
+    elif args.command == "do" and not args.batch and not args.action:
+        parser.error("the 'do' command requires an action or --batch")
+    elif args.command == "do" and args.batch and args.action:
+        parser.error("the 'do' command takes an action or --batch, not both")
+
+    batch_actions = None
+    if args.command == "do" and args.batch:
+        batch_actions = read_batch_actions(args.batch)
+
+    if args.command == "do" and args.daemon:
+        from dw6 import governor_service
+        socket_path = args.socket or governor_service.SOCKET_PATH
+        if batch_actions is not None:
+            batch_actions = list(batch_actions)
+            verdicts = governor_service.request_batch_authorization(batch_actions, req=args.req, socket_path=socket_path)
+            if verdicts is not None:
+                sys.exit(0 if write_verdicts(verdicts) else 1)
+        else:
+            verdict = governor_service.request_authorization(args.action, req=args.req, socket_path=socket_path)
+            if verdict is not None:
+                if not verdict["allowed"]:
+                    print(verdict["message"], file=sys.stderr)
+                    sys.exit(1)
+                print(verdict["message"])
+                sys.exit(0)
+        print(f"WARNING: No Governor service answered on {socket_path}. Authorizing in-process.", file=sys.stderr)
+
+    try:
+        if args.command == "meta-req":
+            register_meta_requirement(args.description)
+        elif args.command == "tech-debt":
+            if args.tech_debt_command == "list":
+                list_technical_debt(args.status, args.type, args.since, args.until, args.req, args.commit, args.limit)
+            elif args.tech_debt_command == "show":
+                show_technical_debt(args.id)
+            elif args.tech_debt_command == "resolve":
+                resolve_technical_debt(args.id, args.note)
+            elif args.tech_debt_command == "migrate":
+                migrate_technical_debt()
+            else:
+                register_technical_debt(args.description, args.type, args.commit)
+        elif args.command == "pipeline":
+            if args.pipeline_command == "start":
+                start_pipeline(args.requirement)
+            else:
+                list_pipelines()
+        elif args.command == "outbox":
+            if not show_outbox(flush=args.outbox_command == "flush") and args.outbox_command == "flush":
+                sys.exit(1)
+        elif args.command == "status":
+            if not show_status(args.paths):
+                sys.exit(1)
+        elif args.command == "history":
+            show_history(args.req, args.at)
+        elif args.command == "audit":
+            query_audit(args.since, args.until, args.user, args.event, args.denials)
+        elif args.command in ("revert", "do", "approve"):
+            from dw6.state_manager import WorkflowManager
+            validation_options = {"reinstall": args.reinstall, "jobs": args.jobs, "impact": args.impact, "no_cache": args.no_cache} if args.command == "approve" else None
+            manager = WorkflowManager(requirement=args.req, validation_options=validation_options)
+            if args.req is not None and manager.current_stage is None:
+                print(f"ERROR: No open pipeline for requirement {args.req}. Start one with 'dw6 pipeline start {args.req}'.", file=sys.stderr)
+                sys.exit(1)
+            if args.command == "revert":
+                revert_to_previous_stage(manager, args.target_stage)
+            elif args.command == "do" and batch_actions is not None:
+                sys.exit(0 if write_verdicts(manager.governor.verdicts(batch_actions)) else 1)
+            elif args.command == "do":
+                try:
+                    manager.governor.authorize(args.action)
+                    # The command is authorized. The gatekeeper's job is done.
+                except PermissionError:
+                    sys.exit(1)
+            else:
+                manager.approve(next_stage=args.next_stage, with_tech_debt=args.with_tech_debt)
+        elif args.command == "new":
+            from dw6.augmenter import PromptAugmenter
+            from dw6.templates import process_prompt
+            augmenter = PromptAugmenter()
+            augmented_prompt = augmenter.augment_prompt(args.prompt)
+            process_prompt(augmented_prompt)
+        elif args.command == "setup":
+            setup_project(args.project_name, args.remote_url)
+        elif args.command == "commit":
+            from dw6.git_handler import get_session
+            print("--- Committing and Pushing Changes ---")
+            git_manager = get_session()
+            git_manager.commit_all(args.message)
+            git_manager.push_to_remote()
+            print("--- Changes Committed and Pushed Successfully ---")
+    except (LockTimeout, StateConflictError) as e:
+        # Another agent holds the lock for too long, or changed the state under us
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        report_git_usage()
 
-    manager = WorkflowManager()
-    
-    if args.command == "meta-req":
-        register_meta_requirement(args.description)
-    elif args.command == "tech-debt":
-        register_technical_debt(args.description, args.type, args.commit)
-    elif args.command == "revert":
-        revert_to_previous_stage(manager, args.target_stage)
-    elif args.command == "do":
-        try:
-            manager.governor.authorize(args.action)
-            # The command is authorized. The gatekeeper's job is done.
-        except PermissionError:
-            sys.exit(1)
-    elif args.command == "approve":
-        manager.approve(next_stage=args.next_stage, with_tech_debt=args.with_tech_debt)
-    elif args.command == "new":
-        augmenter = PromptAugmenter()
-        augmented_prompt = augmenter.augment_prompt(args.prompt)
-        process_prompt(augmented_prompt)
-    elif args.command == "setup":
-        setup_project(args.project_name, args.remote_url)
-    elif args.command == "commit":
-        print("--- Committing and Pushing Changes ---")
-        git_manager = GitManager(str(Path.cwd()))
-        git_manager.commit_all(args.message)
-        git_manager.push_to_remote()
-        print("--- Changes Committed and Pushed Successfully ---")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,161 @@
+# dw6/outbox.py
+"""
+A durable outbox of pending pushes, drained by a background worker.
+
+Approving the Deployer stage queues the push of the branch and its release tags
+here instead of waiting for the network. Repeated pushes of the same branch are
+coalesced into one entry, because a push always sends the branch's current tip. A
+detached worker (`python -m dw6.outbox`) sends due entries and retries failures with
+exponential backoff. A push that is rejected for good (a non-fast-forward or an
+authentication failure) or that fails MAX_ATTEMPTS times is parked: the worker
+stops retrying it and exits once only parked pushes remain, and `dw6 outbox
+status` shows it. `dw6 outbox flush` sends everything right away, parked pushes
+included.
+
+The outbox lives in `<git-dir>/dw6/outbox.json`, so it is never committed.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from dw6.config import package_env
+from dw6.locking import LockTimeout, FileLock, lock_for
+
+OUTBOX_NAME = "dw6/outbox.json"
+WORKER_LOCK_NAME = "dw6/outbox-worker.lock"
+BACKOFF_BASE = 5.0  # Seconds before the first retry; doubled after every failure
+BACKOFF_MAX = 600.0
+MAX_ATTEMPTS = 8
+# Failures that retrying cannot fix; the push is parked after the first one
+PERMANENT_ERRORS = ("rejected", "non-fast-forward", "Authentication failed", "Permission denied",
+                    "could not read Username", "GITHUB_TOKEN", "Remote 'origin' not found")
+
+
+def backoff(attempts: int) -> float:
+    """Returns the delay before the next attempt after a number of failed attempts."""
+    return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+class Outbox:
+    """Pending pushes of one repository, keyed by branch."""
+
+    def __init__(self, git_manager):
+        self.git_manager = git_manager
+        self.git_dir = Path(git_manager.repo.common_dir)
+        self.outbox_file = self.git_dir / OUTBOX_NAME
+
+    def _read(self) -> dict:
+        try:
+            with open(self.outbox_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, entries: dict):
+        self.outbox_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.outbox_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.outbox_file)
+
+    def pending(self) -> dict:
+        """Returns the queued pushes, keyed by branch."""
+        with lock_for(self.outbox_file):
+            return self._read()
+
+    def enqueue(self, branch: str, tags=()):
+        """Queues a push of a branch and tags, merging it into any push already queued for the branch."""
+        with lock_for(self.outbox_file):
+            entries = self._read()
+            entry = entries.get(branch, {"tags": [], "queued": time.time(), "attempts": 0, "last_error": None, "generation": 0})
+            entry["tags"] = sorted(set(entry["tags"]) | set(tags))
+            entry["generation"] += 1
+            entry["next_attempt"] = time.time()  # A new push is due now, whatever the backoff was
+            entry["parked"] = False
+            entries[branch] = entry
+            self._write(entries)
+        print(f"Queued push of branch '{branch}'" + (f" and tags {', '.join(entry['tags'])}" if entry["tags"] else "") + ".")
+
+    def drain(self, force=False) -> int:
+        """
+        Sends every due push (every push, parked ones included, if force is set) and
+        returns the number still pending and not parked. The network is never used
+        while the outbox is locked.
+        """
+        from dw6.git_handler import PushError
+        now = time.time()
+        due = {branch: entry for branch, entry in self.pending().items()
+               if force or (not entry.get("parked") and entry["next_attempt"] <= now)}
+        for branch, entry in due.items():
+            try:
+                self.git_manager._push(branch, entry["tags"])
+                error = None
+            except PushError as e:
+                error = str(e)
+            with lock_for(self.outbox_file):
+                entries = self._read()
+                current = entries.get(branch)
+                if current is None:
+                    continue
+                if error is None and current["generation"] == entry["generation"]:
+                    del entries[branch]
+                elif error is None:
+                    # Queued again while we were pushing; the newer push is still due
+                    current.update(tags=sorted(set(current["tags"]) - set(entry["tags"])), attempts=0, last_error=None,
+                                   parked=False)
+                else:
+                    current["attempts"] += 1
+                    current["last_error"] = error
+                    current["next_attempt"] = time.time() + backoff(current["attempts"])
+                    current["parked"] = current["attempts"] >= MAX_ATTEMPTS or any(
+                        marker in error for marker in PERMANENT_ERRORS)
+                self._write(entries)
+        return len(self.active())
+
+    def active(self) -> dict:
+        """Returns the queued pushes that are not parked, keyed by branch."""
+        return {branch: entry for branch, entry in self.pending().items() if not entry.get("parked")}
+
+    def next_due(self):
+        """Returns when the earliest push that is not parked is due, or None if there is none."""
+        return min((entry["next_attempt"] for entry in self.active().values()), default=None)
+
+
+def start_worker(project_path):
+    """Starts a detached worker that drains the outbox, unless one is already running."""
+    # The worker imports this same dw6, even when it is run from a source checkout
+    subprocess.Popen(
+        [sys.executable, "-m", "dw6.outbox"],
+        cwd=project_path, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True, env=package_env(),
+    )
+
+
+def run_worker(git_manager):
+    """Drains the outbox until only parked pushes are left. Only one worker per repository runs at a time."""
+    outbox = Outbox(git_manager)
+    worker_lock = FileLock(outbox.git_dir / WORKER_LOCK_NAME, timeout=0)
+    while True:
+        try:
+            worker_lock.acquire()
+        except LockTimeout:
+            return  # Another worker is draining this outbox
+        try:
+            while outbox.drain():
+                # Wake up regularly, so a newly queued push does not wait out another push's backoff
+                time.sleep(min(max(0.0, outbox.next_due() - time.time()), 1.0))
+        finally:
+            worker_lock.release()
+        # Something may have been queued after the last drain but before the lock was released
+        if not outbox.active():
+            return
+
+
+if __name__ == "__main__":
+    from dw6.git_handler import get_session
+    run_worker(get_session(Path.cwd()))
@@ -0,0 +1,46 @@
+# dw6/pipelines.py
+"""
+Scheduling for concurrent requirement pipelines.
+
+In multi-pipeline mode every requirement has its own stage (stored as
+`Pipeline.<id>=<stage>` in the workflow state), so several cycles can overlap.
+The scheduler caps how many pipelines may occupy the expensive stages at once.
+"""
+
+import sys
+from dw6.config import load_tool_config
+
+# Stages not listed here are unlimited. Override with [tool.dw6.pipeline_limits].
+DEFAULT_STAGE_LIMITS = {"Validator": 1, "Deployer": 1}
+
+
+def load_stage_limits() -> dict:
+    limits = dict(DEFAULT_STAGE_LIMITS)
+    limits.update(load_tool_config().get("pipeline_limits", {}))
+    return limits
+
+
+class PipelineScheduler:
+    """Decides whether a pipeline may enter a stage given the configured limits."""
+
+    def __init__(self, state, limits=None):
+        self.state = state
+        self.limits = limits if limits is not None else load_stage_limits()
+
+    def occupants(self, stage) -> list:
+        return sorted(req for req, pipeline_stage in self.state.pipelines().items() if pipeline_stage == stage)
+
+    def can_enter(self, stage, requirement) -> bool:
+        limit = self.limits.get(stage)
+        if limit is None:
+            return True
+        others = [req for req in self.occupants(stage) if req != int(requirement)]
+        return len(others) < limit
+
+    def ensure_capacity(self, stage, requirement):
+        """Exits with an error if the pipeline may not enter the stage right now."""
+        if not self.can_enter(stage, requirement):
+            occupants = ", ".join(str(req) for req in self.occupants(stage))
+            print(f"ERROR: Stage '{stage}' is at its limit of {self.limits[stage]} pipeline(s) "
+                  f"(occupied by requirement {occupants}). Retry once one of them moves on.", file=sys.stderr)
+            sys.exit(1)
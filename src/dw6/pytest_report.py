@@ -0,0 +1,109 @@
+# dw6/pytest_report.py
+"""
+A pytest plugin that writes the outcome of a run as JSON, for the Validator stage.
+
+Load it with `python -m pytest -p dw6.pytest_report --dw6-report=PATH`. The report
+holds the number of collected tests, the pass/fail/skip/error counts, collection
+errors, the exit status, the collected test ids and every test's outcome and
+duration (setup, call and teardown together), so the Validator never has to parse
+pytest's console output. `--dw6-select=FILE` limits a run to the test ids or test
+files listed in FILE, which is how the Validator runs a shard or a selection.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+REPORT_FILE = Path("logs/test_report.json")
+OUTCOMES = ("passed", "failed", "skipped", "error")
+
+
+def pytest_addoption(parser):
+    parser.addoption("--dw6-report", metavar="PATH", help="Write a JSON summary of the run to PATH.")
+    parser.addoption("--dw6-select", metavar="FILE", help="Only run the test ids or test files listed, one per line, in FILE.")
+
+
+def pytest_collection_modifyitems(config, items):
+    select_file = config.getoption("--dw6-select")
+    if not select_file:
+        return
+    with open(select_file, "r") as f:
+        selected = set(f.read().splitlines())
+    keep = [item for item in items if item.nodeid in selected or item.nodeid.split("::", 1)[0] in selected]
+    if len(keep) < len(items):
+        kept = set(id(item) for item in keep)
+        config.hook.pytest_deselected(items=[item for item in items if id(item) not in kept])
+        items[:] = keep
+
+
+def pytest_configure(config):
+    path = config.getoption("--dw6-report")
+    if path:
+        config.pluginmanager.register(ReportWriter(Path(path)), "dw6-report-writer")
+
+
+class ReportWriter:
+    def __init__(self, path: Path):
+        self.path = path
+        self.started = time.monotonic()
+        self.collected = 0
+        self.items = []
+        self.collection_errors = []
+        self.tests = {}
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.collection_errors.append(report.nodeid or ".")
+
+    def pytest_collection_finish(self, session):
+        self.collected = len(session.items)
+        self.items = [item.nodeid for item in session.items]
+
+    def pytest_runtest_logreport(self, report):
+        test = self.tests.setdefault(report.nodeid, {"outcome": "passed", "duration": 0.0})
+        test["duration"] += report.duration
+        if report.when == "call":
+            if report.failed:
+                test["outcome"] = "failed"
+            elif report.skipped:
+                # An expected failure is reported as skipped; it does not fail the run
+                test["outcome"] = "skipped"
+        elif report.failed:
+            test["outcome"] = "error"  # Failed in a fixture's setup or teardown
+        elif report.skipped and test["outcome"] == "passed":
+            test["outcome"] = "skipped"  # Skipped before the call phase
+
+    def pytest_sessionfinish(self, session, exitstatus):
+        counts = {outcome: 0 for outcome in OUTCOMES}
+        for test in self.tests.values():
+            counts[test["outcome"]] += 1
+        report = {
+            "collected": self.collected,
+            **counts,
+            "collection_errors": self.collection_errors,
+            "exitstatus": int(exitstatus),
+            "duration": time.monotonic() - self.started,
+            "items": self.items,
+            "tests": self.tests,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(report, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def load(path=None):
+    """Returns a report written by the plugin, or None if the run ended before writing one."""
+    try:
+        with open(path or REPORT_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def summary(report: dict) -> str:
+    """Describes a report in one line."""
+    return (f"{report['collected']} collected: {report['passed']} passed, {report['failed']} failed, "
+            f"{report['skipped']} skipped, {report['error']} errors in {report['duration']:.2f}s")
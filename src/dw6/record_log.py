@@ -0,0 +1,141 @@
+# dw6/record_log.py
+"""
+Append-only logs of numbered records, such as logs/meta_requirements.log and
+logs/technical_debt.log.
+
+Every record starts with a header line `[ID:n] ...`. A record may carry a
+multi-line payload, such as captured pytest output. Each payload line is written
+with PAYLOAD_PREFIX, so no payload line can ever look like a header.
+
+The last ID is kept in a sidecar, for example
+logs/.index/technical_debt.log.seq, together with the log's size and mtime.
+Allocating the next ID therefore costs the same however long the log is. When the
+sidecar is missing or stale, for example after a checkout, the last header is
+found by reading backwards from the end of the log, or, when the log has just
+been rotated, taken from the dw6.log_segments manifest. The sidecar is derived
+data and can always be deleted.
+
+Offsets, as read_at() takes them, are the logical offsets of dw6.log_segments, so
+they stay valid when the log is rotated.
+"""
+
+import itertools
+import json
+import os
+import re
+from pathlib import Path
+from dw6.locking import lock_for
+from dw6.log_segments import SegmentedLog
+
+INDEX_DIR_NAME = ".index"
+PAYLOAD_PREFIX = "  | "
+HEADER = re.compile(r"^\[ID:(\d+)\] ?(.*)$")
+FIRST_BLOCK = 4096  # The last record is usually short; blocks double up to TAIL_BLOCK
+TAIL_BLOCK = 64 * 1024
+_HEADER_ID = re.compile(rb"\[ID:(\d+)\]")
+
+
+class RecordLog:
+    """A log file of numbered records with constant-time ID allocation."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.seq_path = self.path.parent / INDEX_DIR_NAME / f"{self.path.name}.seq"
+        self.segments = SegmentedLog(self.path)
+
+    def append(self, text: str, payload=None) -> int:
+        """Appends `[ID:n] text` and an optional multi-line payload; returns the new ID."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with lock_for(self.path):
+            with open(self.path, "ab") as f:
+                stat = os.fstat(f.fileno())
+                new_id = self._last_id(stat) + 1
+                f.write(format_record(new_id, text, payload).encode("utf-8"))
+                f.flush()
+                stat = os.fstat(f.fileno())
+            self._save_seq(new_id, stat)
+        return new_id
+
+    def last_id(self) -> int:
+        """Returns the ID of the last record, or 0 if there is none."""
+        with lock_for(self.path):
+            try:
+                return self._last_id(os.stat(self.path))
+            except FileNotFoundError:
+                return 0
+
+    def records(self):
+        """Yields every record as (id, header text, payload text or None), in log order, rotated ones first."""
+        yield from parse_records(line.decode("utf-8", errors="replace") for line in self.segments.lines_from(0))
+
+    def read_at(self, offset: int):
+        """Returns the record whose header starts at a logical offset, as (id, header text, payload or None)."""
+        lines = self.segments.lines_from(offset)
+        header = next(lines).decode("utf-8", errors="replace")
+        payload = itertools.takewhile(lambda line: not line.startswith(b"[ID:"), lines)
+        return next(parse_records([header, *(line.decode("utf-8", errors="replace") for line in payload)]))
+
+    def _last_id(self, stat) -> int:
+        try:
+            with open(self.seq_path, "r") as f:
+                seq = json.load(f)
+            if (seq["size"], seq["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                return seq["last_id"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        # A freshly rotated log has no header left; its last ID is in the manifest
+        return self._recover_last_id(stat.st_size) or self.segments.last_id()
+
+    def _recover_last_id(self, size: int) -> int:
+        """Finds the last header by reading backwards from the end of the log."""
+        with open(self.path, "rb") as f:
+            position, carried, block = size, b"", FIRST_BLOCK
+            while position > 0:
+                start = max(position - block, 0)
+                f.seek(start)
+                # Keep a few bytes of the later block so a header split across blocks is found
+                buffer = f.read(position - start) + carried[:32]
+                end = len(buffer)
+                while (index := buffer.rfind(b"[ID:", 0, end)) >= 0:
+                    # Only a header at the start of a line counts, and the file start is one
+                    if buffer[index - 1:index] == b"\n" or index == 0 and start == 0:
+                        match = _HEADER_ID.match(buffer, index)
+                        if match:
+                            return int(match.group(1))
+                    end = index
+                position, carried, block = start, buffer, min(block * 2, TAIL_BLOCK)
+        return 0
+
+    def _save_seq(self, last_id: int, stat):
+        self.seq_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.seq_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"last_id": last_id, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}, f)
+        os.replace(tmp_path, self.seq_path)
+
+
+def format_record(record_id: int, text: str, payload=None) -> str:
+    record = f"[ID:{record_id}] {text}\n"
+    if payload:
+        record += "".join(f"{PAYLOAD_PREFIX}{line}\n" for line in payload.splitlines())
+    return record
+
+
+def parse_records(lines):
+    """
+    Parses log lines into (id, header text, payload text or None) records. Lines that
+    are neither headers nor framed payload lines, as written by older versions, are
+    kept in the payload of the record before them.
+    """
+    record_id, text, payload = None, None, []
+    for line in lines:
+        line = line.rstrip("\n")
+        match = HEADER.match(line)
+        if match:
+            if record_id is not None:
+                yield record_id, text, "\n".join(payload) if payload else None
+            record_id, text, payload = int(match.group(1)), match.group(2), []
+        elif record_id is not None:
+            payload.append(line[len(PAYLOAD_PREFIX):] if line.startswith(PAYLOAD_PREFIX) else line)
+    if record_id is not None:
+        yield record_id, text, "\n".join(payload) if payload else None
@@ -0,0 +1,137 @@
+# dw6/ref_index.py
+"""
+A cached index from commits to the tags that point at them.
+
+The index is built from `packed-refs` (which already records the peeled commit of
+annotated tags) plus the few loose tags under `refs/tags`, and is kept in
+`<git-dir>/dw6/tag_index.json`. It is refreshed only when packed-refs changes or a
+loose tag is added, moved or deleted, and only the changed loose tags are resolved,
+in one batched git call. Answering "which tags point at this commit" is then a
+dictionary lookup instead of loading one object per tag.
+"""
+
+import json
+import os
+from pathlib import Path
+
+INDEX_NAME = "dw6/tag_index.json"
+TAG_PREFIX = "refs/tags/"
+
+
+def read_packed_tags(packed_refs: Path):
+    """
+    Parses the tags in a packed-refs file.
+
+    Returns (commits, unpeeled): commits maps tag names to the commit they point at,
+    unpeeled maps tags whose commit the file does not record to their object id.
+    """
+    commits, unpeeled = {}, {}
+    if not packed_refs.exists():
+        return commits, unpeeled
+    fully_peeled = False
+    last_tag = None
+    with open(packed_refs, "r") as f:
+        for line in f:
+            if line.startswith("#"):
+                fully_peeled = "fully-peeled" in line
+                continue
+            line = line.rstrip("\n")
+            if line.startswith("^"):
+                if last_tag is not None:
+                    commits[last_tag] = line[1:]
+                    unpeeled.pop(last_tag, None)
+                continue
+            sha, _, ref = line.partition(" ")
+            last_tag = ref[len(TAG_PREFIX):] if ref.startswith(TAG_PREFIX) else None
+            if last_tag is None:
+                continue
+            # In a fully peeled file a tag without a '^' line points straight at its commit
+            if fully_peeled:
+                commits[last_tag] = sha
+            else:
+                unpeeled[last_tag] = sha
+    return commits, unpeeled
+
+
+def read_loose_tags(git_dir: Path) -> dict:
+    """Returns the object id of every loose tag, keyed by tag name."""
+    tags = {}
+    root = git_dir / "refs" / "tags"
+    if not root.is_dir():
+        return tags
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            try:
+                sha = path.read_text().strip()
+            except OSError:
+                continue  # Removed while we were walking
+            tags[path.relative_to(root).as_posix()] = sha
+    return tags
+
+
+class TagIndex:
+    """Maps commits to their tags, refreshing the cached index only when refs change."""
+
+    def __init__(self, git_dir, peel):
+        """`peel` resolves a {tag: object id} dict to {tag: commit} in one git call."""
+        self.git_dir = Path(git_dir)
+        self.index_file = self.git_dir / INDEX_NAME
+        self.peel = peel
+        self.by_commit = self._load()
+
+    def _packed_stamp(self):
+        try:
+            stat = (self.git_dir / "packed-refs").stat()
+            return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> dict:
+        try:
+            with open(self.index_file, "r") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {"packed_stamp": None, "packed": {}, "loose": {}}
+
+        changed = False
+        packed_stamp = self._packed_stamp()
+        if index["packed_stamp"] != packed_stamp:
+            commits, unpeeled = read_packed_tags(self.git_dir / "packed-refs")
+            if unpeeled:
+                commits.update(self.peel(unpeeled))
+            index["packed_stamp"], index["packed"], changed = packed_stamp, commits, True
+
+        loose = read_loose_tags(self.git_dir)
+        cached_loose = index["loose"]
+        stale = {name: sha for name, sha in loose.items() if cached_loose.get(name, [None])[0] != sha}
+        if stale or len(loose) != len(cached_loose):
+            peeled = self.peel(stale) if stale else {}
+            index["loose"] = {name: cached_loose[name] if name not in stale else [sha, peeled.get(name)]
+                              for name, sha in loose.items()}
+            changed = True
+
+        if changed:
+            self._save(index)
+        return self._invert(index)
+
+    def _invert(self, index: dict) -> dict:
+        tags = dict(index["packed"])
+        # A loose ref shadows a packed ref of the same name
+        tags.update({name: commit for name, (_, commit) in index["loose"].items()})
+        by_commit = {}
+        for name, commit in tags.items():
+            if commit:
+                by_commit.setdefault(commit, []).append(name)
+        return by_commit
+
+    def _save(self, index: dict):
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_file)
+
+    def tags_at(self, commit: str) -> list:
+        """Returns the sorted names of the tags pointing at a commit."""
+        return sorted(self.by_commit.get(commit, []))
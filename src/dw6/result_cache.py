@@ -0,0 +1,62 @@
+# dw6/result_cache.py
+"""
+Reuses the Validator's passing test runs for content that was already tested.
+
+Each full run that passes is stored in logs/test_results.json. Its key combines
+the git tree hash of the working tree and the dependency fingerprint from
+dw6.install_cache. The tree hash covers uncommitted and untracked files, but
+leaves out logs/ and deliverables/, which dw6 itself writes between runs. When an
+approval is retried on the same code with the same dependencies, for example
+after a failed push or a revert, the Validator reuses the stored pass instead of
+running the suite again. Failed runs and runs limited to some tests are never
+stored.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_FILE = Path("logs/test_results.json")
+EXCLUDED_PATHS = ("logs", "deliverables")
+MAX_ENTRIES = 50
+
+
+def cache_key(git_manager):
+    """Returns (key, tree) for the current content and dependencies, or (None, None) outside a repository."""
+    from dw6 import install_cache
+    tree = git_manager.tree_hash(exclude=EXCLUDED_PATHS)
+    if not tree:
+        return None, None
+    components = json.dumps({"tree": tree, "dependencies": install_cache.fingerprint()}, sort_keys=True)
+    return hashlib.sha256(components.encode()).hexdigest(), tree
+
+
+def _load(results_file) -> dict:
+    try:
+        with open(results_file, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def lookup(key, results_file=None):
+    """Returns the stored passing run for a key, or None."""
+    return _load(results_file or RESULTS_FILE).get(key)
+
+
+def store(key, tree, report: dict, results_file=None):
+    """Stores a passing run, keeping only the most recent entries."""
+    from dw6 import pytest_report
+    results_file = Path(results_file or RESULTS_FILE)
+    results = _load(results_file)
+    results.pop(key, None)
+    results[key] = {
+        "tree": tree,
+        "passed_at": datetime.now(timezone.utc).isoformat(),
+        "summary": pytest_report.summary(report),
+    }
+    results = dict(list(results.items())[-MAX_ENTRIES:])
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, "w") as f:
+        json.dump(results, f, indent=2)
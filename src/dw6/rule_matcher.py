@@ -0,0 +1,39 @@
+# dw6/rule_matcher.py
+"""
+Compiled matching of commands against Governor rule prefixes.
+"""
+
+_TERMINAL = object()
+
+
+class PrefixMatcher:
+    """A character trie over a set of allowed command prefixes.
+
+    A lookup walks the command once, so its cost depends on the length of the
+    command rather than on the number of rules.
+    """
+
+    def __init__(self, prefixes):
+        self._root = {}
+        self.prefixes = tuple(prefixes)
+        for prefix in self.prefixes:
+            node = self._root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[_TERMINAL] = prefix
+
+    def match(self, command: str):
+        """Returns the shortest rule prefix that the command starts with, or None."""
+        node = self._root
+        if _TERMINAL in node:
+            return node[_TERMINAL]
+        for char in command:
+            node = node.get(char)
+            if node is None:
+                return None
+            if _TERMINAL in node:
+                return node[_TERMINAL]
+        return None
+
+    def __contains__(self, command: str) -> bool:
+        return self.match(command) is not None
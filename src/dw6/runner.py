@@ -0,0 +1,201 @@
+# dw6/runner.py
+"""
+Runs external commands with live output, bounded memory and hard timeouts.
+
+Output is read line by line while the command runs. Each line is echoed to the
+console and written to an optional log file, which keeps the last run. Only the last TAIL_LINES lines are
+kept in memory, and error reports show those. When a command's output is its
+result, as with git plumbing, stdout can be captured whole instead, and stderr
+still goes through the bounded tail.
+
+Every command runs in its own process group, so a timeout kills the command along
+with everything it started. A timeout is recorded as a structured failure in
+logs/step_failures.jsonl. Per-step timeouts, in seconds, come from
+[tool.dw6.timeouts]; 0 disables one.
+"""
+
+import collections
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+FAILURES_FILE = Path("logs/step_failures.jsonl")
+TAIL_LINES = 200
+KILL_GRACE = 5.0  # Seconds a timed out process group gets between SIGTERM and SIGKILL
+DEFAULT_TIMEOUTS = {"git": 300, "install": 900, "tests": 3600, "setup": 900}
+
+
+class RunResult:
+    """
+    The outcome of a command. stdout is the whole output if it was captured, else its
+    tail; log_paths lists the files that hold the whole output.
+    """
+
+    def __init__(self, command, returncode, stdout, stderr, duration, timeout=None, timed_out=False, log_paths=()):
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timeout = timeout
+        self.timed_out = timed_out
+        self.log_paths = list(log_paths)
+
+    @property
+    def ok(self) -> bool:
+        return not self.timed_out and self.returncode == 0
+
+    def describe(self) -> str:
+        if self.timed_out:
+            return f"timed out after {self.timeout}s and was killed"
+        return f"exited with status {self.returncode}"
+
+
+def step_timeout(step, pyproject_path=None):
+    """Returns the timeout for a step from [tool.dw6.timeouts], or None if it is disabled."""
+    from dw6.config import PYPROJECT_FILE, load_tool_config
+    timeouts = load_tool_config(pyproject_path or PYPROJECT_FILE).get("timeouts", {})
+    return timeouts.get(step, DEFAULT_TIMEOUTS.get(step)) or None
+
+
+def kill_process_group(process, grace=KILL_GRACE):
+    """Terminates a process started by run() and everything in its process group."""
+    if os.name != "posix":
+        process.kill()
+        process.wait()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=grace)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        pass
+    try:
+        os.killpg(process.pid, signal.SIGKILL)  # Whatever is left of the group, leader or not
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def popen(command, **kwargs):
+    """Starts a command in its own process group, so kill_process_group() can stop all of it."""
+    if os.name == "posix":
+        kwargs["start_new_session"] = True
+    else:
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    return subprocess.Popen(command, **kwargs)
+
+
+def run(command, cwd=None, env=None, input=None, timeout=None, log_path=None, echo=True, capture_stdout=False,
+        tail_lines=TAIL_LINES) -> RunResult:
+    """
+    Runs a command to completion or until timeout seconds have passed. Output is echoed
+    and logged as it arrives, and stdout and stderr are interleaved unless stdout is
+    captured. Never raises for a failed or timed out command; check the result.
+    """
+    started = time.monotonic()
+    log = None
+    if log_path:
+        Path(log_path).parent.mkdir(parents=True, exist_ok=True)
+        log = open(log_path, "w", encoding="utf-8")
+    output_lock = threading.Lock()
+    tail = collections.deque(maxlen=tail_lines)
+    captured = []
+
+    def show(line, console):
+        with output_lock:
+            tail.append(line)
+            if echo:
+                console.write(line)
+                console.flush()
+            if log:
+                log.write(line)
+
+    process = popen(
+        command,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.PIPE if input is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE if capture_stdout else subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    threads = []
+    if capture_stdout:
+        threads.append(threading.Thread(target=lambda: captured.append(process.stdout.read()), daemon=True))
+        threads.append(threading.Thread(target=_pump, args=(process.stderr, lambda line: show(line, sys.stderr)), daemon=True))
+    else:
+        threads.append(threading.Thread(target=_pump, args=(process.stdout, lambda line: show(line, sys.stdout)), daemon=True))
+    if input is not None:
+        threads.append(threading.Thread(target=_feed, args=(process.stdin, input), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    timed_out = False
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        kill_process_group(process)
+    except BaseException:
+        kill_process_group(process)  # e.g. Ctrl-C; never leave the group running
+        raise
+    finally:
+        for thread in threads:
+            thread.join(timeout=KILL_GRACE)
+        if log:
+            log.close()
+
+    with output_lock:
+        lines = "".join(tail)
+    return RunResult(
+        command,
+        process.returncode,
+        "".join(captured) if capture_stdout else lines,
+        lines if capture_stdout else "",
+        time.monotonic() - started,
+        timeout,
+        timed_out,
+        [log_path] if log_path else [],
+    )
+
+
+def _pump(pipe, sink):
+    for line in pipe:
+        sink(line)
+    pipe.close()
+
+
+def _feed(pipe, data):
+    try:
+        pipe.write(data)
+        pipe.close()
+    except (BrokenPipeError, OSError):
+        pass  # The command exited without reading all of its input
+
+
+def record_failure(step, result: RunResult, failures_file=None, **fields):
+    """Appends a structured record of a failed or timed out step."""
+    from dw6.history import timestamp
+    from dw6.locking import lock_for
+    failures_file = Path(failures_file or FAILURES_FILE)
+    failures_file.parent.mkdir(parents=True, exist_ok=True)
+    record = {
+        "ts": timestamp(),
+        "step": step,
+        "reason": "timeout" if result.timed_out else "exit",
+        "command": [str(part) for part in result.command],
+        "returncode": result.returncode,
+        "timeout": result.timeout,
+        "duration": round(result.duration, 3),
+        "tail": (result.stderr or result.stdout)[-4096:],
+        **fields,
+    }
+    with lock_for(failures_file), open(failures_file, "a") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
@@ -1,19 +1,18 @@
 import os
-import subprocess
 import sys
 
 def run_command(command, cwd=None):
-    """Runs a command and exits if it fails."""
+    """Runs a command, streaming its output, and exits if it fails or times out."""
+    from dw6 import runner
     print(f"Executing: {' '.join(command)}")
-    try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True, cwd=cwd)
-        print(result.stdout)
-        return result
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: Command failed: {' '.join(command)}", file=sys.stderr)
-        print(f"STDOUT: {e.stdout}", file=sys.stderr)
-        print(f"STDERR: {e.stderr}", file=sys.stderr)
+    result = runner.run(command, cwd=cwd, timeout=runner.step_timeout("setup"))
+    if not result.ok:
+        print(f"ERROR: Command failed: {' '.join(command)} ({result.describe()})", file=sys.stderr)
+        print(f"OUTPUT (last lines): {result.stdout}", file=sys.stderr)
+        if result.timed_out:
+            runner.record_failure("setup", result)
         sys.exit(1)
+    return result
 
 def create_venv(project_dir):
     """Creates a Python virtual environment."""
@@ -0,0 +1,169 @@
+# dw6/sharding.py
+"""
+Runs the Validator's test suite as parallel pytest shards.
+
+The suite is collected once, and the collected tests are split into shards with
+the longest-processing-time-first rule. It uses the per-test durations kept in
+logs/test_durations.json from earlier runs, and tests without a recorded duration
+count as the average. Each shard is a separate `python -m pytest` process that
+only imports its own test modules. It uses dw6.pytest_report to select its tests and
+report on them, and the shard reports are merged into one. Each shard's output
+goes to its own log file. Only the standard library and pytest are needed.
+"""
+
+import collections
+import heapq
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from dw6.config import package_env
+
+DURATIONS_FILE = Path("logs/test_durations.json")
+SHARD_LOG = "logs/pytest-shard-{index}.log"
+DEFAULT_DURATION = 0.1  # Seconds assumed per test when nothing has been recorded yet
+
+
+def resolve_jobs(jobs) -> int:
+    """Returns the number of shards to run; 0 means one per CPU."""
+    jobs = 1 if jobs is None else int(jobs)
+    if jobs == 0:
+        return os.cpu_count() or 1
+    return max(jobs, 1)
+
+
+def load_durations(durations_file=None) -> dict:
+    try:
+        with open(durations_file or DURATIONS_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def record_durations(report: dict, durations_file=None):
+    """Merges the test durations of a run into the recorded durations."""
+    durations_file = Path(durations_file or DURATIONS_FILE)
+    durations = load_durations(durations_file)
+    durations.update({nodeid: test["duration"] for nodeid, test in report["tests"].items()})
+    durations_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(durations_file, "w") as f:
+        json.dump(durations, f, indent=1, sort_keys=True)
+
+
+def partition(nodeids, jobs: int, durations: dict) -> list:
+    """Splits tests into at most `jobs` shards of similar expected duration."""
+    known = [durations[nodeid] for nodeid in nodeids if nodeid in durations]
+    default = sum(known) / len(known) if known else DEFAULT_DURATION
+    shards = [(0.0, index, []) for index in range(min(jobs, len(nodeids)))]
+    for nodeid in sorted(nodeids, key=lambda nodeid: durations.get(nodeid, default), reverse=True):
+        load, index, tests = heapq.heappop(shards)
+        tests.append(nodeid)
+        heapq.heappush(shards, (load + durations.get(nodeid, default), index, tests))
+    return [tests for _, _, tests in sorted(shards, key=lambda shard: shard[1])]
+
+
+def merge_reports(reports) -> dict:
+    """Combines shard reports into the report of a single run over all of their tests."""
+    merged = {"collected": 0, "passed": 0, "failed": 0, "skipped": 0, "error": 0,
+              "collection_errors": [], "exitstatus": 0, "duration": 0.0, "items": [], "tests": {}}
+    for report in reports:
+        for key in ("collected", "passed", "failed", "skipped", "error"):
+            merged[key] += report[key]
+        merged["collection_errors"] += [e for e in report["collection_errors"] if e not in merged["collection_errors"]]
+        merged["duration"] = max(merged["duration"], report["duration"])  # Shards run side by side
+        merged["items"] += report["items"]
+        merged["tests"].update(report["tests"])
+        if report["exitstatus"] != 0 and merged["exitstatus"] == 0:
+            merged["exitstatus"] = report["exitstatus"]
+    return merged
+
+
+def run_sharded(jobs: int, report_path: Path, selection=None, coverage_file=None, timeout=None):
+    """
+    Runs the suite in parallel shards and writes the merged report to report_path.
+    Returns (report, result) like a single run: report is None if pytest failed
+    before reporting, and result is a runner.RunResult with the tail of every shard's
+    output. selection optionally limits the run to some test ids and test files.
+    With coverage_file, each shard records test coverage next to it. timeout bounds
+    the whole run; when it expires every shard still running is killed.
+    """
+    from dw6 import pytest_report, runner
+    started = time.monotonic()
+    base_command = [sys.executable, "-m", "pytest", "-p", "dw6.pytest_report"]
+    env = package_env()
+    with tempfile.TemporaryDirectory(prefix="dw6-shards-") as tmp:
+        tmp = Path(tmp)
+        collect = runner.run(base_command + ["--collect-only", "-q", f"--dw6-report={tmp / 'collect.json'}"],
+                             env=env, timeout=timeout, echo=False)
+        collected = pytest_report.load(tmp / "collect.json")
+        if collect.timed_out or collected is None or collected["collection_errors"] or not collected["items"]:
+            # Nothing to shard; let the Validator report the collection problem
+            if collected is not None:
+                _write(collected, report_path)
+            return collected, collect
+
+        items = collected["items"]
+        if selection is not None:
+            selected = set(selection)
+            items = [nodeid for nodeid in items if nodeid in selected or nodeid.split("::", 1)[0] in selected]
+        shards = partition(items, jobs, load_durations())
+        print(f"Running {len(items)} tests in {len(shards)} parallel shards (output in {SHARD_LOG.format(index='*')})...")
+        processes = []
+        for index, tests in enumerate(shards):
+            select_file = tmp / f"shard-{index}.txt"
+            select_file.write_text("\n".join(tests) + "\n")
+            files = sorted({nodeid.split("::", 1)[0] for nodeid in tests})
+            log_path = Path(SHARD_LOG.format(index=index + 1))
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            command = base_command + ["-p", "no:cacheprovider", f"--dw6-report={tmp / f'shard-{index}.json'}",
+                                      f"--dw6-select={select_file}", *files]
+            shard_env = env
+            if coverage_file:
+                from dw6.impact import COVERAGE_ARGS
+                command[len(base_command):len(base_command)] = COVERAGE_ARGS  # After the plugin's own -p
+                shard_env = {**env, "COVERAGE_FILE": f"{coverage_file}.shard-{index}"}
+            with open(log_path, "w") as output:
+                processes.append((runner.popen(command, stdout=output, stderr=subprocess.STDOUT, env=shard_env), log_path))
+
+        timed_out = False
+        try:
+            for process, _ in processes:
+                remaining = None if timeout is None else max(timeout - (time.monotonic() - started), 0)
+                try:
+                    process.wait(timeout=remaining)
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+                    break
+        finally:
+            # On a timeout (or Ctrl-C) no shard is left running
+            for process, _ in processes:
+                if process.returncode is None:
+                    runner.kill_process_group(process)
+
+        reports, stdout = [], []
+        for index, (process, log_path) in enumerate(processes):
+            with open(log_path, "r", errors="replace") as output:
+                tail = "".join(collections.deque(output, maxlen=runner.TAIL_LINES))
+            stdout.append(f"--- Shard {index + 1}/{len(processes)} ({log_path}) ---\n{tail}")
+            reports.append(pytest_report.load(tmp / f"shard-{index}.json"))
+
+    result = runner.RunResult(base_command, max(process.returncode for process, _ in processes), "\n".join(stdout), "",
+                              time.monotonic() - started, timeout, timed_out, [log_path for _, log_path in processes])
+    missing = [index + 1 for index, report in enumerate(reports) if report is None]
+    if timed_out:
+        return None, result
+    if missing:
+        result.stderr = f"Shard {missing[0]} exited without reporting results."
+        return None, result
+    merged = merge_reports(reports)
+    _write(merged, report_path)
+    return merged, result
+
+
+def _write(report: dict, report_path: Path):
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=1)
@@ -0,0 +1,88 @@
+# dw6/startup_report.py
+"""
+Import-time breakdown of the `dw6` entry point, backing `dw6 --startup-report`.
+
+Every measurement runs in a fresh interpreter with `-X importtime`, so modules
+already imported by the reporting process don't hide their cost.
+"""
+
+import subprocess
+import sys
+
+# Import-time budget for `import dw6.main`, which is all a light command pays
+# before it starts working.
+ENTRY_POINT_BUDGET_MS = 60
+HEAVY_MODULES = ("git", "httpx", "dotenv", "toml", "fastapi", "uvicorn")
+
+
+def measure_imports(modules, python=None):
+    """Imports modules in a fresh interpreter and returns its -X importtime entries.
+
+    Each entry is a (name, self_us, cumulative_us, depth) tuple, in the order the
+    interpreter reported them.
+    """
+    statement = "; ".join(f"import {module}" for module in modules) or "pass"
+    result = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        self_us, cumulative_us, name = int(fields[0]), int(fields[1]), fields[2][1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        entries.append((name.strip(), self_us, cumulative_us, depth))
+    return entries
+
+
+def total_import_us(entries, after=None):
+    """Returns the total import time of a measurement, summed over its top-level imports.
+
+    With `after`, only the top-level imports that completed after that module count,
+    which isolates what a command adds on top of the entry point.
+    """
+    counting = after is None
+    total = 0
+    for name, _, cumulative, depth in entries:
+        if depth != 0:
+            continue
+        if counting:
+            total += cumulative
+        elif name == after:
+            counting = True
+    return total
+
+
+def module_import_ms(module, python=None):
+    """Returns the cumulative import time of one module in a fresh interpreter, in milliseconds."""
+    for name, _, cumulative, depth in measure_imports([module], python):
+        if name == module and depth == 0:
+            return cumulative / 1000
+    return 0.0
+
+
+def print_startup_report(command_imports, top=10):
+    """Prints the entry point's import breakdown and the extra imports of each command."""
+    entry = measure_imports(["dw6.main"])
+    entry_total = total_import_us(entry)
+    entry_ms = next((c / 1000 for n, _, c, d in entry if n == "dw6.main" and d == 0), 0.0)
+
+    print("--- DW6 Startup Report ---")
+    print(f"Interpreter + entry point imports: {entry_total / 1000:.1f} ms")
+    print(f"import dw6.main: {entry_ms:.1f} ms (budget {ENTRY_POINT_BUDGET_MS} ms)")
+    loaded_heavy = sorted({n.split(".")[0] for n, _, _, _ in entry} & set(HEAVY_MODULES))
+    if loaded_heavy:
+        print(f"WARNING: Heavy modules loaded at startup: {', '.join(loaded_heavy)}")
+
+    print(f"\nSlowest imports at startup (self time):")
+    for name, self_us, cumulative_us, _ in sorted(entry, key=lambda e: e[1], reverse=True)[:top]:
+        print(f"  {self_us / 1000:7.1f} ms  {name} (cumulative {cumulative_us / 1000:.1f} ms)")
+
+    print("\nExtra imports per command:")
+    for command, modules in command_imports.items():
+        extra_ms = total_import_us(measure_imports(["dw6.main", *modules]), after="dw6.main") / 1000 if modules else 0.0
+        print(f"  {command:<16} {extra_ms:+8.1f} ms  {', '.join(modules) or '-'}")
@@ -1,14 +1,29 @@
-import re
 import sys
 import os
-import subprocess
+import shutil
+import tempfile
+import weakref
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timezone
+from dw6 import audit
 from dw6 import git_handler
+from dw6 import history
+from dw6 import impact
+from dw6 import locking
+from dw6 import log_segments
+from dw6 import runner
+from dw6.config import load_tool_config, package_env
+from dw6.rule_matcher import PrefixMatcher
 
 MASTER_FILE = "docs/WORKFLOW_MASTER.md"
 REQUIREMENTS_FILE = "docs/PROJECT_REQUIREMENTS.md"
 APPROVAL_FILE = "logs/approvals.log"
+STATE_FILE = "logs/workflow_state.txt"
+PIPELINE_PREFIX = "Pipeline."
+INSTALL_LOG = "logs/install.log"
+PYTEST_LOG = "logs/pytest.log"
+MAX_FAILED_LISTED = 20  # Failed tests named in a technical debt item; its output blob has the rest
 STAGE_TRANSITIONS = {
     "Engineer": ["Researcher", "Coder"],
     "Researcher": ["Coder"],
@@ -60,18 +75,64 @@ class Governor:
         ]
     }
 
-    def __init__(self, state):
+    _matchers = {}
+
+    def __init__(self, state, requirement=None, validation_options=None):
         self.state = state
-        self.current_stage = self.state.get("CurrentStage")
+        self.requirement = requirement  # None means the single RequirementPointer pipeline
+        self.validation_options = validation_options or {}  # e.g. {"reinstall": True}
+        self.current_stage = self.state.get_stage(requirement)
+        self.state.on_rollback(self._sync_with_state)
+
+    def _sync_with_state(self):
+        self.current_stage = self.state.get_stage(self.requirement)
+
+    @property
+    def requirement_id(self):
+        return self.requirement if self.requirement is not None else self.state.get("RequirementPointer")
+
+    @classmethod
+    def matcher_for(cls, stage):
+        """Returns the compiled rule matcher for a stage, building it on first use."""
+        matcher = cls._matchers.get(stage)
+        if matcher is None:
+            matcher = cls._matchers[stage] = PrefixMatcher(cls.RULES.get(stage, []))
+        return matcher
+
+    def is_allowed(self, command: str) -> bool:
+        """Returns whether a command is allowed in the current stage, without printing or raising. Denials are audited."""
+        return all(verdict["allowed"] for verdict in self.verdicts([command]))
+
+    def verdicts(self, commands):
+        """
+        Yields one allow/deny verdict per command, for batch authorization. Every
+        authorization path computes its verdicts here, so this is where denials are
+        written to the audit log, in one write per batch.
+        """
+        matcher = self.matcher_for(self.current_stage)
+        denied = []
+        try:
+            for command in commands:
+                allowed = command in matcher
+                if not allowed:
+                    denied.append(command)
+                yield {"action": command, "allowed": allowed, "stage": self.current_stage}
+        finally:
+            audit.log_denials(self.current_stage, denied)
+
+    def denial_message(self, command: str) -> str:
+        return f"[GOVERNOR] Action denied. The command '{(command)}' is not allowed in the '{self.current_stage}' stage."
+
+    def approval_message(self) -> str:
+        return f"[GOVERNOR] Action authorized for stage '{self.current_stage}'."
 
     def authorize(self, command: str):
         """Checks if a command is allowed in the current stage."""
-        allowed_commands = self.RULES.get(self.current_stage, [])
-        if not any(command.startswith(prefix) for prefix in allowed_commands):
-            error_msg = f"[GOVERNOR] Action denied. The command '{(command)}' is not allowed in the '{self.current_stage}' stage."
+        if not self.is_allowed(command):
+            error_msg = self.denial_message(command)
             print(error_msg, file=sys.stderr)
             raise PermissionError(error_msg)
-        print(f"[GOVERNOR] Action authorized for stage '{self.current_stage}'.")
+        print(self.approval_message())
 
     def enforce_rules(self):
         rules = self.RULES.get(self.current_stage, ["No specific rules defined."])
@@ -83,29 +144,71 @@ class Governor:
     def approve(self, next_stage=None, with_tech_debt=False):
         old_stage = self.current_stage
         print(f"--- Governor: Received Approval Request for Stage: {old_stage} ---")
+        if self.requirement is not None:
+            print(f"--- Governor: Pipeline for requirement {self.requirement} ---")
+            # Refuse before any validation work if the next stage has no free slot
+            from dw6.pipelines import PipelineScheduler
+            PipelineScheduler(self.state).ensure_capacity(self._resolve_next_stage(next_stage), self.requirement)
         self.enforce_rules()
         self._validate_stage_exit_criteria(with_tech_debt)
-        # The original logic from WorkflowManager is now fully integrated here.
-        workflow_manager = WorkflowManager() # We still need access to its methods for now.
+        workflow_manager = WorkflowManager(state=self.state, requirement=self.requirement,
+                                           validation_options=self.validation_options)
         workflow_manager._validate_stage(allow_failures=with_tech_debt)
         workflow_manager._run_pre_transition_actions()
-
-        # Commit all changes before finalizing the transition
-        print("--- Governor: Committing all changes ---")
-        commit_message = f"feat: Finalize work for {old_stage} stage"
-        git_manager = git_handler.GitManager(str(Path.cwd()))
-        git_manager.commit_all(commit_message)
-        print("--- Governor: Committing complete ---")
-
-        self._transition_to_next_stage(next_stage) # This method now belongs to the Governor
-        workflow_manager._run_post_transition_actions(old_stage)
-        self.state.save()
-        print(f"--- Governor: Stage {old_stage} Approved. New Stage: {self.state.get('CurrentStage')} ---")
+        req_id = self.requirement_id
+        completes_cycle = self._resolve_next_stage(next_stage) == "Engineer"
+
+        # The transition lock serializes approvals and reverts of this pipeline from the check
+        # until the transition is written, so nothing needs writing before the commit. The new
+        # stage and LastCommitSHA are then written once, after the commit has succeeded.
+        # update() reloads and retries when other pipelines wrote the state meanwhile.
+        with self.transition_lock():
+            self.state.reload()
+            self._check_transition(old_stage, next_stage)
+            # Commit all changes before finalizing the transition
+            print("--- Governor: Committing all changes ---")
+            commit_message = f"feat: Finalize work for {old_stage} stage"
+            git_manager = git_handler.get_session()
+            log_segments.rotate_due()  # Logs over the limits are committed as compressed segments
+            git_manager.commit_all(commit_message)
+            print("--- Governor: Committing complete ---")
+            current_commit_sha = git_manager.get_current_commit_sha()
+            self.state.update(lambda state: self._apply_transition(old_stage, next_stage, current_commit_sha))
+        if completes_cycle:
+            self._log_approval(req_id)
+        workflow_manager._run_post_transition_actions(old_stage, current_commit_sha)
+        workflow_manager._queue_push()
+        print(f"--- Governor: Stage {old_stage} Approved. New Stage: {self.current_stage} ---")
+
+    def transition_lock(self):
+        """The lock held while this pipeline's stage is checked, committed and moved."""
+        key = f"{PIPELINE_PREFIX}{int(self.requirement)}" if self.requirement is not None else "CurrentStage"
+        return locking.lock_for(self.state.state_file.with_name(f"{self.state.state_file.name}.{key}"))
+
+    def _check_transition(self, old_stage, next_stage):
+        """Exits if the freshly loaded state no longer has this pipeline at old_stage, or the next stage is full."""
+        stage = self.state.get_stage(self.requirement)
+        if stage != old_stage:
+            print(f"ERROR: The stage was changed from '{old_stage}' to '{stage}' by another process during the approval. "
+                  "Review the new stage and approve again.", file=sys.stderr)
+            sys.exit(1)
+        self.current_stage = old_stage
+        if self.requirement is not None:
+            # Another pipeline may have taken the last slot while this one was validating
+            from dw6.pipelines import PipelineScheduler
+            PipelineScheduler(self.state).ensure_capacity(self._resolve_next_stage(next_stage), self.requirement)
+
+    def _apply_transition(self, old_stage, next_stage, current_commit_sha):
+        """Moves the freshly loaded state to the next stage and records the approval's commit."""
+        self._check_transition(old_stage, next_stage)
+        self._transition_to_next_stage(next_stage)
+        if current_commit_sha:
+            self.state.set("LastCommitSHA", current_commit_sha)
 
     def _validate_stage_exit_criteria(self, allow_failures=False):
         print(f"Governor: Validating exit criteria for stage: {self.current_stage}")
         if self.current_stage == "Engineer":
-            req_id = self.state.get("RequirementPointer")
+            req_id = self.requirement_id
             spec_file = Path(f"deliverables/engineering/cycle_{req_id}_technical_specification.md")
             if not spec_file.exists():
                 msg = f"ERROR: Exit criteria for 'Engineer' not met. Specification file not found: {spec_file}"
@@ -116,7 +219,7 @@ class Governor:
                 sys.exit(1)
             print("Governor: 'Engineer' exit criteria met.")
         elif self.current_stage == "Researcher":
-            req_id = self.state.get("RequirementPointer")
+            req_id = self.requirement_id
             research_dir = Path("deliverables/research")
             research_dir.mkdir(parents=True, exist_ok=True)
             report_file = research_dir / f"cycle_{req_id}_research_report.md"
@@ -144,7 +247,8 @@ class Governor:
                 sys.exit(1)
             print("Governor: 'Validator' exit criteria met. Test files are present.")
 
-    def _transition_to_next_stage(self, next_stage=None):
+    def _resolve_next_stage(self, next_stage=None):
+        """Returns the stage an approval moves to, exiting if the transition is invalid."""
         possible_next_stages = STAGE_TRANSITIONS.get(self.current_stage, [])
 
         if not possible_next_stages:
@@ -159,31 +263,59 @@ class Governor:
             new_stage = next_stage
         else:
             new_stage = possible_next_stages[0] # Default to the first possible transition
+        return new_stage
+
+    def _transition_to_next_stage(self, next_stage=None):
+        new_stage = self._resolve_next_stage(next_stage)
 
         if new_stage == "Engineer": # Assumes 'Engineer' starts a new cycle
             self._complete_requirement_cycle()
             # After completing a cycle, the stage is already set to Engineer by _complete_requirement_cycle
-            self.current_stage = self.state.get("CurrentStage")
+            self.current_stage = self.state.get_stage(self.requirement)
         else:
-            self.state.set("CurrentStage", new_stage)
+            self.state.record_event(history.make_event(
+                "transition", self.requirement_id, self.current_stage, new_stage, **self._pipeline_fields()))
+            self.state.set_stage(new_stage, self.requirement)
             self.current_stage = new_stage
 
-    def _complete_requirement_cycle(self):
-        req_id = int(self.state.get("RequirementPointer"))
+    def _pipeline_fields(self):
+        return {"pipeline": True} if self.requirement is not None else {}
+
+    def _log_approval(self, req_id):
         os.makedirs("logs", exist_ok=True)
         timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
-        with open(APPROVAL_FILE, "a") as f:
+        with locking.lock_for(APPROVAL_FILE), open(APPROVAL_FILE, "a") as f:
             f.write(f"Requirement {req_id} approved at {timestamp}\n")
         print(f"[INFO] Logged approval for Requirement ID {req_id}.")
+
+    def _complete_requirement_cycle(self):
+        req_id = int(self.requirement_id)
+        if self.requirement is not None:
+            # A finished pipeline simply closes; other pipelines keep their own stages
+            self.state.record_event(history.make_event("complete", req_id, self.current_stage, "Engineer", pipeline=True))
+            self.state.close_pipeline(req_id)
+            print(f"[INFO] Closed the pipeline for requirement {req_id}.")
+            return
         next_req_id = req_id + 1
+        self.state.record_event(history.make_event("complete", req_id, self.current_stage, "Engineer", next_req=next_req_id))
+        self.state.record_event(history.make_event("start", next_req_id, to_stage="Engineer"))
         self.state.set("RequirementPointer", next_req_id)
+        self.state.set("CurrentStage", "Engineer")
         print(f"[INFO] Advanced to next requirement: {next_req_id}.")
 
 class WorkflowManager:
-    def __init__(self):
-        self.state = WorkflowState()
-        self.governor = Governor(self.state) # The manager now has a governor
-        self.current_stage = self.state.get("CurrentStage")
+    def __init__(self, state=None, requirement=None, validation_options=None):
+        self.state = state if state is not None else WorkflowState()
+        self.requirement = requirement
+        self.validation_options = validation_options or {}  # e.g. {"reinstall": True}
+        self.governor = Governor(self.state, requirement, self.validation_options) # The manager now has a governor
+        self.current_stage = self.state.get_stage(requirement)
+        self.pre_transition_sha = None
+        self.pending_push = None  # (branch, tags) validated by the Deployer, queued once the approval is committed
+        self.state.on_rollback(self._sync_with_state)
+
+    def _sync_with_state(self):
+        self.current_stage = self.state.get_stage(self.requirement)
 
     def get_state(self):
         return self.state.data
@@ -233,6 +365,94 @@ class WorkflowManager:
             f.write("\n```")
         print(f"Coder deliverable created at: {deliverable_path}")
 
+    def _select_impacted_tests(self):
+        """
+        Returns (selection, impact_map) for impact mode ('dw6 approve --impact' or
+        [tool.dw6] test_selection = "impact"), or (None, None) when it is off. A None
+        selection means the whole suite runs.
+        """
+        if not (self.validation_options.get("impact") or load_tool_config().get("test_selection") == "impact"):
+            return None, None
+        impact_map = impact.ImpactMap()
+        selection, reason = impact_map.select(git_handler.get_session())
+        if selection is None:
+            print(f"[IMPACT] Running the full suite: {reason}.")
+            if not impact.coverage_available():
+                print("[IMPACT] WARNING: pytest-cov is not installed, so the impact map cannot be rebuilt.")
+        else:
+            print(f"[IMPACT] {reason}: running {len(selection)} affected test(s) and test file(s).")
+        return selection, impact_map
+
+    def _run_pytest(self, selection=None, impact_map=None):
+        """
+        Runs pytest once, or once per shard, with the bundled report plugin. Returns
+        (report, result): report is None if pytest ended before reporting, and result
+        is the runner.RunResult holding the tail of the output.
+        """
+        from dw6 import pytest_report, sharding
+        report_path = pytest_report.REPORT_FILE
+        report_path.unlink(missing_ok=True)
+        # A full run in impact mode records per-test coverage to rebuild the map
+        coverage_file = None
+        if impact_map is not None and selection is None and impact.coverage_available():
+            coverage_file = impact.COVERAGE_FILE
+            impact.clear_coverage(coverage_file)
+        jobs = self.validation_options.get("jobs")
+        jobs = sharding.resolve_jobs(load_tool_config().get("test_jobs", 1) if jobs is None else jobs)
+        if jobs > 1:
+            return sharding.run_sharded(jobs, report_path, selection, coverage_file, runner.step_timeout("tests"))
+
+        print("Running pytest...")
+        command = [sys.executable, "-m", "pytest", "-p", "dw6.pytest_report", f"--dw6-report={report_path}"]
+        env = package_env()
+        if coverage_file:
+            command += impact.COVERAGE_ARGS
+            env["COVERAGE_FILE"] = str(coverage_file)
+        with tempfile.TemporaryDirectory(prefix="dw6-select-") as tmp:
+            if selection is not None:
+                select_file = Path(tmp) / "selection.txt"
+                select_file.write_text("\n".join(selection) + "\n")
+                command += [f"--dw6-select={select_file}", *impact.existing_files(selection)]
+            # The report decides the outcome; the output streams to the console and PYTEST_LOG
+            result = runner.run(command, env=env, timeout=runner.step_timeout("tests"), log_path=PYTEST_LOG)
+        return pytest_report.load(report_path), result
+
+    def _log_tech_debt(self, summary, failed, result):
+        """
+        Registers a failed validation that was let through as a technical debt item. The
+        full output is stored as a content-addressed blob named after its normalized form,
+        so a repeated failure reuses its blob; the item lists the failed tests.
+        """
+        from dw6.blobs import BlobStore
+        from dw6.tech_debt import TechDebtStore
+        log_paths = [path for path in result.log_paths if os.path.exists(path)]
+        if log_paths:
+            blob = BlobStore().put_files(log_paths, normalize=True)
+        else:
+            blob = BlobStore().put_bytes((result.stdout + result.stderr).encode("utf-8"), normalize=True)
+        payload = "".join(f"Failed: {nodeid}\n" for nodeid in failed[:MAX_FAILED_LISTED])
+        if len(failed) > MAX_FAILED_LISTED:
+            payload += f"... and {len(failed) - MAX_FAILED_LISTED} more\n"
+        new_id = TechDebtStore().register(f"Validator failure in {self.current_stage}: {summary}", "test",
+                                          requirement=self.governor.requirement_id, payload=payload, blob=blob)
+        print(f"Logged technical debt {new_id}. See its output with 'dw6 tech-debt show {new_id}'.")
+
+    def _step_failed(self, step, result, allow_failures):
+        """
+        Reports a Validator step whose command failed or timed out. A timeout is also
+        recorded as a structured failure; with allow_failures it becomes technical debt.
+        """
+        if result.timed_out:
+            runner.record_failure(step, result, requirement=self.governor.requirement_id, stage=self.current_stage)
+        msg = f"ERROR: The {step} step {result.describe()}."
+        if allow_failures:
+            print(f"WARNING: {msg}")
+            self._log_tech_debt(f"{step} step {result.describe()}", [], result)
+            return False
+        print(msg, file=sys.stderr)
+        print(f"Last lines of output:\n{result.stdout}{result.stderr}", file=sys.stderr)
+        sys.exit(1)
+
     def _validate_tests(self, allow_failures=False):
         """Run test validation with optional failure tolerance."""
         print("Running test validation...")
@@ -246,77 +466,82 @@ class WorkflowManager:
             sys.exit(1)
 
         try:
-            # Install testing dependencies and run pytest
-            print("Installing testing dependencies...")
-            subprocess.run(["uv", "pip", "install", ".[test]"], check=True)
-            print("Dependencies installed.")
-
-            python_executable = sys.executable
-            collect_result = subprocess.run([python_executable, "-m", "pytest", "--collect-only"], 
-                                          capture_output=True, text=True, check=True)
-            
-            if "no tests collected" in collect_result.stdout.lower():
-                msg = "ERROR: Pytest collected no tests."
-                if allow_failures:
-                    print(f"WARNING: {msg}")
-                    return False
-                print(msg, file=sys.stderr)
-                print(collect_result.stdout, file=sys.stderr)
-                sys.exit(1)
-
-            match = re.search(r"collected (\d+) items", collect_result.stdout)
-            if not match or int(match.group(1)) == 0:
-                msg = "ERROR: Pytest collected no tests."
+            # A passing run of the same content with the same dependencies is reused
+            from dw6 import result_cache
+            cache_key, tree = result_cache.cache_key(git_handler.get_session())
+            cached = result_cache.lookup(cache_key) if cache_key else None
+            if cached and not self.validation_options.get("no_cache"):
+                print(f"[RESULTS] Cache hit: tree {tree[:7]} passed at {cached['passed_at']} with the same dependencies "
+                      f"({cached['summary']}), recorded in {result_cache.RESULTS_FILE}. Skipping the test run.")
+                return True
+            if cached:
+                print("[RESULTS] --no-cache given. Running the tests again.")
+
+            # Install testing dependencies (unless the last install is still current) and run pytest
+            from dw6 import install_cache
+            hit, reason = install_cache.check()
+            if hit and not self.validation_options.get("reinstall"):
+                print(f"[INSTALL] Cache hit: {reason}. Skipping install.")
+            else:
+                reason = "--reinstall given" if hit else reason
+                print(f"[INSTALL] Cache miss: {reason}. Installing testing dependencies...")
+                result = runner.run(["uv", "pip", "install", ".[test]"], timeout=runner.step_timeout("install"),
+                                    log_path=INSTALL_LOG)
+                if not result.ok:
+                    return self._step_failed("install", result, allow_failures)
+                install_cache.record()
+                print("Dependencies installed.")
+
+            from dw6 import pytest_report, sharding
+            selection, impact_map = self._select_impacted_tests()
+            if selection is not None and not impact.existing_files(selection):
+                print("[IMPACT] No tests are affected by the changes. Skipping the test run.")
+                print(f"[IMPACT] {impact_map.savings(selection, sharding.load_durations())}")
+                return True
+            report, result = self._run_pytest(selection, impact_map)
+            stdout, stderr = result.stdout, result.stderr
+            if result.timed_out:
+                return self._step_failed("tests", result, allow_failures)
+
+            if report is None or report["collected"] == 0 and not report["collection_errors"]:
+                msg = "ERROR: Pytest collected no tests." if report else "ERROR: Pytest exited without reporting results."
                 if allow_failures:
                     print(f"WARNING: {msg}")
                     return False
                 print(msg, file=sys.stderr)
-                print(collect_result.stdout, file=sys.stderr)
+                print(stdout, file=sys.stderr)
+                print(stderr, file=sys.stderr)
                 sys.exit(1)
 
-            print(f"Pytest collected {match.group(1)} tests. Running them now...")
-            result = subprocess.run(
-                [sys.executable, "-m", "pytest"],
-                capture_output=True,
-                text=True,
-                check=False  # We check the return code manually
-            )
-            
-            if result.returncode != 0:
+            print(f"Pytest {pytest_report.summary(report)}.")
+            if selection is not None:
+                print(f"[IMPACT] {impact_map.savings(selection, sharding.load_durations())}")
+            sharding.record_durations(report)
+            failed_tests = [nodeid for nodeid, test in report["tests"].items() if test["outcome"] in ("failed", "error")]
+            if failed_tests or report["collection_errors"] or report["exitstatus"] != 0:
                 msg = "Pytest validation failed:"
                 if allow_failures:
                     print(f"WARNING: {msg}")
-                    print(result.stdout)
-                    print(result.stderr)
-                    # Log the technical debt
-                    log_path = Path("logs/technical_debt.log")
-                    log_path.parent.mkdir(parents=True, exist_ok=True)
-                    with open(log_path, "a") as f:
-                        timestamp = datetime.now(timezone.utc).isoformat()
-                        f.write(f"--- Technical Debt Logged: {timestamp} ---\n")
-                        f.write(f"Stage: {self.current_stage}\n")
-                        f.write(f"Requirement ID: {self.state.get('RequirementPointer')}\n")
-                        f.write("Pytest Output:\n")
-                        f.write(result.stdout)
-                        f.write(result.stderr)
-                        f.write("--- End of Log ---\n\n")
+                    print(stdout)
+                    print(stderr)
+                    self._log_tech_debt(pytest_report.summary(report), report["collection_errors"] + failed_tests, result)
                     return False
                 print(msg, file=sys.stderr)
-                print(result.stdout, file=sys.stderr)
-                print(result.stderr, file=sys.stderr)
+                print(stdout, file=sys.stderr)
+                print(stderr, file=sys.stderr)
                 sys.exit(1)
 
+            if impact_map is not None and selection is None and impact.coverage_available():
+                impact_map.rebuild(git_handler.get_session().get_current_commit_sha(), report)
+                print("[IMPACT] Rebuilt the impact map from this run.")
+            if cache_key and selection is None:
+                result_cache.store(cache_key, tree, report)
             print("Pytest validation successful.")
             return True
 
-        except (FileNotFoundError, subprocess.CalledProcessError) as e:
-            msg = "ERROR: pytest command not found or failed to run. Is it installed in your venv?"
+        except FileNotFoundError:
+            msg = "ERROR: uv or pytest not found. Are they installed in your venv?"
             print(msg, file=sys.stderr)
-            if isinstance(e, subprocess.CalledProcessError):
-                print("--- Pytest STDOUT ---", file=sys.stderr)
-                print(e.stdout, file=sys.stderr)
-                print("--- Pytest STDERR ---", file=sys.stderr)
-                print(e.stderr, file=sys.stderr)
             if allow_failures:
                 print(f"WARNING: {msg}")
                 return False
@@ -324,53 +549,81 @@ class WorkflowManager:
 
     def _validate_deployment(self):
         print("Validating deployment...")
-        git_manager = git_handler.GitManager(str(Path.cwd()))
+        git_manager = git_handler.get_session()
         
         latest_commit = git_manager.get_current_commit_sha()
         if not latest_commit:
             print("ERROR: Could not get the latest commit SHA.", file=sys.stderr)
             sys.exit(1)
 
-        # Using the repo object from GitManager to check for tags
-        matching_tags = [tag.name for tag in git_manager.repo.tags if tag.commit.hexsha == latest_commit]
+        matching_tags = git_manager.tags_at(latest_commit)
 
         if not matching_tags:
             print(f"ERROR: The latest commit ({latest_commit[:7]}) has not been tagged locally.", file=sys.stderr)
             sys.exit(1)
 
         print(f"Deployment validation successful: Latest commit is tagged with: {', '.join(matching_tags)}.")
-        
-        print("Pushing changes to remote repository...")
-        git_manager.push_to_remote()
-        git_manager.push_tags() # Push the new tag
-        
+        self.pending_push = (git_manager.get_current_branch(), matching_tags)
         return True
 
+    def _queue_push(self):
+        """Queues the push validated by the Deployer. It is irreversible, so it waits until the approval is committed."""
+        if self.pending_push is None:
+            return
+        # The push is sent by a background worker, so the approval does not wait for the network
+        from dw6.outbox import Outbox, start_worker
+        git_manager = git_handler.get_session()
+        Outbox(git_manager).enqueue(*self.pending_push)
+        start_worker(git_manager.project_path)
+        self.pending_push = None
+        print("Push queued. Check its progress with 'dw6 outbox status'.")
+
     def _run_pre_transition_actions(self):
         """Actions to run before a stage transition begins."""
         print("--- Running Pre-Transition Actions ---")
         # Store the current commit SHA before the transition's commit happens
-        git_manager = git_handler.GitManager(str(Path.cwd()))
+        git_manager = git_handler.get_session()
         commit_sha = git_manager.get_current_commit_sha()
         if commit_sha:
-            self.state.set("LastCommitSHA_pre_transition", commit_sha)
-            self.state.save()
+            self.pre_transition_sha = commit_sha  # Kept in memory: concurrent pipelines would overwrite a shared key
             print(f"  - Stored pre-transition commit SHA: {commit_sha[:7]}")
         else:
             print("  - Warning: Could not retrieve pre-transition commit SHA.")
         print("--- Pre-Transition Actions Complete ---")
 
-    def _run_post_transition_actions(self, previous_stage):
-        """Actions to run after a stage transition is complete."""
+    def _write_coder_deliverable(self, git_manager, deliverable_path, previous_commit_sha, current_commit_sha):
+        """
+        Streams the diff into the Coder deliverable. The diff is spooled to a temporary
+        file while the changed files are collected, because the file list comes first
+        in the document. Returns False if there was nothing to write.
+        """
+        caps = load_tool_config().get("diff", {})
+        with tempfile.TemporaryFile() as spool:
+            changed_files = git_manager.stream_diff(
+                previous_commit_sha, spool,
+                max_file_bytes=caps.get("max_file_bytes", git_handler.DIFF_MAX_FILE_BYTES),
+                max_total_bytes=caps.get("max_total_bytes", git_handler.DIFF_MAX_TOTAL_BYTES),
+                generated=caps.get("generated", git_handler.DIFF_GENERATED_PATTERNS),
+            )
+            if not spool.tell():
+                return False
+            spool.seek(0)
+            deliverable_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(deliverable_path, "wb") as f:
+                f.write(b"# Coder Stage Deliverable\n\n")
+                f.write(f"Changes between {previous_commit_sha[:7]} and {current_commit_sha[:7]}\n\n".encode())
+                f.write("## Changed Files\n\n".encode())
+                f.write("\n".join(f"- `{file}`" for file in changed_files).encode())
+                f.write(b"\n\n## Diff\n\n```diff\n")
+                shutil.copyfileobj(spool, f)
+                f.write(b"\n```")
+        return True
+
+    def _run_post_transition_actions(self, previous_stage, current_commit_sha):
+        """Actions to run after a stage transition is complete. The approval already saved the commit's SHA."""
         print("--- Running Post-Transition Actions ---")
-        git_manager = git_handler.GitManager(str(Path.cwd()))
-        
-        # The 'approve' command should have already made a commit.
-        # We save the new commit SHA.
-        current_commit_sha = git_manager.get_current_commit_sha()
+        git_manager = git_handler.get_session()
         if current_commit_sha:
-            self.state.set("LastCommitSHA", current_commit_sha)
-            self.state.save()
             print(f"  - Saved current commit SHA: {current_commit_sha[:7]}")
         else:
             print("  - Warning: Could not retrieve current commit SHA.")
@@ -379,53 +632,60 @@ class WorkflowManager:
         if previous_stage == "Coder":
             print("  - Generating Coder stage deliverable...")
             # The 'previous' SHA is the one we stored before this transition's commit
-            previous_commit_sha = self.state.get("LastCommitSHA_pre_transition")
+            previous_commit_sha = self.pre_transition_sha
 
             if previous_commit_sha and previous_commit_sha != current_commit_sha:
-                changed_files, diff = git_manager.get_changes(previous_commit_sha)
-                if diff:
-                    deliverable_path = Path(DELIVERABLE_PATHS["Coder"]) / f"{previous_stage.lower()}_deliverable.md"
-                    deliverable_path.parent.mkdir(parents=True, exist_ok=True)
-                    with open(deliverable_path, "w") as f:
-                        f.write(f"# {previous_stage} Stage Deliverable\n\n")
-                        f.write(f"Changes between {previous_commit_sha[:7]} and {current_commit_sha[:7]}\n\n")
-                        f.write("## Changed Files\n\n")
-                        f.write("\n".join(f"- `{file}`" for file in changed_files))
-                        f.write("\n\n## Diff\n\n")
-                        f.write(f"```diff\n{diff}\n```")
+                deliverable_path = Path(DELIVERABLE_PATHS["Coder"]) / f"{previous_stage.lower()}_deliverable.md"
+                if self._write_coder_deliverable(git_manager, deliverable_path, previous_commit_sha, current_commit_sha):
                     print(f"  - Coder deliverable created at: {deliverable_path}")
                 else:
                     print("  - No diff found since pre-transition commit. Deliverable not generated.")
             else:
                 print("  - Warning: Could not determine previous commit or no new commit was made. Cannot generate diff.")
 
-        # Clean up the pre-transition SHA from the state file
-        if self.state.get("LastCommitSHA_pre_transition"):
-            self.state.set("LastCommitSHA_pre_transition", "")
-            self.state.save()
-
         print("--- Post-Transition Actions Complete ---")
 
 
 
 class WorkflowState:
     def __init__(self):
-        self.state_file = Path("logs/workflow_state.txt")
+        self.state_file = Path(STATE_FILE)
         self.data = {}
+        self.version = 0
+        self._transaction_depth = 0
+        self._pending_save = False
+        self._pending_events = []
+        self._rollback_hooks = []
         if self.state_file.exists():
-            with open(self.state_file, "r") as f:
-                for line in f:
-                    key, value = line.strip().split("=", 1)
-                    self.data[key] = value
+            self.reload()
         else:
             self.initialize_state()
 
+    def _read_file(self) -> dict:
+        data = {}
+        with open(self.state_file, "r") as f:
+            for line in f:
+                key, value = line.strip().split("=", 1)
+                data[key] = value
+        return data
+
+    def reload(self):
+        """Re-reads the state from disk, discarding unsaved changes. Used to retry after a conflict."""
+        self.data = self._read_file()
+        self.version = int(self.data.get("StateVersion", 0))
+        self._pending_save = False
+        self._pending_events = []
+
     def initialize_state(self):
-        self.data = {
-            "CurrentStage": "Engineer",
-            "RequirementPointer": "1"
-        }
-        self.save()
+        with locking.lock_for(self.state_file):
+            if self.state_file.exists():  # Another process initialized it first
+                self.reload()
+                return
+            self.data = {
+                "CurrentStage": "Engineer",
+                "RequirementPointer": "1"
+            }
+            self.save()
 
     def get(self, key):
         return self.data.get(key)
@@ -433,8 +693,125 @@ class WorkflowState:
     def set(self, key, value):
         self.data[key] = str(value)
 
+    def get_stage(self, requirement=None):
+        """Returns the stage of a requirement's pipeline, or CurrentStage for the single pointer."""
+        if requirement is None:
+            return self.get("CurrentStage")
+        return self.get(f"{PIPELINE_PREFIX}{int(requirement)}")
+
+    def set_stage(self, stage, requirement=None):
+        if requirement is None:
+            self.set("CurrentStage", stage)
+        else:
+            self.set(f"{PIPELINE_PREFIX}{int(requirement)}", stage)
+
+    def pipelines(self) -> dict:
+        """Returns {requirement: stage} for every open pipeline."""
+        return {int(key[len(PIPELINE_PREFIX):]): value
+                for key, value in self.data.items() if key.startswith(PIPELINE_PREFIX)}
+
+    def close_pipeline(self, requirement):
+        self.data.pop(f"{PIPELINE_PREFIX}{int(requirement)}", None)
+
+    def record_event(self, event: dict):
+        """Queues a history event; it is appended to the event log when the state is next written."""
+        self._pending_events.append(event)
+
+    def on_rollback(self, hook):
+        """
+        Calls a bound method whenever a transaction rolls back, so objects that cache
+        values read from the state can re-read them. The method is held weakly.
+        """
+        self._rollback_hooks = [ref for ref in self._rollback_hooks if ref() is not None]
+        self._rollback_hooks.append(weakref.WeakMethod(hook))
+
+    def _run_rollback_hooks(self):
+        hooks = [ref() for ref in self._rollback_hooks]
+        self._rollback_hooks = [ref for ref, hook in zip(self._rollback_hooks, hooks) if hook is not None]
+        for hook in filter(None, hooks):
+            hook()
+
+    @contextmanager
+    def transaction(self):
+        """Batches every set()/save() in the block into a single durable write.
+
+        The state is committed once when the outermost block exits normally. Any
+        exception, including SystemExit, restores the in-memory data, and the values
+        cached by on_rollback() subscribers such as the Governor, and leaves the state
+        file untouched.
+        """
+        snapshot = dict(self.data)
+        recorded_events = len(self._pending_events)
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.data = snapshot
+            del self._pending_events[recorded_events:]
+            if self._transaction_depth == 1:
+                self._pending_save = False
+            self._run_rollback_hooks()
+            raise
+        finally:
+            self._transaction_depth -= 1
+        if self._transaction_depth == 0 and self._pending_save:
+            self._pending_save = False
+            self._write()
+
+    def update(self, mutator, attempts=20):
+        """Applies mutator(state) and saves, reloading and retrying when another process won the race."""
+        for attempt in range(attempts):
+            try:
+                with self.transaction():
+                    mutator(self)
+                    self.save()
+                return
+            except locking.StateConflictError:
+                if attempt == attempts - 1:
+                    raise
+                self.reload()
+
     def save(self):
+        if self._transaction_depth:
+            self._pending_save = True
+            return
+        self._write()
+
+    def _write(self):
+        """Commits the state if nobody else did since it was loaded (compare-and-swap on StateVersion)."""
         self.state_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.state_file, "w") as f:
-            for key, value in self.data.items():
-                f.write(f"{key}={value}\n")
+        with locking.lock_for(self.state_file):
+            disk_version = int(self._read_file().get("StateVersion", 0)) if self.state_file.exists() else 0
+            if disk_version != self.version:
+                raise locking.StateConflictError(
+                    f"{self.state_file} was changed by another process (version {disk_version}, expected {self.version}).")
+            self.data["StateVersion"] = str(self.version + 1)
+            try:
+                self._write_atomically()
+            except BaseException:
+                self.data["StateVersion"] = str(self.version)
+                raise
+            self.version += 1
+            if self._pending_events:
+                events, self._pending_events = self._pending_events, []
+                history.StateHistory().append(events, self.data)
+
+    def _write_atomically(self):
+        """Writes the state to a temporary file, fsyncs it and atomically renames it into place."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_file.parent, prefix=f".{self.state_file.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                for key, value in self.data.items():
+                    f.write(f"{key}={value}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.state_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        dir_fd = os.open(self.state_file.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -0,0 +1,303 @@
+# dw6/tech_debt.py
+"""
+Technical debt items: registration, queries and resolution.
+
+logs/technical_debt.log, a dw6.record_log log, stays the record of every item, one
+`[ID:n] [TS:...] [TYPE:...] [STATUS:OPEN] [COMMIT:...] [REQ:...] description`
+header per item. Captured output is kept out of the log: an item refers to a
+dw6.blobs blob with `[BLOB:sha256] [SIZE:bytes]`, and its framed payload only
+names the failed tests. Resolving an item appends a `[RESOLVES:n]` record. Nothing is
+ever edited in place.
+
+Queries go through a SQLite index in logs/.index/technical_debt.sqlite, with
+indexes on status, type, commit and requirement. Like the history index, it is
+brought up to date incrementally from the last indexed offset, so a query reads
+only what was appended since the previous one, and it can always be deleted.
+The offsets are dw6.log_segments logical offsets, so they survive rotation and
+a query never opens the rotated segments it has already indexed.
+Free-text entries written by older versions are numbered in place when an index
+update first comes across them, so the first query of an old log migrates it;
+`dw6 tech-debt migrate` does the same on demand.
+"""
+
+import os
+import re
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from dw6.history import parse_timestamp
+from dw6.locking import lock_for
+from dw6.record_log import HEADER, RecordLog, format_record
+
+TECH_DEBT_FILE = Path("logs/technical_debt.log")
+INDEX_FILE = Path("logs/.index/technical_debt.sqlite")
+HEADER_TIME_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+SCHEMA_VERSION = "2"
+HEADER_TIME = re.compile(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d UTC$")
+TAGS = re.compile(r"(?:\[[A-Z]+:[^\]]*\] ?)*")
+TAG = re.compile(r"\[([A-Z]+):([^\]]*)\]")
+LEGACY_BLOCK_START = "--- Technical Debt Logged: "
+LEGACY_BLOCK_END = "--- End of Log ---"
+
+TABLES = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    type TEXT,
+    status TEXT NOT NULL,
+    commit_sha TEXT,
+    requirement INTEGER,
+    description TEXT,
+    resolved_at TEXT,
+    resolved_by INTEGER,
+    blob TEXT,
+    blob_size INTEGER,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+# Created after a rebuild has inserted every row, which is several times faster than maintaining them
+INDEXES = """
+CREATE INDEX IF NOT EXISTS items_status ON items (status, ts);
+CREATE INDEX IF NOT EXISTS items_type ON items (type, ts);
+CREATE INDEX IF NOT EXISTS items_commit ON items (commit_sha);
+CREATE INDEX IF NOT EXISTS items_requirement ON items (requirement, ts);
+CREATE INDEX IF NOT EXISTS items_ts ON items (ts);
+"""
+
+
+def parse_header(text: str):
+    """Splits a header's text into its [TAG:value] fields and the free text after them."""
+    end = TAGS.match(text).end()
+    return dict(TAG.findall(text, 0, end)), text[end:]
+
+
+def header_time(value: str) -> str:
+    """Converts a header's TS (or an ISO 8601 time) to the sortable history timestamp format."""
+    if HEADER_TIME.match(value):
+        return f"{value[:10]}T{value[11:19]}.000000Z"  # Already UTC; skip strptime, which dominates indexing
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        return ""  # Unparseable; the item still lists, but never matches a time filter
+
+
+class TechDebtStore:
+    """Registers, queries and resolves technical debt items."""
+
+    def __init__(self, log_file=None, index_file=None):
+        self.log = RecordLog(log_file or TECH_DEBT_FILE)
+        self.index_file = Path(index_file or INDEX_FILE)
+
+    def register(self, description, issue_type="test", commit=None, requirement=None, payload=None, blob=None) -> int:
+        """Appends an open item and returns its ID. blob is the (digest, size) of its stored output."""
+        header = f"[TS:{datetime.now(timezone.utc).strftime(HEADER_TIME_FORMAT)}] [TYPE:{issue_type}] [STATUS:OPEN] "
+        if commit:
+            header += f"[COMMIT:{commit}] "
+        if requirement is not None:
+            header += f"[REQ:{requirement}] "
+        if blob:
+            header += f"[BLOB:{blob[0]}] [SIZE:{blob[1]}] "
+        return self.log.append(header + description, payload)
+
+    def resolve(self, item_id: int, note=None) -> dict:
+        """Marks an open item as resolved. Raises KeyError if it does not exist, ValueError if it is not open."""
+        with lock_for(self.log.path):
+            item = self.get(item_id)
+            if item is None:
+                raise KeyError(item_id)
+            if item["status"] != "OPEN":
+                raise ValueError(f"Technical debt {item_id} is already {item['status']}.")
+            now = datetime.now(timezone.utc).strftime(HEADER_TIME_FORMAT)
+            resolution_id = self.log.append(f"[TS:{now}] [RESOLVES:{item_id}] {note or 'Resolved.'}")
+        return {**item, "status": "RESOLVED", "resolved_by": resolution_id}
+
+    def migrate(self) -> int:
+        """Numbers any free-text entries older versions wrote; returns how many there were."""
+        with lock_for(self.log.path):
+            if not self.log.path.exists():
+                return 0
+            migrated = migrate_legacy_entries(self.log)
+            if migrated:
+                # Every offset after the first entry has moved
+                self.index_file.unlink(missing_ok=True)
+        return migrated
+
+    def get(self, item_id: int):
+        """Returns an item as a dict, or None."""
+        rows = self._select("SELECT * FROM items WHERE id = ?", [item_id])
+        return rows[0] if rows else None
+
+    def payload(self, item: dict):
+        """Returns an item's payload text from the log, or None."""
+        return self.log.read_at(item["offset"])[2]
+
+    def query(self, status=None, issue_type=None, since=None, until=None, requirement=None, commit=None, limit=None) -> list:
+        """Returns the items matching every given filter, oldest first. Times are ISO 8601."""
+        clauses, params = [], []
+        for column, value in (("status", status), ("type", issue_type), ("requirement", requirement)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if commit:
+            clauses.append("commit_sha LIKE ?")  # Abbreviated hashes match too
+            params.append(f"{commit}%")
+        if since:
+            clauses.append("ts >= ?")
+            params.append(parse_timestamp(since))
+        if until:
+            clauses.append("ts != '' AND ts < ?")  # An unparseable time matches no time filter
+            params.append(parse_timestamp(until))
+        sql = "SELECT * FROM items" + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY id"
+        if limit:
+            sql = f"SELECT * FROM ({sql} DESC LIMIT {int(limit)}) ORDER BY id"
+        return self._select(sql, params)
+
+    def _select(self, sql, params) -> list:
+        with self._connect() as connection:
+            self._catch_up(connection)
+            connection.row_factory = _row_dict
+            return connection.execute(sql, params).fetchall()
+
+    def _connect(self):
+        import sqlite3
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.index_file)
+        connection.executescript(TABLES + INDEXES)
+        return closing(connection)
+
+    def _catch_up(self, connection):
+        """
+        Indexes the records appended since the index was last brought up to date,
+        first migrating any free-text entries among them.
+        """
+        with lock_for(self.log.path):
+            if self._index_new_records(connection) and migrate_legacy_entries(self.log):
+                connection.execute("DELETE FROM meta")  # Every offset after the first entry has moved
+                self._index_new_records(connection)
+
+    def _index_new_records(self, connection) -> int:
+        """Indexes the records after the last indexed offset; returns how many free-text entries it passed."""
+        meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+        offset, legacy = int(meta.get("offset", 0)), 0
+        end = self.log.segments.end()
+        if meta.get("schema") != SCHEMA_VERSION or offset > end:
+            # New index, or the log was replaced: rebuild from scratch
+            connection.executescript("DROP TABLE items;" + TABLES)
+            offset = 0
+        if offset == end:
+            return 0
+        items = []
+        # Offsets are logical, so records rotated away since the last query are still found
+        for line in self.log.segments.lines_from(offset):
+            if line.startswith(b"[ID:"):
+                match = HEADER.match(line.decode("utf-8", errors="replace").rstrip("\n"))
+                if match:
+                    self._index_record(connection, items, int(match.group(1)), match.group(2), offset)
+            elif line.startswith(LEGACY_BLOCK_START.encode()):
+                legacy += 1
+            offset += len(line)
+        _insert_items(connection, items)
+        connection.executescript(INDEXES)
+        connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               [("offset", str(offset)), ("schema", SCHEMA_VERSION)])
+        connection.commit()
+        return legacy
+
+    def _index_record(self, connection, items: list, record_id: int, text: str, offset: int):
+        """Queues an item row in items, or applies a resolution to the rows indexed so far."""
+        fields, description = parse_header(text)
+        ts = header_time(fields.get("TS", ""))
+        if "MIGRATED" in fields:
+            return
+        if "RESOLVES" in fields:
+            _insert_items(connection, items)
+            connection.execute("UPDATE items SET status = 'RESOLVED', resolved_at = ?, resolved_by = ? WHERE id = ?",
+                               (ts, record_id, int(fields["RESOLVES"])))
+            return
+        requirement, blob_size = fields.get("REQ", ""), fields.get("SIZE", "")
+        items.append((record_id, ts, fields.get("TYPE"), fields.get("STATUS", "OPEN").upper(), fields.get("COMMIT"),
+                      int(requirement) if requirement.isdigit() else None, description, fields.get("BLOB"),
+                      int(blob_size) if blob_size.isdigit() else None, offset))
+
+
+def _insert_items(connection, items: list):
+    connection.executemany(
+        "INSERT OR REPLACE INTO items (id, ts, type, status, commit_sha, requirement, description, blob, blob_size, offset) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        items,
+    )
+    items.clear()
+
+
+def migrate_legacy_entries(log: RecordLog) -> int:
+    """
+    Rewrites free-text "--- Technical Debt Logged ---" blocks, as older Validators
+    wrote them, into numbered records where they stand, numbered after the existing
+    ones. A block ends at its End line, or at the next record or block when that is
+    missing. Returns how many blocks were migrated. The caller holds the log's lock.
+    """
+    with open(log.path, "r", encoding="utf-8", errors="replace") as f:
+        if not any(line.startswith(LEGACY_BLOCK_START) for line in f):
+            return 0
+        f.seek(0)
+        entries, block = [], None  # Each entry is a kept line or a block's list of lines
+        for line in f:
+            if block is not None and (HEADER.match(line) or line.startswith(LEGACY_BLOCK_START)):
+                block = None
+            if line.startswith(LEGACY_BLOCK_START):
+                block = [line]
+                entries.append(block)
+            elif block is not None:
+                block.append(line)
+                if line.startswith(LEGACY_BLOCK_END):
+                    block = None
+            elif line.strip():
+                entries.append(line)
+
+    next_id = max((record_id for record_id, _, _ in log.records()), default=0)
+    count = 0
+    tmp_path = log.path.with_suffix(f".{os.getpid()}.migrating")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            if isinstance(entry, list):
+                count += 1
+                f.write(format_record(next_id + count, *_legacy_record(entry)))
+            else:
+                f.write(entry)
+        # The migrated IDs are out of file order; a last record with the highest ID keeps allocation right
+        now = datetime.now(timezone.utc).strftime(HEADER_TIME_FORMAT)
+        f.write(format_record(next_id + count + 1, f"[TS:{now}] [MIGRATED:{count}] Numbered {count} free-text entries in place."))
+    os.replace(tmp_path, log.path)
+    log.seq_path.unlink(missing_ok=True)
+    print(f"Migrated {count} free-text technical debt entries in {log.path} to numbered records.")
+    return count
+
+
+def _legacy_record(block):
+    """Returns the (header text, payload) of a numbered record for a legacy block."""
+    logged_at = block[0][len(LEGACY_BLOCK_START):].strip().rstrip("-").strip()
+    fields, payload = {}, []
+    for line in block[1:]:
+        key, _, value = line.partition(":")
+        if key in ("Stage", "Requirement ID", "Summary") and not payload:
+            fields[key] = value.strip()
+        elif not line.startswith(LEGACY_BLOCK_END):
+            payload.append(line.rstrip("\n"))
+    while payload and not payload[-1].strip():
+        payload.pop()
+    try:
+        header = f"[TS:{datetime.fromisoformat(logged_at).astimezone(timezone.utc).strftime(HEADER_TIME_FORMAT)}] "
+    except ValueError:
+        header = ""  # Listed without a time, which is kept in the payload
+        payload.insert(0, f"Logged: {logged_at}")
+    header += "[TYPE:test] [STATUS:OPEN] "
+    if fields.get("Requirement ID", "").isdigit():
+        header += f"[REQ:{fields['Requirement ID']}] "
+    header += f"Validator failure in {fields.get('Stage', 'Validator')}: {fields.get('Summary', 'pytest failed')}"
+    return header, "\n".join(payload)
+
+
+def _row_dict(cursor, row) -> dict:
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
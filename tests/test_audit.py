@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import audit, main
+from dw6.log_segments import SegmentedLog
+from dw6.state_manager import Governor, WorkflowState
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+EVENTS = ("KERNEL LOCKED", "KERNEL UNLOCKED", "GOVERNOR DENIED [Coder] git push")
+
+
+def write_log(path, count, step=timedelta(minutes=1)):
+    with open(path, "w") as f:
+        for n in range(count):
+            moment = START + n * step
+            # isoformat() leaves out whole-second microseconds, as the real writer does
+            moment = moment.replace(microsecond=0 if n % 2 else 5)
+            f.write(f"{moment.isoformat()} - {EVENTS[n % 3]} by user: user{n % 4}\n")
+
+
+def brute_force(path, since, until, **filters):
+    with open(path, "rb") as f:
+        entries = [audit.parse_entry(line) for line in f]
+    return [entry for entry in entries if since <= datetime.fromisoformat(entry["ts"]) < until
+            and all(entry[key] == value for key, value in filters.items())]
+
+
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 1000])
+def test_window_matches_a_full_scan(tmp_path, count):
+    path = tmp_path / "audit.log"
+    write_log(path, count)
+    for since, until in [(START, START + timedelta(hours=3)), (START + timedelta(seconds=30), START + timedelta(minutes=2)),
+                         (START - timedelta(days=1), START + timedelta(days=30)), (START + timedelta(days=1), START)]:
+        got = list(audit.query(since.isoformat(), until.isoformat(), denials=True, log_file=path))
+        assert got == brute_force(path, since, until)
+
+
+def test_filters_and_denials(tmp_path):
+    path = tmp_path / "audit.log"
+    write_log(path, 120)
+    unlocks = list(audit.query(user="user1", event="kernel unlocked", log_file=path))
+    assert unlocks and all(e["user"] == "user1" and e["event"] == "KERNEL UNLOCKED" for e in unlocks)
+    assert len(unlocks) == len(brute_force(path, START, START + timedelta(days=1), user="user1", event="KERNEL UNLOCKED"))
+    assert not any(e["event"].startswith(audit.DENIAL_EVENT) for e in audit.query(log_file=path))
+    assert len(list(audit.query(event="denied", denials=True, log_file=path))) == 40
+
+
+def test_query_reads_rotated_segments(tmp_path):
+    path = tmp_path / "audit.log"
+    write_log(path, 3000)
+    SegmentedLog(path).rotate()
+    with open(path, "a") as f:
+        f.write(f"{(START + timedelta(days=10)).isoformat()} - KERNEL LOCKED by user: late\n")
+    since, until = START + timedelta(minutes=100), START + timedelta(minutes=2000)
+    got = list(audit.query(since.isoformat(), until.isoformat(), log_file=path))
+    assert [e["ts"][:16] for e in got[:1]] == [(START + timedelta(minutes=100)).isoformat()[:16]]
+    assert len(got) == len([n for n in range(100, 2000) if n % 3 != 2])
+    assert [e["user"] for e in audit.query(since=(START + timedelta(days=5)).isoformat(), log_file=path)] == ["late"]
+
+
+def test_query_time_does_not_depend_on_log_size(tmp_path):
+    path = tmp_path / "audit.log"
+    write_log(path, 300_000, step=timedelta(seconds=1))
+    started = time.perf_counter()
+    got = list(audit.query((START + timedelta(hours=40)).isoformat(), (START + timedelta(hours=40, minutes=1)).isoformat(),
+                           denials=True, log_file=path))
+    assert len(got) == 60
+    assert time.perf_counter() - started < 0.05
+
+
+def test_governor_denials_are_audited(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    governor = Governor(WorkflowState())
+    with pytest.raises(PermissionError):
+        governor.authorize("git push --force\nrm -rf /")
+    monkeypatch.setattr(sys, "argv", ["dw6", "audit", "query", "--denials", "--event", "denied"])
+    main.main()
+    out = capsys.readouterr().out
+    assert f"GOVERNOR DENIED [{governor.current_stage}] git push --force rm -rf /" in out
+    assert out.rstrip().endswith("1 audit event(s).")
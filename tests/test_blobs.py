@@ -0,0 +1,74 @@
+import gzip
+import os
+import sys
+import textwrap
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import runner
+from dw6.blobs import BlobStore
+
+OUTPUT = b"".join(b"FAILED tests/test_x.py::test_%d - assert 0 == 1\n" % n for n in range(20_000))
+
+
+def test_identical_outputs_are_stored_once_compressed(tmp_path):
+    store = BlobStore(tmp_path / "blobs")
+    log = tmp_path / "pytest.log"
+    log.write_bytes(OUTPUT)
+
+    digest, size = store.put_files([log])
+    assert store.put_bytes(OUTPUT) == (digest, size) == (digest, len(OUTPUT))
+    stored = list((tmp_path / "blobs").rglob("*.gz"))
+    assert stored == [store.path_for(digest)]
+    assert stored[0].stat().st_size < len(OUTPUT) / 10
+    assert gzip.decompress(stored[0].read_bytes()) == OUTPUT
+    assert not list((tmp_path / "blobs").glob("*.tmp"))
+
+
+def test_stream_returns_the_content_in_chunks(tmp_path):
+    store = BlobStore(tmp_path)
+    first, second = tmp_path / "shard-1.log", tmp_path / "shard-2.log"
+    first.write_bytes(b"shard one\n")
+    second.write_bytes(OUTPUT)
+    digest, _ = store.put_files([first, second])
+    chunks = list(store.stream(digest, chunk_size=4096))
+    assert len(chunks) > 1
+    assert b"".join(chunks) == b"shard one\n" + OUTPUT
+
+
+def test_repeated_test_failures_share_a_normalized_blob(tmp_path):
+    (tmp_path / "test_flaky.py").write_text(textwrap.dedent("""
+        import datetime, random, time
+
+        def test_fails(tmp_path):
+            time.sleep(random.random() / 10)
+            print(datetime.datetime.now().isoformat(), tmp_path, object())
+            assert (tmp_path / "missing").exists()
+    """))
+    store = BlobStore(tmp_path / "blobs")
+    runs = []
+    for n in range(2):
+        log = tmp_path / f"pytest-{n}.log"
+        command = [sys.executable, "-m", "pytest", "-p", "no:cacheprovider", "--durations=0", "-vv", "test_flaky.py"]
+        result = runner.run(command, cwd=tmp_path, echo=False, log_path=log)
+        assert result.returncode == 1
+        runs.append(log)
+
+    assert runs[0].read_bytes() != runs[1].read_bytes()
+    first, second = (store.put_files([log], normalize=True) for log in runs)
+    assert first == second
+    assert len(list((tmp_path / "blobs").rglob("*.gz"))) == 1
+    assert first[1] == len(runs[0].read_bytes())
+    assert b"".join(store.stream(first[0])) == runs[0].read_bytes()  # The evidence, exactly as captured
+
+
+def test_normalized_blob_round_trips_byte_for_byte(tmp_path):
+    store = BlobStore(tmp_path)
+    output = (b"0.51s call     tests/t.py::a\n<object at 0x7f3a2b1c9d00> /tmp/tmpab12cd_9\n"
+              b"==== 1 failed in 0.45s ====\nno newline at the end")
+    digest, size = store.put_bytes(output, normalize=True)
+    assert size == len(output)
+    assert b"".join(store.stream(digest)) == output
+    assert gzip.decompress(store.path_for(digest).read_bytes()) == output
+    assert store.put_bytes(output.replace(b"0.45s", b"112.5s"), normalize=True) == (digest, size)
+    assert b"".join(store.stream(digest)) == output  # The first copy is kept
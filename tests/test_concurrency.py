@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6.kernel_manager import KernelManager
+from dw6.main import register_meta_requirement, register_technical_debt
+from dw6.state_manager import WorkflowState
+
+PROCESSES = 6
+OPERATIONS = 20
+# Lenient floor for the whole mixed workload, in operations per second across all processes.
+MIN_THROUGHPUT = 20
+
+
+def increment_counter(state):
+    state.set("Counter", int(state.get("Counter") or 0) + 1)
+
+
+def agent(project):
+    os.chdir(project)
+    sys.stdout = open(os.devnull, "w")
+    state = WorkflowState()
+    kernel = KernelManager(Path(project))
+    for _ in range(OPERATIONS):
+        register_meta_requirement("concurrent agent")
+        register_technical_debt("concurrent agent")
+        kernel._log_audit_event("STRESS")
+        state.update(increment_counter)
+
+
+def logged_ids(path):
+    with open(path) as f:
+        return [int(m.group(1)) for m in re.finditer(r"^\[ID:(\d+)\]", f.read(), re.MULTILINE)]
+
+
+def test_concurrent_agents_lose_no_writes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pyproject.toml").write_text('[tool.dw6]\nkernel_files = ["src/dw6/main.py"]\n')
+    WorkflowState()
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=agent, args=(str(tmp_path),)) for _ in range(PROCESSES)]
+
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+    elapsed = time.monotonic() - started
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    total = PROCESSES * OPERATIONS
+    assert sorted(logged_ids("logs/meta_requirements.log")) == list(range(1, total + 1))
+    assert sorted(logged_ids("logs/technical_debt.log")) == list(range(1, total + 1))
+    with open("logs/audit.log") as f:
+        assert len(f.readlines()) == total
+    state = WorkflowState()
+    assert state.get("Counter") == str(total)
+    assert state.version == total + 1
+    assert (total * 4) / elapsed >= MIN_THROUGHPUT
@@ -1,8 +1,274 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
+import unittest.mock
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import git_handler
+from dw6.git_handler import GitManager, get_session
+
+
+def make_repo(path):
+    env = {"GIT_CONFIG_GLOBAL": os.devnull}
+    subprocess.run(["git", "init", "-q", "-b", "main", str(path)], check=True, env={**os.environ, **env})
+    subprocess.run(["git", "-C", str(path), "config", "user.email", "dw6@example.com"], check=True)
+    subprocess.run(["git", "-C", str(path), "config", "user.name", "dw6"], check=True)
+    (Path(path) / "README.md").write_text("hello\n")
+    subprocess.run(["git", "-C", str(path), "add", "."], check=True)
+    subprocess.run(["git", "-C", str(path), "commit", "-q", "-m", "initial"], check=True)
+
+
+class TestGitSession(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name)
+        make_repo(self.path)
+        git_handler.reset_sessions()
+
+    def tearDown(self):
+        git_handler.reset_sessions()
+        self.tmp.cleanup()
+
+    def test_session_is_shared_per_project(self):
+        self.assertIs(get_session(self.path), get_session(str(self.path)))
+
+    def test_head_is_cached_until_commit(self):
+        manager = get_session(self.path)
+        before = GitManager.subprocess_count
+        first = manager.get_current_commit_sha()
+        self.assertEqual(manager.get_current_commit_sha(), first)
+        self.assertEqual(manager.get_current_branch(), "main")
+        self.assertEqual(manager.get_current_branch(), "main")
+        self.assertEqual(GitManager.subprocess_count - before, 2)
+
+        (self.path / "README.md").write_text("changed\n")
+        manager.commit_all("change")
+        self.assertNotEqual(manager.get_current_commit_sha(), first)
+
+    def test_stream_diff_collects_files_and_applies_caps(self):
+        manager = get_session(self.path)
+        base = manager.get_current_commit_sha()
+        (self.path / "big.py").write_text("".join(f"line {i}\n" for i in range(1000)))
+        (self.path / "uv.lock").write_text("pinned\n")
+        (self.path / "image.bin").write_bytes(bytes(range(256)))
+        (self.path / "README.md").rename(self.path / "README.txt")
+        manager.commit_all("add files")
+
+        sink = io.BytesIO()
+        changed = manager.stream_diff(base, sink, max_file_bytes=500)
+        diff = sink.getvalue().decode()
+
+        self.assertEqual(sorted(changed), ["README.txt", "big.py", "image.bin", "uv.lock"])
+        self.assertIn("bytes of this file's diff truncated", diff)
+        self.assertIn("generated file, diff omitted", diff)
+        self.assertNotIn("+pinned", diff)
+        self.assertIn("Binary files /dev/null and b/image.bin differ", diff)
+
+    def test_stream_diff_total_cap(self):
+        manager = get_session(self.path)
+        base = manager.get_current_commit_sha()
+        for name in ("a.py", "b.py"):
+            (self.path / name).write_text("x\n" * 200)
+        manager.commit_all("add files")
+
+        sink = io.BytesIO()
+        changed = manager.stream_diff(base, sink, max_total_bytes=100)
+        self.assertEqual(changed, ["a.py", "b.py"])
+        self.assertIn(b"diff truncated after 100 bytes", sink.getvalue())
+        self.assertNotIn(b"b/b.py", sink.getvalue())
+
+    def test_stream_diff_survives_a_full_stderr_pipe(self):
+        manager = get_session(self.path)
+        base = manager.get_current_commit_sha()
+        # A textconv filter that writes far more to stderr than a pipe buffer holds
+        noisy = self.path / ".git" / "noisy.sh"
+        noisy.write_text('#!/bin/sh\nhead -c 1000000 /dev/zero | tr "\\0" x >&2\ncat "$1"\n')
+        noisy.chmod(0o755)
+        self.git("config", "diff.noisy.textconv", str(noisy))
+        (self.path / ".gitattributes").write_text("*.txt diff=noisy\n")
+        (self.path / "notes.txt").write_text("note\n")
+        manager.commit_all("add notes")
+
+        sink, changed = io.BytesIO(), []
+        thread = threading.Thread(target=lambda: changed.extend(manager.stream_diff(base, sink)), daemon=True)
+        thread.start()
+        thread.join(timeout=30)
+        self.assertFalse(thread.is_alive(), "stream_diff deadlocked on git's stderr")
+        self.assertEqual(changed, [".gitattributes", "notes.txt"])
+        self.assertIn(b"+note", sink.getvalue())
+
+    def git(self, *args):
+        return subprocess.run(["git", "-C", str(self.path), *args], check=True, capture_output=True, text=True)
+
+    def test_tag_index_packed_loose_and_refresh(self):
+        manager = get_session(self.path)
+        head = manager.get_current_commit_sha()
+        self.git("tag", "v1")
+        self.git("tag", "-a", "v2", "-m", "annotated")
+        self.git("pack-refs", "--all")
+        self.git("tag", "-a", "v3", "-m", "annotated, loose")
+        self.git("tag", "nested/v4")
+        self.git("tag", "tree-tag", "HEAD^{tree}")
+        self.assertEqual(manager.tags_at(head), ["nested/v4", "v1", "v2", "v3"])
+
+        # A fresh session reuses the cached index and only resolves new loose tags
+        git_handler.reset_sessions()
+        manager = get_session(self.path)
+        before = GitManager.subprocess_count
+        self.assertEqual(manager.tags_at(head), ["nested/v4", "v1", "v2", "v3"])
+        self.assertEqual(GitManager.subprocess_count, before)
+
+        git_handler.reset_sessions()
+        self.git("tag", "-d", "v1")
+        self.git("tag", "v5")
+        self.assertEqual(get_session(self.path).tags_at(head), ["nested/v4", "v2", "v3", "v5"])
+
+    def test_atomic_push_to_local_bare_remote(self):
+        remote = self.path.parent / (self.path.name + "-remote.git")
+        subprocess.run(["git", "init", "-q", "--bare", str(remote)], check=True)
+        self.addCleanup(subprocess.run, ["rm", "-rf", str(remote)])
+        self.git("remote", "add", "origin", str(remote))
+        config_before = (self.path / ".git" / "config").read_bytes()
+        manager = get_session(self.path)
+        self.git("tag", "-a", "v1", "-m", "release")
+
+        manager.push_to_remote(tags=["v1"])
+        remote_refs = subprocess.run(["git", "-C", str(remote), "show-ref"], capture_output=True, text=True).stdout
+        self.assertIn("refs/heads/main", remote_refs)
+        self.assertIn("refs/tags/v1", remote_refs)
+        self.assertEqual((self.path / ".git" / "config").read_bytes(), config_before)
+
+        # The remote already has a different v2, so the branch update must be rejected too
+        subprocess.run(["git", "-C", str(remote), "tag", "v2", "main"], check=True)
+        (self.path / "README.md").write_text("next\n")
+        manager.commit_all("next")
+        self.git("tag", "v2")
+        with self.assertRaises(SystemExit):
+            manager.push_to_remote(tags=["v2"])
+        remote_head = subprocess.run(["git", "-C", str(remote), "rev-parse", "main"], capture_output=True, text=True).stdout.strip()
+        self.assertNotEqual(remote_head, manager.get_current_commit_sha())
+
+    def test_credential_helper_reads_token_from_environment(self):
+        self.git("remote", "add", "origin", "https://github.com/example/repo.git")
+        manager = get_session(self.path)
+        env = {**os.environ, "GITHUB_TOKEN": "secret-token", "GIT_TERMINAL_PROMPT": "0"}
+        with unittest.mock.patch.dict(os.environ, {"GITHUB_TOKEN": "secret-token"}):
+            options = manager._credential_options()
+        result = subprocess.run(["git", *options, "credential", "fill"], cwd=self.path, env=env,
+                                input="protocol=https\nhost=github.com\n\n", capture_output=True, text=True, check=True)
+        self.assertIn("username=x-access-token", result.stdout)
+        self.assertIn("password=secret-token", result.stdout)
+        self.assertNotIn("secret-token", " ".join(options))
+
+    def test_incremental_commit_stages_only_dirty_paths(self):
+        manager = get_session(self.path)
+        (self.path / "keep.txt").write_text("keep\n")
+        (self.path / "old name.txt").write_text("rename me\n")
+        manager.commit_all("base")
+        (self.path / "README.md").unlink()
+        (self.path / "new dir").mkdir()
+        (self.path / "new dir" / "file.txt").write_text("new\n")
+        self.git("mv", "old name.txt", "new name.txt")
+
+        kinds = {path: (kind, original) for kind, _, path, original in manager.status()}
+        self.assertEqual(kinds["README.md"], ("1", None))
+        self.assertEqual(kinds["new name.txt"], ("2", "old name.txt"))
+        self.assertEqual(kinds["new dir/"], ("?", None))
+
+        manager.commit_all("changes")
+        self.assertEqual(manager.status(), [])
+        tracked = subprocess.run(["git", "-C", str(self.path), "ls-files"], capture_output=True, text=True).stdout.split("\n")
+        self.assertEqual([path for path in tracked if path], ["keep.txt", "new dir/file.txt", "new name.txt"])
+
+    def test_incremental_commit_from_a_project_below_the_top(self):
+        (self.path / "app").mkdir()
+        (self.path / "app" / "a.py").write_text("a\n")
+        manager = get_session(self.path / "app")
+        manager.commit_all("add app")
+        (self.path / "app" / "a.py").write_text("b\n")
+        (self.path / "app" / "new.py").write_text("new\n")
+
+        manager.commit_all("change app")
+        self.assertEqual(manager.status(), [])
+        tracked = self.git("ls-files").stdout.split()
+        self.assertEqual(tracked, ["README.md", "app/a.py", "app/new.py"])
+
+    def test_clean_tree_skips_commit(self):
+        manager = get_session(self.path)
+        manager.status()  # Warm up the cached status options
+        head = manager.get_current_commit_sha()
+        before = GitManager.subprocess_count
+        manager.commit_all("nothing")
+        self.assertEqual(GitManager.subprocess_count - before, 1)
+        self.assertEqual(manager.get_current_commit_sha(), head)
+
+    def test_cleanliness_counts_scope_and_sees_every_edit(self):
+        manager = get_session(self.path)
+        (self.path / "src").mkdir()
+        (self.path / "src" / "a.py").write_text("a\n")
+        manager.commit_all("add src")
+        self.assertEqual(manager.cleanliness(), {"clean": True, "dirty": 0, "untracked": 0})
+
+        # Working tree edits change neither the index nor HEAD, and are still seen at once
+        (self.path / "README.md").write_text("changed\n")
+        (self.path / "notes.txt").write_text("new\n")
+        self.assertEqual(manager.cleanliness(), {"clean": False, "dirty": 1, "untracked": 1})
+        self.assertTrue(manager.is_working_directory_clean(paths=["src"]))
+        (self.path / "src" / "a.py").write_text("b\n")
+        self.assertFalse(manager.is_working_directory_clean(paths=["src"]))
+
+        self.git("add", "notes.txt")
+        self.assertEqual(manager.cleanliness(), {"clean": False, "dirty": 3, "untracked": 0})
+
+    def test_tree_hash_covers_uncommitted_changes_but_not_excluded_paths(self):
+        manager = get_session(self.path)
+        clean = manager.tree_hash(exclude=("logs",))
+        self.assertEqual(clean, self.git("rev-parse", "HEAD^{tree}").stdout.strip())
+
+        (self.path / "logs").mkdir()
+        (self.path / "logs" / "run.log").write_text("noise\n")
+        self.assertEqual(manager.tree_hash(exclude=("logs",)), clean)
+
+        (self.path / "notes.txt").write_text("new\n")
+        changed = manager.tree_hash(exclude=("logs",))
+        self.assertNotEqual(changed, clean)
+        self.assertEqual(self.git("status", "--porcelain").stdout, "?? logs/\n?? notes.txt\n")
+        (self.path / "notes.txt").unlink()
+        manager.status()  # Settles the status options, which run git once
+        before = GitManager.subprocess_count
+        self.assertEqual(manager.tree_hash(exclude=("logs",)), clean)
+        self.assertEqual(GitManager.subprocess_count - before, 1)  # A clean tree is HEAD's, read after the scan
+
+    def test_tree_hash_matches_staging_everything(self):
+        manager = get_session(self.path)
+        (self.path / "src").mkdir()
+        (self.path / "src" / "a.py").write_text("a\n")
+        (self.path / "gone.txt").write_text("gone\n")
+        self.git("add", ".")
+        self.git("commit", "-q", "-m", "more")
+        (self.path / "README.md").write_text("changed\n")
+        (self.path / "gone.txt").unlink()
+        self.git("mv", "src/a.py", "src/b.py")
+        (self.path / "src" / "b.py").write_text("b\n")
+        (self.path / "new dir").mkdir()
+        (self.path / "new dir" / "c.txt").write_text("c\n")
+
+        expected_index = self.path / ".git" / "expected-index"
+        env = {**os.environ, "GIT_INDEX_FILE": str(expected_index)}
+        subprocess.run(["git", "add", "-A"], cwd=self.path, check=True, env=env)
+        expected = subprocess.run(["git", "write-tree"], cwd=self.path, check=True, env=env,
+                                  capture_output=True, text=True).stdout.strip()
+        staged = self.git("ls-files", "--stage").stdout
+        self.assertEqual(get_session(self.path).tree_hash(), expected)
+        self.assertEqual(self.git("ls-files", "--stage").stdout, staged)
 
-class TestGitHandler(unittest.TestCase):
-    pass
 
 if __name__ == '__main__':
     unittest.main()
-
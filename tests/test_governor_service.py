@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from dw6 import audit, governor_service
+from dw6.governor_service import GovernorService, create_app
+
+
+def write_state(stage):
+    os.makedirs("logs", exist_ok=True)
+    with open("logs/workflow_state.txt", "w") as f:
+        f.write(f"CurrentStage={stage}\nRequirementPointer=1\n")
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_state("Coder")
+    return tmp_path
+
+
+def test_service_reloads_when_state_file_changes(project):
+    service = GovernorService()
+    assert service.authorize("ls -la")["allowed"]
+    assert not service.authorize("git commit -m x")["allowed"]
+
+    write_state("Deployer")
+    os.utime("logs/workflow_state.txt", ns=(time.time_ns() + 10**9,) * 2)
+
+    verdict = service.authorize("git commit -m x")
+    assert verdict["allowed"]
+    assert verdict["stage"] == "Deployer"
+
+
+def test_authorize_endpoint(project):
+    client = TestClient(create_app())
+    response = client.post("/authorize", json={"action": "mkdir src"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "allowed": True,
+        "stage": "Coder",
+        "message": "[GOVERNOR] Action authorized for stage 'Coder'.",
+    }
+    denied = client.post("/authorize", json={"action": "git push"}).json()
+    assert denied["allowed"] is False
+    assert "not allowed in the 'Coder' stage" in denied["message"]
+
+
+def test_pipeline_requests_do_not_pile_up_rollback_hooks(project):
+    service = GovernorService()
+    client = TestClient(create_app(service))
+    for _ in range(3):
+        assert client.post("/authorize", json={"action": "ls", "req": 1}).status_code == 200
+    hooks = len(service.governor.state._rollback_hooks)
+    for _ in range(50):
+        client.post("/authorize", json={"action": "ls", "req": 1})
+        client.post("/authorize/batch", json={"actions": ["ls"], "req": 2})
+    assert len(service.governor.state._rollback_hooks) <= hooks + 1
+
+
+def test_service_denials_are_audited(project):
+    service = GovernorService()
+    assert not service.authorize("git push")["allowed"]
+    verdicts = service.authorize_batch(["mkdir src", "git tag v1", "rm -rf /"])
+    assert [verdict["allowed"] for verdict in verdicts] == [True, False, False]
+
+    events = [entry["event"] for entry in audit.query(denials=True)]
+    assert events == ["GOVERNOR DENIED [Coder] git push", "GOVERNOR DENIED [Coder] git tag v1",
+                      "GOVERNOR DENIED [Coder] rm -rf /"]
+
+
+def test_client_returns_none_without_service(project):
+    assert governor_service.request_authorization("ls", socket_path=project / "missing.sock") is None
+
+
+def test_client_round_trip_over_unix_socket(project):
+    import uvicorn
+
+    socket_path = project / "gov.sock"
+    server = uvicorn.Server(uvicorn.Config(create_app(), uds=str(socket_path), log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not server.started and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert server.started
+
+        verdict = governor_service.request_authorization("write_to_file a.py", socket_path=socket_path)
+        assert verdict["allowed"] is True
+        assert verdict["stage"] == "Coder"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
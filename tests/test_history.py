@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import history
+from dw6.history import StateHistory, make_event
+from dw6.state_manager import Governor, WorkflowState
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def event_at(ts, event_type, req, from_stage=None, to_stage=None, **fields):
+    event = make_event(event_type, req, from_stage, to_stage, **fields)
+    event["ts"] = ts
+    return event
+
+
+def record_two_cycles(state_history):
+    state_history.append([
+        event_at("2026-01-01T10:00:00.000000Z", "transition", 1, "Engineer", "Coder"),
+        event_at("2026-01-02T10:00:00.000000Z", "transition", 1, "Coder", "Validator"),
+        event_at("2026-01-03T10:00:00.000000Z", "transition", 1, "Validator", "Deployer"),
+    ], {"CurrentStage": "Deployer", "RequirementPointer": "1"})
+    state_history.append([
+        event_at("2026-01-04T10:00:00.000000Z", "complete", 1, "Deployer", "Engineer", next_req=2),
+        event_at("2026-01-04T10:00:00.000000Z", "start", 2, to_stage="Engineer"),
+        event_at("2026-01-05T10:00:00.000000Z", "transition", 2, "Engineer", "Coder"),
+    ], {"CurrentStage": "Coder", "RequirementPointer": "2"})
+
+
+def test_point_in_time_queries(project):
+    state_history = StateHistory()
+    record_two_cycles(state_history)
+
+    assert [e["to"] for e in state_history.transitions(1)] == ["Coder", "Validator", "Deployer", "Engineer"]
+    assert state_history.stage_at(1, "2026-01-02T12:00:00.000000Z")[0] == "Validator"
+    assert state_history.stage_at(1, "2026-02-01T00:00:00.000000Z")[0] == "Completed"
+    assert state_history.stage_at(2, "2026-01-03T00:00:00.000000Z") == (None, None)
+    assert state_history.stage_at(2, "2026-01-04T12:00:00.000000Z")[0] == "Engineer"
+    assert state_history.state_at("2026-01-04T12:00:00.000000Z") == {"CurrentStage": "Engineer", "RequirementPointer": "2"}
+
+
+def test_snapshots_and_index_rebuild(project, monkeypatch):
+    monkeypatch.setattr(history, "SNAPSHOT_INTERVAL", 2)
+    state_history = StateHistory()
+    record_two_cycles(state_history)
+    assert len(state_history._load_index()["snapshots"]) == 2
+
+    os.remove(history.INDEX_FILE)
+    rebuilt = StateHistory()
+    assert rebuilt._load_index()["last_seq"] == 6
+    assert rebuilt.state_at("2026-01-05T12:00:00.000000Z") == {"CurrentStage": "Coder", "RequirementPointer": "2"}
+    assert rebuilt.state_at("2026-01-02T12:00:00.000000Z") == {"CurrentStage": "Validator"}
+
+
+def test_appends_only_add_to_the_index(project):
+    state_history = StateHistory()
+    record_two_cycles(state_history)
+    with open(history.ENTRIES_FILE, "a") as f:
+        f.write("e\t1\t2026-01-0")  # Left behind by an append that never wrote its header
+
+    for day in range(6, 26):
+        state_history.append([event_at(f"2026-01-{day:02d}T10:00:00.000000Z", "revert", 2, "Coder", "Engineer")],
+                             {"CurrentStage": "Engineer", "RequirementPointer": "2"})
+        assert os.path.getsize(history.INDEX_FILE) < 128  # Just the header, however many events there are
+
+    with open(history.ENTRIES_FILE) as f:
+        assert len(f.read().splitlines()) == 26
+    assert len(state_history.transitions(1)) == 4
+    assert len(state_history.transitions(2)) == 22
+
+
+def test_transitions_are_recorded_on_commit_only(project):
+    state = WorkflowState()
+    governor = Governor(state)
+    with state.transaction():
+        governor._transition_to_next_stage("Coder")
+        state.save()
+    with pytest.raises(SystemExit):
+        with state.transaction():
+            governor._transition_to_next_stage("Validator")
+            state.save()
+            sys.exit(1)
+
+    events = StateHistory().transitions(1)
+    assert [(e["type"], e["from"], e["to"]) for e in events] == [("transition", "Engineer", "Coder")]
+    assert events[0]["seq"] == 1
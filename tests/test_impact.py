@@ -0,0 +1,126 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import impact
+from dw6.git_handler import GitManager
+
+ITEMS = ["tests/test_a.py::test_one", "tests/test_a.py::test_two", "tests/test_b.py::test_three"]
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", os.devnull)
+    monkeypatch.chdir(tmp_path)
+
+    def git(*args):
+        subprocess.run(["git", *args], check=True, capture_output=True)
+
+    git("init", "-q", "-b", "main")
+    git("config", "user.email", "dw6@example.com")
+    git("config", "user.name", "dw6")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "tests").mkdir()
+    for name in ("src/a.py", "src/b.py", "tests/test_a.py", "tests/test_b.py", "pyproject.toml", "notes.md"):
+        (tmp_path / name).write_text("# v1\n")
+    git("add", ".")
+    git("commit", "-q", "-m", "base")
+    manager = GitManager(str(tmp_path))
+    impact_map = impact.ImpactMap(tmp_path / "impact.json")
+    impact_map.data = {
+        "commit": manager.get_current_commit_sha(),
+        "items": ITEMS,
+        "sources": {"src/a.py": ITEMS[:2], "src/b.py": ITEMS[1:]},
+    }
+    return tmp_path, manager, impact_map
+
+
+def test_no_map_runs_everything(tmp_path):
+    selection, reason = impact.ImpactMap(tmp_path / "missing.json").select(None)
+    assert selection is None
+    assert "no impact map" in reason
+
+
+def test_changed_source_selects_the_tests_that_cover_it(project):
+    path, manager, impact_map = project
+    (path / "src/a.py").write_text("# v2\n")
+    (path / "notes.md").write_text("# v2\n")
+
+    selection, _ = impact_map.select(manager)
+
+    assert selection == ITEMS[:2]
+    assert impact_map.savings(selection, {ITEMS[2]: 1.5}) == "Skipped 1 of 3 tests, saving about 1.5s."
+
+
+def test_changed_and_new_test_files_are_selected_whole(project):
+    path, manager, impact_map = project
+    (path / "tests/test_b.py").write_text("# v2\n")
+    (path / "tests/test_c.py").write_text("# new\n")
+
+    selection, _ = impact_map.select(manager)
+
+    assert selection == ["tests/test_b.py", "tests/test_c.py"]
+    assert impact.existing_files(selection + ["tests/test_gone.py::test_x"]) == selection
+
+
+def test_unrelated_change_selects_nothing(project):
+    path, manager, impact_map = project
+    (path / "notes.md").write_text("# v2\n")
+    subprocess.run(["git", "commit", "-q", "-am", "notes"], check=True, capture_output=True)
+
+    selection, reason = impact_map.select(manager)
+
+    assert selection == []
+    assert reason.startswith("1 file(s) changed")
+
+
+def test_config_change_or_unrelated_history_runs_everything(project):
+    path, manager, impact_map = project
+    (path / "pyproject.toml").write_text("# v2\n")
+    assert impact_map.select(manager) == (None, "pyproject.toml changed")
+
+    subprocess.run(["git", "commit", "-q", "-am", "config"], check=True, capture_output=True)
+    subprocess.run(["git", "checkout", "-q", "--orphan", "other"], check=True, capture_output=True)
+    subprocess.run(["git", "commit", "-q", "-m", "other"], check=True, capture_output=True)
+    impact_map.data["commit"] = subprocess.run(["git", "rev-parse", "main"], check=True, capture_output=True,
+                                               text=True).stdout.strip()
+    selection, reason = impact_map.select(manager)
+    assert selection is None
+    assert "not an ancestor" in reason
+
+
+def test_rebuild_reads_test_contexts_from_coverage(tmp_path, monkeypatch):
+    coverage = pytest.importorskip("coverage")
+    monkeypatch.chdir(tmp_path)
+    data = coverage.CoverageData(basename=str(tmp_path / ".coverage.impact"))
+    data.set_context("tests/test_a.py::test_one|run")
+    data.add_lines({str(tmp_path / "src" / "a.py"): [1, 2]})
+    data.set_context("tests/test_b.py::test_three|setup")
+    data.add_lines({str(tmp_path / "src" / "a.py"): [3], str(tmp_path / "src" / "b.py"): [1]})
+    data.write()
+
+    impact_map = impact.ImpactMap(tmp_path / "impact.json")
+    impact_map.rebuild("abc123", {"items": ITEMS}, tmp_path / ".coverage.impact")
+
+    saved = json.loads((tmp_path / "impact.json").read_text())
+    assert saved["commit"] == "abc123"
+    assert saved["sources"] == {
+        os.path.join("src", "a.py"): ["tests/test_a.py::test_one", "tests/test_b.py::test_three"],
+        os.path.join("src", "b.py"): ["tests/test_b.py::test_three"],
+    }
+
+
+def test_unmapped_source_or_missing_commit_runs_everything(project):
+    path, manager, impact_map = project
+    (path / "src/c.py").write_text("# new\n")
+    assert impact_map.select(manager) == (None, "src/c.py is not in the impact map")
+
+    impact_map.data["commit"] = "0" * 40
+    selection, reason = impact_map.select(manager)
+    assert selection is None
+    assert "is not in the repository" in reason
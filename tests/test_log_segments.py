@@ -0,0 +1,101 @@
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import log_segments
+from dw6.log_segments import SegmentedLog
+from dw6.record_log import RecordLog
+from dw6.tech_debt import TechDebtStore
+
+
+def audit_lines(count, start=datetime(2024, 1, 1, tzinfo=timezone.utc)):
+    return [f"{(start + timedelta(seconds=n)).isoformat()} - KERNEL LOCKED by user: u{n}\n" for n in range(count)]
+
+
+def test_rotation_keeps_every_line_reachable_by_logical_offset(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_segments, "BLOCK_SIZE", 1024)
+    path = tmp_path / "audit.log"
+    log = SegmentedLog(path, archive_dir=tmp_path / "archive")
+    lines = audit_lines(500)
+    path.write_text("".join(lines[:300]))
+    segment = log.rotate()
+    with open(path, "a") as f:
+        f.writelines(lines[300:])
+
+    assert path.read_text() == "".join(lines[300:])
+    assert (segment["seq"], segment["start"], segment["end"]) == (1, 0, len("".join(lines[:300])))
+    assert (segment["first_ts"], segment["last_ts"]) == ("2024-01-01T00:00:00.000000Z", "2024-01-01T00:04:59.000000Z")
+    assert len(log.blocks(segment)) > 10
+    segment_file = tmp_path / "archive" / "audit.log" / segment["file"]
+    assert gzip.decompress(segment_file.read_bytes()).decode() == "".join(lines[:300])  # Still plain gzip
+
+    offset = len("".join(lines[:250]))
+    assert [line.decode() for line in log.lines_from(offset)] == lines[250:]
+    assert log.end() == len("".join(lines))
+
+
+def test_rotation_is_due_by_size_or_age(tmp_path):
+    path = tmp_path / "approvals.log"
+    log = SegmentedLog(path, archive_dir=tmp_path / "archive")
+    path.write_text(f"Requirement 1 approved at {datetime.now(timezone.utc):%Y-%m-%d %H:%M:%S} UTC\n")
+    assert log.maybe_rotate({"max_bytes": 1024, "max_age_days": 30}) is None
+    path.write_text("Requirement 1 approved at 2020-01-01 00:00:00 UTC\n")
+    assert log.maybe_rotate({"max_bytes": 1024, "max_age_days": 30})["first_ts"] == "2020-01-01T00:00:00.000000Z"
+    path.write_text("".join(audit_lines(20, datetime.now(timezone.utc))))
+    assert log.maybe_rotate({"max_bytes": 1024, "max_age_days": 0})["seq"] == 2
+    assert [segment["seq"] for segment in log.segments()] == [1, 2]
+
+
+def test_record_ids_and_tech_debt_offsets_survive_rotation(tmp_path):
+    store = TechDebtStore(tmp_path / "technical_debt.log", tmp_path / "index.sqlite")
+    ids = []
+    for n in range(200):
+        ids.append(store.register(f"item {n}", payload=f"Failed: tests/test_{n}.py::test_it"))
+        if n == 99:
+            assert store.query(limit=1)[0]["id"] == 100  # Indexed up to here, then rotated away
+        if n % 40 == 39:
+            store.log.segments.rotate()
+    segments = store.log.segments.segments()
+    assert len(segments) == 5 and ids == list(range(1, 201))
+    assert (segments[0]["first_id"], segments[-1]["last_id"]) == (1, 200)
+
+    # Rotated right after the last append: the active log is empty and the ID comes from the manifest
+    store.log.segments.rotate()
+    assert (tmp_path / "technical_debt.log").stat().st_size == 0
+    os.remove(store.log.seq_path)
+    assert store.register("after rotation") == 201
+
+    items = store.query()
+    assert [item["id"] for item in items] == list(range(1, 202))
+    assert store.payload(store.get(3)) == "Failed: tests/test_2.py::test_it"
+    assert [record_id for record_id, _, _ in RecordLog(tmp_path / "technical_debt.log").records()] == list(range(1, 202))
+
+
+def test_segments_are_not_read_to_find_the_last_id(tmp_path):
+    log = RecordLog(tmp_path / "meta_requirements.log")
+    for n in range(3):
+        log.append(f"[TS:2024-01-0{n + 1} 00:00:00 UTC] meta {n}")
+    log.segments.rotate()
+    for segment in log.segments.segments():
+        os.remove(log.segments.archive_dir / segment["file"])  # Only the manifest may be consulted
+    os.remove(log.seq_path)
+    assert log.append("next") == 4
+    assert json.loads(log.segments.manifest_path.read_text())["segments"][0]["last_ts"] == \
+        "2024-01-03T00:00:00.000000Z"
+
+
+def test_logs_due_are_rotated_before_they_are_committed(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(log_segments, "rotation_policy", lambda: {"max_bytes": 1024, "max_age_days": 0})
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "logs" / "audit.log").write_text("".join(audit_lines(50)))
+    (tmp_path / "logs" / "approvals.log").write_text("Requirement 1 approved at 2024-01-01 00:00:00 UTC\n")
+    assert [segment["seq"] for segment in log_segments.rotate_due()] == [1]
+    assert "Rotated logs/audit.log into segment 1" in capsys.readouterr().out
+    assert (tmp_path / "logs" / "archive" / "audit.log" / "000001.gz").exists()
+    assert (tmp_path / "logs" / "approvals.log").stat().st_size > 0
+
@@ -0,0 +1,145 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import git_handler, main, outbox
+from dw6.outbox import Outbox
+
+
+def git(path, *args):
+    return subprocess.run(["git", "-C", str(path), *args], check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    project, remote = tmp_path / "project", tmp_path / "remote.git"
+    project.mkdir()
+    git(tmp_path, "init", "-q", "--bare", str(remote))
+    git(project, "init", "-q", "-b", "main")
+    git(project, "config", "user.email", "dw6@example.com")
+    git(project, "config", "user.name", "dw6")
+    git(project, "remote", "add", "origin", str(remote))
+    (project / "README.md").write_text("hello\n")
+    git(project, "add", ".")
+    git(project, "commit", "-q", "-m", "initial")
+    git_handler.reset_sessions()
+    yield project, remote
+    git_handler.reset_sessions()
+
+
+def test_outbox_retries_with_backoff_while_offline(repo, monkeypatch):
+    project, remote = repo
+    box = Outbox(git_handler.get_session(project))
+    git(project, "tag", "v1")
+    box.enqueue("main", ["v1"])
+
+    offline = remote.with_name("offline.git")
+    remote.rename(offline)
+    assert box.drain() == 1
+    entry = box.pending()["main"]
+    assert entry["attempts"] == 1 and entry["last_error"]
+    assert entry["next_attempt"] > entry["queued"] + outbox.BACKOFF_BASE - 1
+    assert box.drain() == 1  # Not due yet, so nothing was attempted
+    assert box.pending()["main"]["attempts"] == 1
+
+    offline.rename(remote)
+    assert box.drain(force=True) == 0
+    assert git(remote, "rev-parse", "main") == git(project, "rev-parse", "HEAD")
+    assert git(remote, "tag") == "v1"
+
+
+def test_repeated_pushes_are_coalesced(repo):
+    project, remote = repo
+    box = Outbox(git_handler.get_session(project))
+    git(project, "tag", "v1")
+    box.enqueue("main", ["v1"])
+    (project / "README.md").write_text("next\n")
+    git(project, "commit", "-q", "-am", "next")
+    git(project, "tag", "v2")
+    box.enqueue("main", ["v2"])
+
+    assert list(box.pending()) == ["main"]
+    assert box.pending()["main"]["tags"] == ["v1", "v2"]
+    assert box.drain() == 0
+    assert git(remote, "tag").split() == ["v1", "v2"]
+    assert git(remote, "rev-parse", "main") == git(project, "rev-parse", "HEAD")
+
+
+def test_worker_drains_outbox(repo):
+    project, remote = repo
+    box = Outbox(git_handler.get_session(project))
+    box.enqueue("main")
+    outbox.run_worker(git_handler.get_session(project))
+    assert box.pending() == {}
+    assert git(remote, "rev-parse", "main") == git(project, "rev-parse", "HEAD")
+
+
+def test_missing_credentials_are_recorded_not_fatal(repo, monkeypatch):
+    project, remote = repo
+    git(project, "remote", "set-url", "origin", "https://example.invalid/repo.git")
+    monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+    monkeypatch.setattr("dotenv.load_dotenv", lambda: None)
+    box = Outbox(git_handler.get_session(project))
+    box.enqueue("main")
+    assert box.drain() == 0
+    entry = box.pending()["main"]
+    assert entry["attempts"] == 1 and "GITHUB_TOKEN" in entry["last_error"]
+    assert entry["parked"]  # Retrying cannot fix it
+
+
+def test_rejected_push_is_parked_and_the_worker_exits(repo, tmp_path, monkeypatch, capsys):
+    project, remote = repo
+    other = tmp_path / "other"
+    git(project, "push", "-q", "origin", "main")
+    git(tmp_path, "clone", "-q", "-b", "main", str(remote), str(other))
+    git(other, "-c", "user.email=x@example.com", "-c", "user.name=x", "commit", "-q", "--allow-empty", "-m", "theirs")
+    git(other, "push", "-q", "origin", "main")
+    (project / "README.md").write_text("ours\n")
+    git(project, "commit", "-q", "-am", "ours")
+
+    box = Outbox(git_handler.get_session(project))
+    box.enqueue("main")
+    started = time.monotonic()
+    outbox.run_worker(git_handler.get_session(project))  # Returns instead of polling a push that cannot succeed
+    assert time.monotonic() - started < outbox.BACKOFF_BASE
+    entry = box.pending()["main"]
+    assert entry["parked"] and entry["attempts"] == 1 and "rejected" in entry["last_error"]
+
+    monkeypatch.chdir(project)
+    assert not main.show_outbox()
+    assert "FAILED after 1 attempt(s)" in capsys.readouterr().out
+
+
+def test_push_is_parked_after_max_attempts(repo, monkeypatch):
+    project, remote = repo
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 3)
+    box = Outbox(git_handler.get_session(project))
+    box.enqueue("main")
+    remote.rename(remote.with_name("offline.git"))
+    assert [box.drain(force=True) for _ in range(3)] == [1, 1, 0]
+    assert box.pending()["main"]["parked"]
+    box.enqueue("main")  # A new push is due again
+    assert box.active()
+
+
+def test_stalled_push_times_out_and_is_recorded(repo, monkeypatch):
+    project, remote = repo
+    (project / "pyproject.toml").write_text("[tool.dw6.timeouts]\ngit = 1\n")
+    hook = remote / "hooks" / "pre-receive"
+    hook.write_text("#!/bin/sh\nsleep 30\n")
+    hook.chmod(0o755)
+    monkeypatch.chdir(project)
+    box = Outbox(git_handler.get_session(project))
+    box.enqueue("main")
+    started = time.monotonic()
+    assert box.drain() == 1
+    assert time.monotonic() - started < 15
+    assert "timed out" in box.pending()["main"]["last_error"]
+    failure = json.loads((project / "logs" / "step_failures.jsonl").read_text().splitlines()[-1])
+    assert failure["step"] == "git" and failure["reason"] == "timeout" and "push" in failure["command"]
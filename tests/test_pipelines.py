@@ -0,0 +1,108 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import main
+from dw6.history import StateHistory
+from dw6.pipelines import PipelineScheduler
+from dw6.state_manager import Governor, WorkflowManager, WorkflowState
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    state = WorkflowState()
+    state.set_stage("Validator", 6)
+    state.set_stage("Coder", 7)
+    state.save()
+    return state
+
+
+def test_governor_authorizes_against_the_pipeline_stage(state):
+    assert Governor(state, 7).is_allowed("write_to_file src/a.py")
+    assert not Governor(state, 6).is_allowed("write_to_file src/a.py")
+    assert Governor(state, 6).is_allowed("uv run pytest")
+    assert Governor(state).current_stage == "Engineer"
+
+
+def test_scheduler_caps_stage_occupancy(state):
+    scheduler = PipelineScheduler(state, limits={"Validator": 1})
+    assert scheduler.occupants("Validator") == [6]
+    assert not scheduler.can_enter("Validator", 7)
+    assert scheduler.can_enter("Validator", 6)
+    assert scheduler.can_enter("Deployer", 7)
+
+
+def test_approve_refuses_full_stage_before_validating(state, capsys):
+    with pytest.raises(SystemExit):
+        Governor(state, 7).approve()
+    assert "Stage 'Validator' is at its limit" in capsys.readouterr().err
+    assert WorkflowState().get_stage(7) == "Coder"
+
+
+def test_pipeline_transitions_and_completion(state):
+    governor = Governor(state, 7)
+    with state.transaction():
+        governor._transition_to_next_stage("Validator")
+        state.save()
+    assert (state.get_stage(7), state.get_stage(6), state.get("CurrentStage")) == ("Validator", "Validator", "Engineer")
+
+    governor = Governor(state, 6)
+    with state.transaction():
+        governor._transition_to_next_stage("Deployer")
+        governor._transition_to_next_stage("Engineer")
+        state.save()
+    assert state.pipelines() == {7: "Validator"}
+    assert state.get("RequirementPointer") == "1"
+    assert [e["type"] for e in StateHistory().transitions(6)] == ["transition", "complete"]
+
+
+@pytest.fixture
+def git(state, monkeypatch, tmp_path):
+    (tmp_path / "pyproject.toml").write_text("[tool.dw6]\npipeline_limits = { Validator = 2 }\n")
+    git = MagicMock()
+    git.get_current_commit_sha.return_value = "abc1234"
+    monkeypatch.setattr("dw6.state_manager.git_handler.get_session", lambda: git)
+    return git
+
+
+def test_overlapping_pipelines_both_advance(state, git):
+    def current_commit_sha():
+        if git.get_current_commit_sha.call_count == 1:
+            # Another agent approves pipeline 6 while pipeline 7 is being validated
+            WorkflowState().update(lambda other: other.set_stage("Deployer", 6))
+        return "abc1234"
+
+    git.get_current_commit_sha.side_effect = current_commit_sha
+    git.commit_all.side_effect = lambda message: WorkflowState().update(lambda other: other.set_stage("Engineer", 9))
+    Governor(state, 7).approve()
+    assert WorkflowState().pipelines() == {6: "Deployer", 7: "Validator", 9: "Engineer"}
+    assert [e["to"] for e in StateHistory().transitions(7)] == ["Validator"]
+
+    manager = WorkflowManager(requirement=7)
+    WorkflowState().update(lambda other: other.set_stage("Validator", 6))
+    main.revert_to_previous_stage(manager)
+    assert WorkflowState().pipelines() == {6: "Validator", 7: "Coder", 9: "Engineer"}
+
+
+def test_approval_writes_the_state_once(state, git, monkeypatch):
+    writes = []
+    real_write = WorkflowState._write
+    monkeypatch.setattr(WorkflowState, "_write", lambda self: (writes.append(dict(self.data)), real_write(self)))
+    Governor(state, 7).approve()
+    assert len(writes) == 1
+    assert (writes[0]["Pipeline.7"], writes[0]["LastCommitSHA"]) == ("Validator", "abc1234")
+    assert [e["to"] for e in StateHistory().transitions(7)] == ["Validator"]
+
+
+def test_failed_commit_leaves_the_state_untouched(state, git):
+    before = state.state_file.read_text()
+    git.commit_all.side_effect = SystemExit(1)
+    with pytest.raises(SystemExit):
+        Governor(state, 7).approve()
+    assert state.state_file.read_text() == before
+    assert StateHistory().transitions(7) == []
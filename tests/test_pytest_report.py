@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import pytest_report
+from dw6.config import package_env
+
+SAMPLE_TESTS = '''
+import pytest
+
+@pytest.fixture
+def broken():
+    raise RuntimeError("setup failed")
+
+def test_passes():
+    pass
+
+def test_fails():
+    assert False
+
+@pytest.mark.skip
+def test_skipped():
+    pass
+
+@pytest.mark.xfail
+def test_expected_failure():
+    assert False
+
+def test_fixture_error(broken):
+    pass
+'''
+
+
+def run_pytest(project):
+    return subprocess.run([sys.executable, "-m", "pytest", "-p", "dw6.pytest_report", "--dw6-report=report.json"],
+                          cwd=project, capture_output=True, text=True, env=package_env())
+
+
+def test_report_counts_outcomes_in_one_run(tmp_path):
+    (tmp_path / "test_sample.py").write_text(SAMPLE_TESTS)
+    run_pytest(tmp_path)
+
+    report = pytest_report.load(tmp_path / "report.json")
+    assert report["collected"] == 5
+    assert (report["passed"], report["failed"], report["skipped"], report["error"]) == (1, 1, 2, 1)
+    assert report["exitstatus"] == 1
+    assert report["tests"]["test_sample.py::test_fixture_error"]["outcome"] == "error"
+    assert all(test["duration"] >= 0 for test in report["tests"].values())
+
+
+def test_report_for_empty_and_broken_suites(tmp_path):
+    (tmp_path / "test_empty.py").write_text("")
+    run_pytest(tmp_path)
+    report = pytest_report.load(tmp_path / "report.json")
+    assert report["collected"] == 0 and report["exitstatus"] == 5
+
+    (tmp_path / "test_broken.py").write_text("import does_not_exist\n")
+    run_pytest(tmp_path)
+    report = pytest_report.load(tmp_path / "report.json")
+    assert report["collection_errors"] == ["test_broken.py"]
@@ -0,0 +1,74 @@
+import io
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import record_log
+from dw6.record_log import RecordLog
+
+DUMP = "FAILED tests/test_x.py::test_a\n[ID:999] looks like a header\n\nE   assert False"
+
+
+def test_ids_survive_multi_line_payloads(tmp_path):
+    log = RecordLog(tmp_path / "technical_debt.log")
+    assert log.append("first") == 1
+    assert log.append("pytest failure", payload=DUMP) == 2
+    os.remove(log.seq_path)  # Force recovery from the log itself
+    assert log.append("third") == 3
+
+    records = list(log.records())
+    assert [(record_id, text) for record_id, text, _ in records] == [(1, "first"), (2, "pytest failure"), (3, "third")]
+    assert records[1][2] == DUMP
+
+
+def test_external_appends_and_legacy_lines_are_recovered(tmp_path):
+    path = tmp_path / "meta_requirements.log"
+    log = RecordLog(path)
+    log.append("one")
+    with open(path, "a") as f:
+        f.write("[ID:7] [TS:2024-01-01 00:00:00 UTC] written by hand\n--- Technical Debt Logged ---\nStage: Validator\n")
+    assert log.last_id() == 7
+    assert log.append("next") == 8
+    assert list(log.records())[1] == (7, "[TS:2024-01-01 00:00:00 UTC] written by hand",
+                                      "--- Technical Debt Logged ---\nStage: Validator")
+
+
+def test_recovery_finds_headers_split_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(record_log, "TAIL_BLOCK", 5)
+    monkeypatch.setattr(record_log, "FIRST_BLOCK", 5)
+    path = tmp_path / "technical_debt.log"
+    path.write_text("[ID:41] first\n[ID:42] second\n" + "  | payload\n" * 3)
+    assert RecordLog(path).last_id() == 42
+    path.write_text("[ID:1] only\n")
+    assert RecordLog(path).last_id() == 1
+
+
+def test_append_reads_only_the_tail_of_a_large_log(tmp_path, monkeypatch):
+    path = tmp_path / "technical_debt.log"
+    with open(path, "w") as f:
+        f.writelines(f"[ID:{n}] [TS:2024-01-01 00:00:00 UTC] item {n}\n" for n in range(1, 300_001))
+    bytes_read = []
+
+    class CountingFile(io.FileIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            bytes_read.append(len(data))
+            return data
+
+    def counting_open(file, mode="r", *args, **kwargs):
+        if "b" in mode and "r" in mode:
+            return CountingFile(file, "r")
+        return open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(record_log, "open", counting_open, raising=False)
+    log = RecordLog(path)
+    assert log.append("cold, recovered from the tail") == 300_001
+    assert 0 < sum(bytes_read) <= record_log.TAIL_BLOCK
+    bytes_read.clear()
+
+    monkeypatch.setattr(RecordLog, "_recover_last_id", lambda self, size: pytest.fail("the sidecar was not used"))
+    assert log.append("warm, from the sidecar") == 300_002
+    assert bytes_read == []
@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6.rule_matcher import PrefixMatcher
+from dw6.state_manager import Governor
+from dw6.main import main, read_batch_actions, write_verdicts
+
+
+class FakeState:
+    def __init__(self, stage):
+        self.stage = stage
+
+    def get(self, key):
+        return self.stage if key == "CurrentStage" else None
+
+    def get_stage(self, requirement=None):
+        return self.stage
+
+    def on_rollback(self, hook):
+        pass
+
+
+def test_matcher_agrees_with_startswith_scan():
+    commands = ["ls", "ls -la", "l", "cat file", "catalog", "git add .", "git", "", "uv run pytest -q", "uv run"]
+    for stage, prefixes in Governor.RULES.items():
+        matcher = PrefixMatcher(prefixes)
+        for command in commands:
+            expected = any(command.startswith(prefix) for prefix in prefixes)
+            assert (command in matcher) == expected, (stage, command)
+
+
+def test_match_returns_shortest_prefix():
+    matcher = PrefixMatcher(["git commit --amend", "git commit"])
+    assert matcher.match("git commit --amend -m x") == "git commit"
+    assert matcher.match("git status") is None
+
+
+def test_governor_verdicts_stream_one_per_action(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    governor = Governor(FakeState("Deployer"))
+    verdicts = list(governor.verdicts(["git tag v1", "rm -rf /"]))
+    assert verdicts == [
+        {"action": "git tag v1", "allowed": True, "stage": "Deployer"},
+        {"action": "rm -rf /", "allowed": False, "stage": "Deployer"},
+    ]
+
+
+def test_batch_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    plan = tmp_path / "plan.txt"
+    plan.write_text("mkdir src\n\nwrite_to_file src/a.py\ngit push\n")
+    governor = Governor(FakeState("Coder"))
+    out = io.StringIO()
+
+    all_allowed = write_verdicts(governor.verdicts(read_batch_actions(str(plan))), out)
+
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [line["allowed"] for line in lines] == [True, True, False]
+    assert not all_allowed
+    assert (tmp_path / "logs/audit.log").read_text().count("GOVERNOR DENIED [Coder] git push") == 1
+
+
+def test_missing_batch_file_is_an_error(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        read_batch_actions(str(tmp_path / "missing.txt"))
+    assert exit_info.value.code == 1
+    assert "ERROR: Cannot read batch file" in capsys.readouterr().err
+
+
+def test_action_and_batch_are_exclusive(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["dw6", "do", "ls", "--batch"])
+    with pytest.raises(SystemExit) as exit_info:
+        main()
+    assert exit_info.value.code == 2
+    assert "not both" in capsys.readouterr().err
@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import runner
+
+CHATTY = "import sys\nfor i in range(1000):\n    print(f'line {i}')\nprint('oops', file=sys.stderr)\nsys.exit(3)\n"
+
+
+def test_output_is_logged_whole_but_kept_as_a_bounded_tail(tmp_path, capsys):
+    log_path = tmp_path / "logs" / "step.log"
+    result = runner.run([sys.executable, "-c", CHATTY], log_path=log_path, tail_lines=10)
+
+    assert (result.ok, result.returncode, result.timed_out) == (False, 3, False)
+    assert result.stdout.splitlines() == [f"line {i}" for i in range(991, 1000)] + ["oops"]
+    assert len(log_path.read_text().splitlines()) == 1001
+    assert "line 0\n" in capsys.readouterr().out
+
+
+def test_captured_stdout_is_complete_and_input_is_fed(tmp_path):
+    script = "import sys\ndata = sys.stdin.read()\nsys.stdout.write(data * 2)\nprint('warn', file=sys.stderr)\n"
+    result = runner.run([sys.executable, "-c", script], input="x" * 100_000, echo=False, capture_stdout=True)
+
+    assert result.ok
+    assert result.stdout == "x" * 200_000
+    assert result.stderr == "warn\n"
+
+
+def test_timeout_kills_the_whole_process_group(tmp_path):
+    pid_file = tmp_path / "child.pid"
+    script = (
+        "import subprocess, sys, time\n"
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+        f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+        "print('started', flush=True)\n"
+        "time.sleep(60)\n"
+    )
+    started = time.monotonic()
+    result = runner.run([sys.executable, "-c", script], timeout=2, echo=False)
+
+    assert result.timed_out and not result.ok
+    assert time.monotonic() - started < 2 + runner.KILL_GRACE + 5
+    assert result.stdout == "started\n"
+    assert "timed out after 2s" in result.describe()
+    child = int(pid_file.read_text())
+    for _ in range(50):
+        try:
+            os.kill(child, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        raise AssertionError("the grandchild survived the timeout")
+
+
+def test_record_failure_appends_a_structured_record(tmp_path):
+    result = runner.RunResult(["pytest", "-q"], -15, "tail\n", "", 61.5, timeout=60, timed_out=True)
+    failures_file = tmp_path / "step_failures.jsonl"
+    runner.record_failure("tests", result, failures_file, requirement=7)
+    runner.record_failure("git", result, failures_file)
+
+    records = [json.loads(line) for line in failures_file.read_text().splitlines()]
+    assert [record["step"] for record in records] == ["tests", "git"]
+    assert records[0]["reason"] == "timeout"
+    assert records[0]["timeout"] == 60
+    assert records[0]["requirement"] == 7
+    assert records[0]["tail"] == "tail\n"
@@ -7,12 +7,12 @@ from unittest.mock import patch, call
 # Add src to path to allow importing setup
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
-from dw6 import setup
+from dw6 import runner, setup
 
 class TestSetup(unittest.TestCase):
 
     @patch('os.path.exists')
-    @patch('subprocess.run')
+    @patch('dw6.runner.run')
     def test_create_venv_does_not_exist(self, mock_run, mock_exists):
         """Test venv creation when it doesn't exist."""
         mock_exists.return_value = False
@@ -22,10 +22,10 @@ class TestSetup(unittest.TestCase):
         
         venv_path = os.path.join(project_dir, 'venv')
         expected_command = [sys.executable, '-m', 'venv', venv_path]
-        mock_run.assert_called_once_with(expected_command, check=True, capture_output=True, text=True, cwd=None)
+        mock_run.assert_called_once_with(expected_command, cwd=None, timeout=runner.step_timeout('setup'))
 
     @patch('os.path.exists')
-    @patch('subprocess.run')
+    @patch('dw6.runner.run')
     def test_create_venv_exists(self, mock_run, mock_exists):
         """Test venv creation is skipped when it exists."""
         mock_exists.return_value = True
@@ -35,7 +35,7 @@ class TestSetup(unittest.TestCase):
         
         mock_run.assert_not_called()
 
-    @patch('subprocess.run')
+    @patch('dw6.runner.run')
     def test_install_dependencies(self, mock_run):
         """Test that pip install is called correctly."""
         project_dir = '/fake/project'
@@ -45,7 +45,16 @@ class TestSetup(unittest.TestCase):
         setup.install_dependencies(project_dir)
         
         expected_command = [pip_executable, 'install', '-e', f'{project_dir}[test]']
-        mock_run.assert_called_once_with(expected_command, check=True, capture_output=True, text=True, cwd=project_dir)
+        mock_run.assert_called_once_with(expected_command, cwd=project_dir, timeout=runner.step_timeout('setup'))
+
+    @patch('dw6.runner.run')
+    def test_run_command_exits_on_timeout(self, mock_run):
+        """Test that a timed out command stops setup and is recorded as a failure."""
+        mock_run.return_value = runner.RunResult(['slow'], -15, 'partial output\n', '', 2.0, timeout=1, timed_out=True)
+        with patch('dw6.runner.record_failure') as mock_record:
+            with self.assertRaises(SystemExit):
+                setup.run_command(['slow'])
+        mock_record.assert_called_once_with('setup', mock_run.return_value)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import impact, runner, sharding
+
+SAMPLE_TESTS = '''
+import os
+
+def test_pid_{n}():
+    with open("pids.txt", "a") as f:
+        f.write(f"{{os.getpid()}}\\n")
+
+def test_ok_{n}():
+    pass
+'''
+
+
+def test_partition_balances_by_recorded_durations():
+    durations = {"a": 4.0, "b": 3.0, "c": 2.0, "d": 2.0, "e": 1.0}
+    shards = sharding.partition(["a", "b", "c", "d", "e", "new"], 2, durations)
+    loads = [sum(durations.get(test, 2.4) for test in shard) for shard in shards]
+    assert sorted(test for shard in shards for test in shard) == ["a", "b", "c", "d", "e", "new"]
+    assert max(loads) - min(loads) <= 2.4
+    assert len(sharding.partition(["a"], 4, durations)) == 1
+
+
+def test_run_sharded_merges_shard_reports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for n in range(3):
+        (tmp_path / f"test_module_{n}.py").write_text(SAMPLE_TESTS.format(n=n))
+    (tmp_path / "test_failing.py").write_text("def test_fails():\n    assert False\n")
+
+    report, result = sharding.run_sharded(3, tmp_path / "report.json")
+
+    assert report["collected"] == 7
+    assert (report["passed"], report["failed"]) == (6, 1)
+    assert report["exitstatus"] == 1
+    assert sorted(report["tests"]) == sorted(report["items"])
+    assert "Shard 3/3" in result.stdout
+    assert "test_fails" in (tmp_path / "logs" / "pytest-shard-1.log").read_text() + \
+        (tmp_path / "logs" / "pytest-shard-2.log").read_text() + (tmp_path / "logs" / "pytest-shard-3.log").read_text()
+    assert len(set((tmp_path / "pids.txt").read_text().split())) > 1
+
+    sharding.record_durations(report)
+    assert set(sharding.load_durations()) == set(report["tests"])
+
+
+def test_run_sharded_kills_shards_at_the_timeout(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "test_fast.py").write_text("def test_fast():\n    pass\n")
+    (tmp_path / "test_hangs.py").write_text("import time\n\ndef test_hangs():\n    time.sleep(60)\n")
+
+    report, result = sharding.run_sharded(2, tmp_path / "report.json", timeout=3)
+
+    assert report is None
+    assert result.timed_out
+    assert result.duration < 30
+
+
+def test_coverage_shards_keep_the_report_plugin_argument(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for n in range(2):
+        (tmp_path / f"test_module_{n}.py").write_text(SAMPLE_TESTS.format(n=n))
+    commands = []
+    real_popen = runner.popen
+
+    def recording_popen(command, **kwargs):
+        commands.append(command)
+        return real_popen(command, **kwargs)
+
+    monkeypatch.setattr(runner, "popen", recording_popen)
+    sharding.run_sharded(2, tmp_path / "report.json", coverage_file=tmp_path / ".coverage")
+
+    shard_commands = [command for command in commands if "--dw6-select" in " ".join(command)]
+    assert len(shard_commands) == 2
+    for command in shard_commands:
+        plugins = [command[index + 1] for index, arg in enumerate(command) if arg == "-p"]
+        assert plugins == ["dw6.pytest_report", "no:cacheprovider"]
+        assert all(arg in command for arg in impact.COVERAGE_ARGS)
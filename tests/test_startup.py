@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, SRC)
+
+from dw6.startup_report import HEAVY_MODULES
+
+RUN_COMMAND = """
+import json, sys
+from dw6.main import main
+heavy = json.loads(sys.argv[2])
+sys.argv = ["dw6"] + json.loads(sys.argv[1])
+try:
+    main()
+except SystemExit:
+    pass
+print(json.dumps(sorted(m for m in heavy if m in sys.modules)))
+"""
+
+
+def loaded_heavy_modules(argv, cwd):
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run(
+        [sys.executable, "-c", RUN_COMMAND, json.dumps(argv), json.dumps(HEAVY_MODULES)],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("argv", [
+    ["meta-req", "Keep approvals fast"],
+    ["tech-debt", "Flaky test", "--type", "test"],
+    ["do", "ls"],
+    ["revert"],
+])
+def test_light_commands_skip_heavy_imports(argv, tmp_path):
+    assert loaded_heavy_modules(argv, tmp_path) == []
+
+
+def test_entry_point_imports_only_what_every_command_needs(tmp_path):
+    # The time this takes is measured by benchmarks/bench_startup.py
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run(
+        [sys.executable, "-c", "import json, sys, dw6.main; print(json.dumps(sorted(sys.modules)))"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True,
+    )
+    loaded = json.loads(result.stdout)
+    assert [name for name in loaded if name.startswith("dw6")] == ["dw6", "dw6.locking", "dw6.main"]
+    assert not set(HEAVY_MODULES + ("subprocess", "sqlite3")) & set(loaded)
@@ -1,8 +1,9 @@
 import unittest
-from unittest.mock import patch, mock_open
+from unittest.mock import patch
 from pathlib import Path
 import sys
 import os
+import tempfile
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
@@ -11,30 +12,39 @@ from dw6.state_manager import WorkflowManager
 class TestStateManager(unittest.TestCase):
 
     @patch('dw6.state_manager.WorkflowState')
-    @patch('dw6.state_manager.git_handler.GitManager')
-    @patch('builtins.open', new_callable=mock_open)
-    def test_post_transition_actions_generates_coder_deliverable(self, mock_file_open, MockGitManager, MockWorkflowState):
+    @patch('dw6.state_manager.git_handler.get_session')
+    def test_post_transition_actions_generates_coder_deliverable(self, mock_get_session, MockWorkflowState):
         """Test that post-transition actions generate a Coder deliverable."""
         # Arrange
         mock_state = MockWorkflowState.return_value
-        mock_state.get.side_effect = ['Coder', 'Coder', 'abcde123', 'abcde123']
 
-        mock_git = MockGitManager.return_value
+        def stream_diff(previous_commit_sha, sink, **caps):
+            sink.write(b'diff --git a/file1.py b/file1.py\n')
+            return ['file1.py']
+
+        mock_git = mock_get_session.return_value
         mock_git.get_current_commit_sha.return_value = 'fghij456'
-        mock_git.get_changes.return_value = (['file1.py'], 'diff --git a/file1.py b/file1.py')
+        mock_git.stream_diff.side_effect = stream_diff
 
         manager = WorkflowManager()
         manager.state = mock_state
+        manager.pre_transition_sha = 'abcde123'
 
         # Act
-        manager._run_post_transition_actions('Coder')
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                manager._run_post_transition_actions('Coder', 'fghij456')
+                written_content = Path("deliverables/coding/coder_deliverable.md").read_text()
+            finally:
+                os.chdir(cwd)
 
         # Assert
-        deliverable_path = Path("deliverables/coding/coder_deliverable.md")
-        mock_file_open.assert_called_once_with(deliverable_path, 'w')
-        handle = mock_file_open()
-        written_content = "".join(call.args[0] for call in handle.write.call_args_list)
         self.assertIn("# Coder Stage Deliverable", written_content)
+        self.assertIn("- `file1.py`", written_content)
+        self.assertIn("```diff\ndiff --git a/file1.py b/file1.py\n", written_content)
+        mock_state.update.assert_not_called()  # The approval saves LastCommitSHA with the transition
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6 import blobs, main, tech_debt
+from dw6.tech_debt import TechDebtStore
+
+LEGACY_LOG = """[ID:1] [TS:2024-01-02 10:00:00 UTC] [TYPE:code] [STATUS:OPEN] [COMMIT:abc1234] Refactor the parser
+--- Technical Debt Logged: 2024-02-03T04:05:06.000000+00:00 ---
+Stage: Validator
+Requirement ID: 4
+Pytest Output:
+FAILED tests/test_x.py::test_a
+--- End of Log ---
+
+--- Technical Debt Logged: sometime in March ---
+Stage: Validator
+Summary: 1 failed
+
+[ID:2] [TS:2024-03-01 09:00:00 UTC] [TYPE:test] [STATUS:OPEN] Flaky test
+"""
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TechDebtStore(tmp_path / "technical_debt.log", tmp_path / ".index" / "technical_debt.sqlite")
+
+
+def test_query_filters_and_resolve(store):
+    first = store.register("Slow fixture", "test", requirement=3)
+    second = store.register("Hard-coded path", "code", commit="deadbeefcafe")
+    assert [item["id"] for item in store.query(status="OPEN")] == [first, second]
+    assert [item["id"] for item in store.query(issue_type="code", commit="deadbee")] == [second]
+    assert [item["id"] for item in store.query(requirement=3)] == [first]
+    assert store.query(since="2999-01-01") == []
+
+    store.resolve(first, "Cached the fixture")
+    assert [item["id"] for item in store.query(status="OPEN")] == [second]
+    resolved = store.get(first)
+    assert resolved["status"] == "RESOLVED" and resolved["resolved_by"] == second + 1
+    with pytest.raises(ValueError):
+        store.resolve(first)
+    with pytest.raises(KeyError):
+        store.resolve(99)
+    # New items continue after the resolution record
+    assert store.register("Next") == second + 2
+
+
+def test_index_is_derived_and_incremental(store):
+    for n in range(5):
+        store.register(f"item {n}")
+    assert len(store.query()) == 5
+    store.register("appended later")
+    assert store.query(limit=1)[0]["description"] == "appended later"
+    os.remove(store.index_file)
+    assert len(store.query()) == 6
+
+
+def test_legacy_entries_are_migrated(store):
+    store.log.path.write_text(LEGACY_LOG)
+    items = store.query()  # The first query migrates them
+    assert [(item["id"], item["type"], item["requirement"]) for item in items] == [
+        (1, "code", None), (2, "test", None), (3, "test", 4), (4, "test", None)]
+    assert items[0]["commit_sha"] == "abc1234"
+    assert items[2]["ts"].startswith("2024-02-03T04:05:06")
+    assert items[3]["ts"] == "" and items[3]["description"] == "Validator failure in Validator: 1 failed"
+    assert store.query(until="2024-02-01") == [items[0]]
+    records = list(store.log.records())
+    assert [record_id for record_id, _, _ in records] == [1, 3, 4, 2, 5]  # Migrated in place
+    payloads = {record_id: payload for record_id, _, payload in records}
+    assert payloads[3] == "Pytest Output:\nFAILED tests/test_x.py::test_a"
+    assert payloads[4] == "Logged: sometime in March"
+    assert payloads[2] is None
+    assert "Technical Debt Logged" not in store.log.path.read_text()
+    assert store.register("after migration") == 6
+    assert store.migrate() == 0
+    assert [item["id"] for item in store.query()] == [1, 2, 3, 4, 6]
+
+
+def test_entries_appended_by_an_older_version_are_migrated(store):
+    store.register("new")
+    assert len(store.query()) == 1
+    with open(store.log.path, "a") as f:
+        f.write(LEGACY_LOG.split("\n\n")[1] + "\n")
+    items = store.query()
+    assert [(item["id"], item["description"]) for item in items] == [
+        (1, "new"), (2, "Validator failure in Validator: 1 failed")]
+    assert store.register("next") == 4
+
+
+def test_queries_use_the_index_without_rereading_the_log(store, monkeypatch):
+    with open(store.log.path, "w") as f:
+        for n in range(1, 50_001):
+            status = "OPEN" if n % 100 == 0 else "RESOLVED"
+            f.write(f"[ID:{n}] [TS:2024-01-01 00:00:00 UTC] [TYPE:test] [STATUS:{status}] [REQ:{n % 40}] item {n}\n")
+    assert len(store.query(status="OPEN")) == 500  # Builds the index once
+    monkeypatch.setattr(store.log.segments, "lines_from", lambda offset: pytest.fail("an indexed record was read again"))
+    assert len(store.query(status="OPEN", requirement=0)) == 250
+
+    with closing(sqlite3.connect(store.index_file)) as connection:
+        plan = connection.execute("EXPLAIN QUERY PLAN SELECT * FROM items WHERE status = ? AND requirement = ?",
+                                  ("OPEN", 0)).fetchall()
+    assert any("USING INDEX" in row[-1] for row in plan)
+
+
+def test_cli_keeps_the_short_form(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    for argv in (["tech-debt", "Flaky test", "--type", "test"], ["tech-debt", "add", "Slow CI", "--type", "ci"],
+                 ["tech-debt", "resolve", "1"], ["tech-debt", "list", "--status", "open"]):
+        monkeypatch.setattr(sys, "argv", ["dw6"] + argv)
+        main.main()
+    output = capsys.readouterr().out
+    assert "Resolved technical debt 1." in output
+    assert "Slow CI" in output.splitlines()[-2] and "1 item(s)." in output
+
+
+def test_list_rejects_an_invalid_time(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", ["dw6", "tech-debt", "list", "--since", "yesterday"])
+    with pytest.raises(SystemExit) as exit_info:
+        main.main()
+    assert exit_info.value.code == 1
+    assert "ERROR: Invalid time" in capsys.readouterr().err
+
+
+def test_show_streams_the_output_blob(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    output = b"".join(b"E   assert %d\n" % n for n in range(10_000))
+    blob = blobs.BlobStore().put_bytes(output)
+    store = TechDebtStore()
+    first = store.register("Validator failure", payload="Failed: tests/test_x.py::test_a\n", blob=blob)
+    second = store.register("Same failure again", blob=blobs.BlobStore().put_bytes(output))
+    assert store.get(first)["blob"] == store.get(second)["blob"] == blob[0]
+    assert len(list(blobs.BLOB_DIR.rglob("*.gz"))) == 1
+    assert output not in tech_debt.TECH_DEBT_FILE.read_bytes()
+
+    monkeypatch.setattr(sys, "argv", ["dw6", "tech-debt", "show", str(first)])
+    main.main()
+    shown = capsys.readouterr().out
+    assert "Failed: tests/test_x.py::test_a" in shown
+    assert f"({len(output)} bytes" in shown
+    assert shown.endswith(output.decode())
+
@@ -1,14 +1,60 @@
+import json
 import unittest
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import tempfile
+from pathlib import Path
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
 
+from dw6 import install_cache, runner
 from dw6.state_manager import WorkflowManager
 
+def pytest_run(passed=0, failed=0, exitstatus=0):
+    """Returns a fake pytest run that writes the report the dw6 plugin would write."""
+    def run(command, **kwargs):
+        report_path = next(arg.split('=', 1)[1] for arg in command if arg.startswith('--dw6-report='))
+        tests = {f'tests/test_x.py::test_{i}': {'outcome': 'passed', 'duration': 0.01} for i in range(passed)}
+        tests.update({f'tests/test_x.py::test_fail_{i}': {'outcome': 'failed', 'duration': 0.01} for i in range(failed)})
+        with open(report_path, 'w') as f:
+            json.dump({'collected': passed + failed, 'passed': passed, 'failed': failed, 'skipped': 0, 'error': 0,
+                       'collection_errors': [], 'exitstatus': exitstatus, 'duration': 0.02, 'tests': tests}, f)
+        return runner.RunResult(command, exitstatus, '', '', 0.02)
+    return run
+
+def installed():
+    """Returns a fake successful install."""
+    return runner.RunResult(['uv', 'pip', 'install', '.[test]'], 0, '', '', 0.1)
+
+def runs(*results):
+    """Returns a subprocess.run side effect that returns results in order, calling fake runs."""
+    results = iter(results)
+    def run(command, **kwargs):
+        result = next(results)
+        return result(command, **kwargs) if callable(result) and not isinstance(result, MagicMock) else result
+    return run
+
 class TestValidatorStage(unittest.TestCase):
 
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        fingerprint_patch = patch('dw6.install_cache.FINGERPRINT_FILE', Path(tmp.name) / 'install_fingerprint.json')
+        fingerprint_patch.start()
+        self.addCleanup(fingerprint_patch.stop)
+        for target, name in (('dw6.pytest_report.REPORT_FILE', 'test_report.json'),
+                             ('dw6.sharding.DURATIONS_FILE', 'test_durations.json'),
+                             ('dw6.result_cache.RESULTS_FILE', 'test_results.json')):
+            file_patch = patch(target, Path(tmp.name) / name)
+            file_patch.start()
+            self.addCleanup(file_patch.stop)
+        # No tree hash, so no cached result, unless a test sets one
+        session_patch = patch('dw6.state_manager.git_handler.get_session')
+        self.session = session_patch.start().return_value
+        self.session.tree_hash.return_value = None
+        self.addCleanup(session_patch.stop)
+
     @patch('dw6.state_manager.Path.is_dir', return_value=True)
     @patch('dw6.state_manager.Path.glob', return_value=[])
     def test_validator_fails_with_no_test_files(self, mock_glob, mock_is_dir):
@@ -18,20 +64,114 @@ class TestValidatorStage(unittest.TestCase):
             manager._validate_tests()
         self.assertEqual(cm.exception.code, 1)
 
-    @patch('dw6.state_manager.subprocess.run')
+    @patch('dw6.state_manager.runner.run')
     @patch('dw6.state_manager.Path.glob', return_value=['test_placeholder.py'])
     @patch('dw6.state_manager.Path.is_dir', return_value=True)
     def test_validator_succeeds_with_tests(self, mock_is_dir, mock_glob, mock_run):
         """Test that the Validator stage succeeds when tests are found and pass."""
-        mock_run.side_effect = [
-            MagicMock(returncode=0), # for uv pip install
-            MagicMock(stdout='collected 1 items', returncode=0), # for pytest --collect-only
-            MagicMock(stdout='== 1 passed in 0.01s ==', returncode=0) # for pytest run
-        ]
+        mock_run.side_effect = runs(
+            installed(), # for uv pip install
+            pytest_run(passed=1), # for the single pytest run
+        )
         manager = WorkflowManager()
         result = manager._validate_tests()
         self.assertTrue(result)
-        self.assertEqual(mock_run.call_count, 3)
+        self.assertEqual(mock_run.call_count, 2)
+        self.assertIn('dw6.pytest_report', mock_run.call_args_list[1].args[0])
+
+    @patch('dw6.state_manager.runner.run')
+    @patch('dw6.state_manager.Path.glob', return_value=['test_placeholder.py'])
+    @patch('dw6.state_manager.Path.is_dir', return_value=True)
+    def test_validator_fails_fast_when_nothing_is_collected(self, mock_is_dir, mock_glob, mock_run):
+        """Test that zero collected tests fail the stage after a single pytest run."""
+        mock_run.side_effect = runs(installed(), pytest_run(exitstatus=5))
+        with self.assertRaises(SystemExit):
+            WorkflowManager()._validate_tests()
+        self.assertEqual(mock_run.call_count, 2)
+
+    @patch('dw6.state_manager.runner.run')
+    @patch('dw6.state_manager.Path.glob', return_value=['test_placeholder.py'])
+    @patch('dw6.state_manager.Path.is_dir', return_value=True)
+    def test_validator_decides_from_reported_failures(self, mock_is_dir, mock_glob, mock_run):
+        """Test that a failed test in the report fails the stage, whatever the output says."""
+        mock_run.side_effect = runs(installed(), pytest_run(passed=2, failed=1, exitstatus=1))
+        with self.assertRaises(SystemExit):
+            WorkflowManager()._validate_tests()
+
+    @patch('dw6.install_cache.missing_distributions', return_value=[])
+    @patch('dw6.state_manager.runner.run')
+    @patch('dw6.state_manager.Path.glob', return_value=['test_placeholder.py'])
+    @patch('dw6.state_manager.Path.is_dir', return_value=True)
+    def test_validator_skips_install_when_fingerprint_matches(self, mock_is_dir, mock_glob, mock_run, mock_missing):
+        """Test that a matching install fingerprint skips the install, unless a reinstall is forced."""
+        install_cache.record()
+        mock_run.side_effect = runs(pytest_run(passed=1))
+        self.assertTrue(WorkflowManager()._validate_tests())
+        self.assertEqual(mock_run.call_count, 1)
+        self.assertNotIn('uv', mock_run.call_args_list[0].args[0])
+
+        mock_run.reset_mock(side_effect=True)
+        mock_run.side_effect = runs(installed(), pytest_run(passed=1))
+        self.assertTrue(WorkflowManager(validation_options={'reinstall': True})._validate_tests())
+        self.assertEqual(mock_run.call_args_list[0].args[0], ['uv', 'pip', 'install', '.[test]'])
+
+    @patch('dw6.state_manager.git_handler.get_session')
+    @patch('dw6.state_manager.impact.ImpactMap')
+    @patch('dw6.state_manager.runner.run')
+    @patch('dw6.state_manager.Path.glob', return_value=['test_placeholder.py'])
+    @patch('dw6.state_manager.Path.is_dir', return_value=True)
+    def test_validator_runs_only_impacted_tests(self, mock_is_dir, mock_glob, mock_run, mock_map, mock_session):
+        """Test that impact mode skips pytest when no test is affected, and selects affected tests otherwise."""
+        mock_session.return_value.tree_hash.return_value = None
+        mock_map.return_value.select.return_value = ([], '1 file(s) changed since abc1234')
+        mock_map.return_value.savings.return_value = 'Skipped 3 of 3 tests, saving about 1.0s.'
+        mock_run.side_effect = runs(installed())
+        self.assertTrue(WorkflowManager(validation_options={'impact': True})._validate_tests())
+        self.assertEqual(mock_run.call_count, 1)  # Only the install
+
+        mock_run.reset_mock(side_effect=True)
+        mock_map.return_value.select.return_value = (['tests/test_validator.py'], '1 file(s) changed since abc1234')
+        mock_run.side_effect = runs(installed(), pytest_run(passed=1))
+        self.assertTrue(WorkflowManager(validation_options={'impact': True})._validate_tests())
+        command = mock_run.call_args_list[1].args[0]
+        self.assertEqual(command[-1], 'tests/test_validator.py')
+        self.assertTrue(any(arg.startswith('--dw6-select=') for arg in command))
+        mock_map.return_value.rebuild.assert_not_called()
+
+    @patch('dw6.install_cache.missing_distributions', return_value=[])
+    @patch('dw6.state_manager.runner.run')
+    @patch('dw6.state_manager.Path.glob', return_value=['test_placeholder.py'])
+    @patch('dw6.state_manager.Path.is_dir', return_value=True)
+    def test_validator_reuses_passing_run_of_same_tree(self, mock_is_dir, mock_glob, mock_run, mock_missing):
+        """Test that a passing run is reused for the same tree and dependencies, unless --no-cache is given."""
+        install_cache.record()
+        self.session.tree_hash.return_value = 'a' * 40
+        mock_run.side_effect = runs(pytest_run(passed=1))
+        self.assertTrue(WorkflowManager()._validate_tests())
+        self.assertTrue(WorkflowManager()._validate_tests())
+        self.assertEqual(mock_run.call_count, 1)
+
+        mock_run.side_effect = runs(pytest_run(passed=1))
+        self.assertTrue(WorkflowManager(validation_options={'no_cache': True})._validate_tests())
+        self.assertEqual(mock_run.call_count, 2)
+
+        self.session.tree_hash.return_value = 'b' * 40
+        mock_run.side_effect = runs(pytest_run(passed=1, failed=1, exitstatus=1))
+        with self.assertRaises(SystemExit):
+            WorkflowManager()._validate_tests()
+
+    @patch('dw6.state_manager.runner.record_failure')
+    @patch('dw6.state_manager.runner.run')
+    @patch('dw6.state_manager.Path.glob', return_value=['test_placeholder.py'])
+    @patch('dw6.state_manager.Path.is_dir', return_value=True)
+    def test_validator_fails_and_records_a_pytest_timeout(self, mock_is_dir, mock_glob, mock_run, mock_record):
+        """Test that a pytest run killed by its timeout fails the stage and is recorded as a structured failure."""
+        hung = runner.RunResult(['pytest'], -9, 'tests/test_x.py::test_hangs\n', '', 60.0, timeout=60, timed_out=True)
+        mock_run.side_effect = runs(installed(), hung)
+        with self.assertRaises(SystemExit):
+            WorkflowManager()._validate_tests()
+        self.assertEqual(mock_record.call_args.args, ('tests', hung))
+        self.assertEqual(mock_run.call_args.kwargs['timeout'], runner.step_timeout('tests'))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,97 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+from dw6.locking import StateConflictError
+from dw6.state_manager import Governor, WorkflowManager, WorkflowState
+
+
+@pytest.fixture
+def state(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return WorkflowState()
+
+
+def read_state_file():
+    with open("logs/workflow_state.txt") as f:
+        return f.read()
+
+
+def test_transaction_commits_once(state):
+    with patch("dw6.state_manager.os.replace", wraps=os.replace) as mock_replace:
+        with state.transaction():
+            state.set("CurrentStage", "Coder")
+            state.save()
+            state.set("LastCommitSHA", "abc")
+            state.save()
+            with state.transaction():
+                state.set("RequirementPointer", 2)
+                state.save()
+        assert mock_replace.call_count == 1
+    assert read_state_file() == "CurrentStage=Coder\nRequirementPointer=2\nStateVersion=2\nLastCommitSHA=abc\n"
+
+
+def test_transaction_rolls_back_on_sys_exit(state):
+    before = read_state_file()
+    with pytest.raises(SystemExit):
+        with state.transaction():
+            state.set("CurrentStage", "Validator")
+            state.save()
+            sys.exit(1)
+    assert state.get("CurrentStage") == "Engineer"
+    assert read_state_file() == before
+
+
+def test_rollback_resets_the_governor_and_manager(state):
+    manager = WorkflowManager(state)
+    governor = manager.governor
+    with pytest.raises(SystemExit):
+        with state.transaction():
+            governor._transition_to_next_stage()
+            manager.current_stage = governor.current_stage
+            assert governor.current_stage == "Researcher"
+            sys.exit(1)
+    assert governor.current_stage == manager.current_stage == "Engineer"
+    assert governor.requirement_id == "1"
+
+    with pytest.raises(SystemExit):
+        with state.transaction():
+            state.set("CurrentStage", "Deployer")
+            governor.current_stage = "Deployer"
+            governor._transition_to_next_stage()  # Completes the cycle and moves the pointer
+            assert governor.requirement_id == "2"
+            sys.exit(1)
+    assert (governor.current_stage, governor.requirement_id) == ("Engineer", "1")
+
+
+def test_rollback_hooks_of_collected_governors_are_dropped(state):
+    for _ in range(100):
+        Governor(state)  # Unreferenced, so collected at once
+    assert len(state._rollback_hooks) <= 1
+
+
+def test_save_is_atomic_and_leaves_no_temp_files(state):
+    with patch("dw6.state_manager.os.replace", side_effect=OSError("disk full")):
+        state.set("CurrentStage", "Coder")
+        with pytest.raises(OSError):
+            state.save()
+    assert read_state_file() == "CurrentStage=Engineer\nRequirementPointer=1\nStateVersion=1\n"
+    assert state.version == 1
+    assert sorted(os.listdir("logs")) == [".locks", "workflow_state.txt"]
+
+
+def test_save_detects_concurrent_modification(state):
+    other = WorkflowState()
+    other.set("CurrentStage", "Coder")
+    other.save()
+
+    state.set("CurrentStage", "Researcher")
+    with pytest.raises(StateConflictError):
+        state.save()
+
+    state.update(lambda s: s.set("RequirementPointer", 5))
+    assert (state.get("CurrentStage"), state.get("RequirementPointer"), state.version) == ("Coder", "5", 3)